@@ -0,0 +1,89 @@
+"""
+Throughput benchmark for splitting a recorded BIN file into packets.
+
+Compares the old byte-at-a-time reader that used to live in DataImport.read_packet with the
+buffer based FrameReader that replaced it. Only the framing is timed (no packets are parsed)
+so that the two readers are compared on equal footing.
+
+Usage (from the repository root):
+    python Benchmarks/read_packet_benchmark.py path/to/recording.BIN [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from DataAcquisition.FrameReader import FrameReader, END_CODE
+
+
+def read_byte_at_a_time(path):
+    """
+    The reader that DataImport.read_packet used before FrameReader. Every byte is read on its own
+    and the end of the packet is compared to the end code after every byte.
+
+    :param path: The path to the BIN file
+    :return: The number of packets found
+    """
+
+    end_code = [END_CODE[i:i + 1] for i in range(len(END_CODE))]
+    current_packet = []
+    num_packets = 0
+    with open(path, "rb") as data_file:
+        while True:
+            byte = data_file.read(1)
+            if not byte:
+                break
+            current_packet.append(byte)
+            packet_length = len(current_packet)
+            if packet_length > 8:
+                if current_packet[(packet_length - 8):packet_length] == end_code:
+                    num_packets += 1
+                    current_packet.clear()
+    return num_packets
+
+
+def read_buffered(path):
+    """
+    Splits the file into packets with FrameReader, the same way DataImport.read_packet does.
+
+    :param path: The path to the BIN file
+    :return: The number of packets found
+    """
+
+    frame_reader = FrameReader()
+    num_packets = 0
+    with open(path, "rb") as data_file:
+        while frame_reader.read_file(data_file):
+            for packet in frame_reader.frames():
+                num_packets += 1
+    return num_packets
+
+
+def benchmark(name, reader, path, repeat):
+    file_size = os.path.getsize(path)
+    best_time = None
+    num_packets = 0
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        num_packets = reader(path)
+        elapsed_time = time.perf_counter() - start_time
+        if best_time is None or elapsed_time < best_time:
+            best_time = elapsed_time
+    print("{:<20} {:>10} packets {:>10.3f} s {:>14.0f} bytes/s".format(
+        name, num_packets, best_time, file_size / best_time))
+    return file_size / best_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the old and new BIN/serial packet readers")
+    parser.add_argument("bin_file", help="A BIN file recorded by the Teensy or by DAATA")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs to take the best time of")
+    args = parser.parse_args()
+
+    print("Reading {} ({} bytes)".format(args.bin_file, os.path.getsize(args.bin_file)))
+    old_rate = benchmark("byte at a time", read_byte_at_a_time, args.bin_file, args.repeat)
+    new_rate = benchmark("FrameReader", read_buffered, args.bin_file, args.repeat)
+    print("Speedup: {:.1f}x".format(new_rate / old_rate))
@@ -0,0 +1,267 @@
+"""
+End-to-end benchmark of the acquisition pipeline using synthetic captures.
+
+For every sensor mix a capture is generated with synthetic_capture.py and run through:
+    - stream  the live path: DataImport.read_packet -> unpacketize -> Data.add_value, fed in
+              serial sized chunks
+    - bulk    the whole-file BIN decoder used when a BIN file is opened
+    - plot    (with --plot) the live path with an offscreen CustomPlotWidget refreshed at --fps,
+              needs PyQt5 and pyqtgraph
+
+Each benchmark reports throughput, latency percentiles and peak memory (from tracemalloc, measured
+in a separate run so that tracing doesn't slow down the timed runs). The results can be saved as
+JSON and compared against an earlier run.
+
+Usage (from the repository root):
+    python Benchmarks/replay_benchmark.py --output results.json
+    python Benchmarks/replay_benchmark.py --mix car --packets 200000 --plot --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from DataAcquisition import data, data_import, data_collection_lock, is_data_collecting, metrics
+from DataAcquisition.BinDecoder import decode_bin_file
+from DataAcquisition.FrameReader import FrameReader, END_CODE
+
+from synthetic_capture import sensor_mixes, write_capture
+
+# How many packets are read at a time in the stream benchmark, about what piles up between serial reads
+chunk_packets = 32
+
+
+def reset_data():
+    """
+    Clears everything that was stored by an earlier run.
+
+    :return: None
+    """
+
+    is_data_collecting.set()
+    data.reset()
+    metrics.reset()
+    data_import.frame_reader = FrameReader()
+    data_import.current_sensors = list()
+    data_import.expected_size = 0
+
+
+def percentiles_us(latencies):
+    """
+    :param latencies: A list of durations in seconds
+    :return: A dict of latency percentiles in microseconds
+    """
+
+    if len(latencies) == 0:
+        return {"p50": 0, "p90": 0, "p99": 0, "max": 0}
+    latencies = numpy.asarray(latencies) * 1e6
+    return {
+        "p50": float(numpy.percentile(latencies, 50)),
+        "p90": float(numpy.percentile(latencies, 90)),
+        "p99": float(numpy.percentile(latencies, 99)),
+        "max": float(latencies.max()),
+    }
+
+
+def open_capture(path):
+    """
+    Points data_import at a capture so read_packet replays it in chunks of about chunk_packets packets.
+
+    :return: None
+    """
+
+    reset_data()
+    packet_size = os.path.getsize(path) // max(count_packets(path), 1)
+    data_import.frame_reader = FrameReader(read_size=max(packet_size * chunk_packets, 64))
+    data_import.teensy_found = False
+    data_import.input_mode = "BIN"
+    data_import.data_file = open(path, "rb")
+
+
+def count_packets(path):
+    with open(path, "rb") as capture_file:
+        return capture_file.read().count(END_CODE)
+
+
+def run_stream(path, plot_widgets=None, fps=30, rate_hz=1000):
+    """
+    Replays a capture through read_packet, optionally refreshing plots every 1/fps seconds of capture time.
+
+    :return: A tuple of (number of packets, elapsed seconds, list of latencies in seconds)
+    """
+
+    open_capture(path)
+    latencies = list()
+    packets_per_refresh = max(int(rate_hz / fps), 1)
+    next_refresh = packets_per_refresh
+    start_time = time.perf_counter()
+    try:
+        while data_import.input_mode == "BIN":
+            read_start = time.perf_counter()
+            data_import.read_packet()
+            if plot_widgets is None:
+                latencies.append(time.perf_counter() - read_start)
+            elif metrics.data_packets >= next_refresh:
+                next_refresh += packets_per_refresh
+                refresh_start = time.perf_counter()
+                for widget in plot_widgets:
+                    widget.update_graph()
+                plot_widgets.app.processEvents()
+                latencies.append(time.perf_counter() - refresh_start)
+    finally:
+        data_import.data_file.close()
+        data_import.data_file = None
+    return metrics.data_packets, time.perf_counter() - start_time, latencies
+
+
+def run_bulk(path, **kwargs):
+    """
+    Decodes a capture with the whole-file BIN decoder.
+
+    :return: A tuple of (number of packets, elapsed seconds, list of latencies in seconds)
+    """
+
+    reset_data()
+    start_time = time.perf_counter()
+    stats = decode_bin_file(path, data, data_collection_lock)
+    elapsed = time.perf_counter() - start_time
+    return stats["packets"], elapsed, [elapsed]
+
+
+class PlotWidgets(list):
+    """
+    Offscreen CustomPlotWidgets for every plottable sensor in a mix.
+    """
+
+    def __init__(self, sensor_names):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        from Utilities.CustomWidgets.Plotting import CustomPlotWidget
+
+        super().__init__()
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        for sensor_name in sensor_names:
+            widget = CustomPlotWidget(sensor_name)
+            widget.resize(800, 300)
+            widget.show()
+            self.append(widget)
+
+
+def benchmark(name, function, path, repeat, file_size, **kwargs):
+    """
+    Runs a benchmark repeat times and keeps the best run, then runs it once more to measure peak memory.
+
+    :return: A dict of results
+    """
+
+    best = None
+    for i in range(repeat):
+        num_packets, elapsed, latencies = function(path, **kwargs)
+        if best is None or elapsed < best[1]:
+            best = (num_packets, elapsed, latencies)
+    num_packets, elapsed, latencies = best
+    # Per packet decode times from the last run, only the read_packet path records them
+    decode_latency = None
+    if metrics.decode_time.count:
+        decode_latency = {"p50": metrics.decode_time.percentile(50) * 1e6,
+                          "p99": metrics.decode_time.percentile(99) * 1e6,
+                          "max": metrics.decode_time.max * 1e6}
+
+    tracemalloc.start()
+    function(path, **kwargs)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {
+        "benchmark": name,
+        "packets": num_packets,
+        "seconds": elapsed,
+        "packets_per_second": num_packets / elapsed if elapsed else 0,
+        "bytes_per_second": file_size / elapsed if elapsed else 0,
+        "latency_us": percentiles_us(latencies),
+        "decode_latency_us": decode_latency,
+        "peak_memory_bytes": peak_memory,
+    }
+    print("{:<8} {:>9} packets {:>8.3f} s {:>12.0f} packets/s  p50 {:>8.1f} us  p99 {:>8.1f} us  peak {:>8.1f} MB".format(
+        name, num_packets, elapsed, result["packets_per_second"], result["latency_us"]["p50"],
+        result["latency_us"]["p99"], peak_memory / 1e6), flush=True)
+    return result
+
+
+def compare(results, baseline_path):
+    """
+    Prints how the packet rate of each benchmark changed from a saved run.
+
+    :return: None
+    """
+
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    baseline_rates = {(result["mix"], result["benchmark"]): result["packets_per_second"]
+                      for result in baseline["results"]}
+    print("\nCompared to {} ({})".format(baseline_path, baseline.get("created", "unknown date")))
+    for result in results:
+        old_rate = baseline_rates.get((result["mix"], result["benchmark"]))
+        if old_rate:
+            print("{:<12} {:<8} {:>+7.1f}%".format(result["mix"], result["benchmark"],
+                                                  100 * (result["packets_per_second"] / old_rate - 1)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the acquisition pipeline with synthetic captures")
+    parser.add_argument("--mix", nargs="+", default=sorted(sensor_mixes), choices=sorted(sensor_mixes),
+                        help="The sensor mixes to benchmark")
+    parser.add_argument("--packets", type=int, default=50000, help="Number of data packets in each capture")
+    parser.add_argument("--rate", type=float, default=1000, help="Packet rate in Hz of the captures")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs to take the best time of")
+    parser.add_argument("--plot", action="store_true", help="Also benchmark refreshing offscreen plots")
+    parser.add_argument("--fps", type=float, default=30, help="Plot refreshes per second of capture time")
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--compare", help="Compare the results to a JSON file from an earlier run")
+    args = parser.parse_args()
+
+    data_import.attach_internal_sensor(101)
+    results = list()
+    with tempfile.TemporaryDirectory(prefix="daata_benchmark_") as directory:
+        for mix in args.mix:
+            path = os.path.join(directory, mix + ".BIN")
+            file_size = write_capture(path, sensor_mixes[mix], args.packets, args.rate)
+            print("\n{}: {} packets, {} bytes".format(mix, args.packets, file_size))
+
+            runs = [("stream", run_stream, {"rate_hz": args.rate}), ("bulk", run_bulk, {})]
+            if args.plot:
+                run_stream(path)    # Connects the sensors so the plots can be set up
+                try:
+                    widgets = PlotWidgets(data.get_sensors(is_connected=True, is_plottable=True))
+                    runs.append(("plot", run_stream, {"plot_widgets": widgets, "fps": args.fps, "rate_hz": args.rate}))
+                except ImportError as e:
+                    print("Skipping the plot benchmark: {}".format(e))
+
+            for name, function, kwargs in runs:
+                result = benchmark(name, function, path, args.repeat, file_size, **kwargs)
+                result["mix"] = mix
+                results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "created": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "numpy": numpy.__version__,
+                "platform": platform.platform(),
+                "config": {"packets": args.packets, "rate": args.rate, "repeat": args.repeat, "fps": args.fps},
+                "results": results,
+            }, output_file, indent=2)
+        print("\nSaved results to {}".format(args.output))
+    if args.compare:
+        compare(results, args.compare)
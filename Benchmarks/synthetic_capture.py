@@ -0,0 +1,127 @@
+"""
+Generates synthetic BIN captures from the layouts in SensorId, so the acquisition pipeline can be
+benchmarked without a Teensy or a recording.
+
+A capture is one settings packet followed by data packets, in the same framing the Teensy uses.
+Time sensors count up at the given packet rate, float sensors are sine waves and every other
+sensor is a ramp, so the values look plausible when they are plotted.
+
+Usage (from the repository root):
+    python Benchmarks/synthetic_capture.py capture.BIN --mix engine_dyno --packets 100000 --rate 1000
+"""
+
+import argparse
+import os
+import sys
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from DataAcquisition.SensorId import SensorId
+from DataAcquisition.PacketLayout import PacketLayout
+from DataAcquisition.FrameReader import END_CODE
+
+# Sensor ids sent by each kind of test setup. Every mix starts with time_daata_us so the packets have a device time.
+sensor_mixes = {
+    "minimal": [109, 90],
+    "engine_dyno": [109, 212, 213, 306],
+    "shock_dyno": [109, 307, 405],
+    "wheel_force": [109, 308, 309, 310],
+    "car": [109, 214, 215, 304, 305, 401, 402, 403, 404, 500],
+}
+
+
+def settings_packet(sensor_ids, ack_code=0x01):
+    """
+    Builds the settings packet that announces the sensor ids (without the end code).
+
+    :return: bytes
+    """
+
+    settings = bytearray([ack_code])
+    for sensor_id in sensor_ids:
+        num_bytes = SensorId[sensor_id]["num_bytes"]
+        if isinstance(num_bytes, list):
+            num_bytes = sum(num_bytes)
+        settings += bytearray([sensor_id % 256, sensor_id // 256, num_bytes])
+    return bytes(settings)
+
+
+def generate_records(layout, num_packets, rate_hz, seed=0, first_packet=0):
+    """
+    Generates the values of num_packets data packets for a layout.
+
+    :param first_packet: The number of packets before these ones, so values can be generated a block at a time
+    :return: A structured array with layout.dtype
+    """
+
+    rng = numpy.random.default_rng(seed)
+    noise_rng = numpy.random.default_rng(seed + first_packet)
+    packet_index = numpy.arange(first_packet, first_packet + num_packets, dtype=numpy.uint64)
+    sample_time = packet_index / rate_hz
+    records = numpy.zeros(num_packets, dtype=layout.dtype)
+    for column, (sensor_id, value_index, num_bytes, is_float) in enumerate(layout.fields):
+        field = "c{}".format(column)
+        name = SensorId[sensor_id].get("name", "")
+        if records.dtype[field].shape:
+            # Sizes without a native type are left as zeros
+            continue
+        if is_float:
+            frequency = rng.uniform(0.5, 5)
+            records[field] = 100 * numpy.sin(2 * numpy.pi * frequency * sample_time) + noise_rng.normal(0, 1, num_packets)
+        elif name.startswith("time_") and name.endswith("_us"):
+            records[field] = (sample_time * 1e6).astype(numpy.uint64) % (1 << (8 * num_bytes))
+        elif name.startswith("time_") and name.endswith("_ms"):
+            records[field] = (sample_time * 1e3).astype(numpy.uint64) % (1 << (8 * num_bytes))
+        else:
+            records[field] = packet_index % (1 << min(8 * num_bytes, 16))
+    return records
+
+
+def data_frames(layout, records, ack_code=0x03):
+    """
+    Frames generated records as data packets.
+
+    :return: A uint8 array with the ack code, the packet and the end code on each row
+    """
+
+    end_code = numpy.frombuffer(END_CODE, dtype=numpy.uint8)
+    frames = numpy.empty((len(records), 1 + layout.size + len(end_code)), dtype=numpy.uint8)
+    frames[:, 0] = ack_code
+    frames[:, 1:1 + layout.size] = records.view(numpy.uint8).reshape(len(records), layout.size)
+    frames[:, 1 + layout.size:] = end_code
+    return frames
+
+
+def write_capture(path, sensor_ids, num_packets, rate_hz=1000, seed=0):
+    """
+    Writes a synthetic capture to a BIN file.
+
+    :param path: The path of the BIN file
+    :param sensor_ids: The sensor ids in each data packet
+    :param num_packets: The number of data packets to write
+    :param rate_hz: The packet rate the time sensors count at
+    :param seed: Seed for the random parts of the values
+    :return: The number of bytes written
+    """
+
+    layout = PacketLayout(sensor_ids)
+    frames = data_frames(layout, generate_records(layout, num_packets, rate_hz, seed))
+    with open(path, "wb") as capture_file:
+        capture_file.write(settings_packet(sensor_ids) + END_CODE)
+        capture_file.write(frames.tobytes())
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic BIN capture")
+    parser.add_argument("bin_file", help="The BIN file to write")
+    parser.add_argument("--mix", default="engine_dyno", choices=sorted(sensor_mixes), help="The sensors in each packet")
+    parser.add_argument("--packets", type=int, default=100000, help="Number of data packets")
+    parser.add_argument("--rate", type=float, default=1000, help="Packet rate in Hz")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    num_bytes = write_capture(args.bin_file, sensor_mixes[args.mix], args.packets, args.rate, args.seed)
+    print("Wrote {} packets ({} bytes) to {}".format(args.packets, num_bytes, args.bin_file))
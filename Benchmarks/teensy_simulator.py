@@ -0,0 +1,313 @@
+"""
+A simulated Teensy for testing the COM input mode without hardware.
+
+The simulator speaks the same protocol as the UARTComms library used by SerialTest.ino:
+    - Until DAATA acknowledges its settings it sends a settings packet every settings_interval
+      seconds (ack 0x00, or 0x01 once it has received DAATA's settings).
+    - Once DAATA sends a packet with ack 0x01 or 0x03 it sends data packets at rate_hz
+      (ack 0x02, or 0x03 once it has received DAATA's settings).
+    - Settings packets from DAATA set the layout of DAATA's data packets, whose values (i.e.
+      command_toggle_teensy_led) are kept in input_values.
+
+DAATA connects to it through DataImport.connect_serial, either on a pty (Linux/macOS) or on a
+TCP socket with a pyserial URL (socket://localhost:<port>). Faults can be injected to test how the
+reader recovers: truncated data packets, garbage bytes between packets and switching to a
+different set of sensors mid-stream. All faults come from a seeded generator so runs repeat.
+
+Like a real Teensy's USB buffer, at most max_pending bytes are kept waiting for DAATA to read
+them and the oldest are dropped after that.
+
+Usage (from the repository root):
+    python Benchmarks/teensy_simulator.py --transport socket --port 7777 --mix car --rate 2000
+    python daata_headless.py --port socket://localhost:7777 --duration 30
+"""
+
+import argparse
+import os
+import select
+import socket
+import sys
+import threading
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from DataAcquisition.FrameReader import FrameReader, END_CODE
+from DataAcquisition.PacketLayout import PacketLayout
+
+from synthetic_capture import sensor_mixes, settings_packet, generate_records, data_frames
+
+
+class TeensySimulator(threading.Thread):
+    def __init__(self, sensor_sets=None, rate_hz=1000, transport="pty", host="localhost", port=0, seed=0,
+                 truncate_rate=0.0, garbage_rate=0.0, settings_change_interval=None, settings_interval=0.1,
+                 batch_interval=0.002, max_pending=1 << 16):
+        """
+        :param sensor_sets: A list of lists of sensor ids, the first is sent first and the others are switched to at settings_change_interval
+        :param rate_hz: Data packets sent per second
+        :param transport: "pty" or "socket"
+        :param host: The address to listen on for the socket transport
+        :param port: The port to listen on for the socket transport (0 picks a free port)
+        :param seed: Seed for the generated values and faults
+        :param truncate_rate: Fraction of data packets that are cut short
+        :param garbage_rate: Fraction of data packets that have random bytes sent before them
+        :param settings_change_interval: Seconds between switching to the next sensor set (None to never switch)
+        :param settings_interval: Seconds between settings packets while waiting for DAATA
+        :param batch_interval: Seconds between writes, data packets that are due are sent together
+        :param max_pending: The most bytes that are kept waiting for DAATA before the oldest are dropped
+        """
+
+        super().__init__(daemon=True)
+        self.sensor_sets = sensor_sets if sensor_sets is not None else [sensor_mixes["engine_dyno"]]
+        self.rate_hz = rate_hz
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.truncate_rate = truncate_rate
+        self.garbage_rate = garbage_rate
+        self.settings_change_interval = settings_change_interval
+        self.settings_interval = settings_interval
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending
+        self.stop_event = threading.Event()
+        self.rng = numpy.random.default_rng(seed)
+
+        # Protocol state, named after the matching variables in DataImport
+        self.is_sending_data = False    # DAATA has acknowledged our settings
+        self.is_receiving_data = False  # We have received DAATA's settings
+        self.input_layout = PacketLayout([])
+        self.input_values = dict()
+
+        self.stats = {"packets_sent": 0, "settings_sent": 0, "bytes_sent": 0, "bytes_dropped": 0,
+                      "truncated": 0, "garbage": 0, "settings_changes": 0, "packets_received": 0}
+
+        self._frame_reader = FrameReader()
+        self._pending = bytearray()
+        self._master = None
+        self._slave = None
+        self._server = None
+        self._connection = None
+        self.url = None
+
+    def open(self):
+        """
+        Opens the transport. The url that DAATA should connect to is then in self.url.
+
+        :return: str
+        """
+
+        if self.transport == "pty":
+            import tty
+            self._master, self._slave = os.openpty()
+            tty.setraw(self._slave)
+            os.set_blocking(self._master, False)
+            self.url = os.ttyname(self._slave)
+        elif self.transport == "socket":
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._server.bind((self.host, self.port))
+            self._server.listen(1)
+            self.port = self._server.getsockname()[1]
+            self.url = "socket://{}:{}".format(self.host, self.port)
+        else:
+            raise ValueError("Unknown transport: {}".format(self.transport))
+        return self.url
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def close(self):
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+        for sock in (self._connection, self._server):
+            if sock is not None:
+                sock.close()
+        self._connection = self._server = None
+
+    # ---------------------------- Transport ----------------------------
+    def _readable(self):
+        if self.transport == "pty":
+            return self._master
+        return self._connection if self._connection is not None else self._server
+
+    def _read(self):
+        """
+        Reads whatever DAATA has sent, accepting the connection first for the socket transport.
+
+        :return: bytes
+        """
+
+        if self.transport == "socket" and self._connection is None:
+            self._connection, _ = self._server.accept()
+            self._connection.setblocking(False)
+            return b''
+        try:
+            if self.transport == "pty":
+                return os.read(self._master, 65536)
+            data = self._connection.recv(65536)
+            if not data:
+                # DAATA disconnected, wait for it to connect again
+                self._connection.close()
+                self._connection = None
+                self.is_sending_data = self.is_receiving_data = False
+            return data
+        except (BlockingIOError, InterruptedError):
+            return b''
+
+    def _write(self, data):
+        """
+        Sends as much as DAATA will take right now, keeping the rest (up to max_pending bytes) for later.
+
+        :return: None
+        """
+
+        self._pending += data
+        if len(self._pending) > self.max_pending:
+            num_dropped = len(self._pending) - self.max_pending
+            del self._pending[:num_dropped]
+            self.stats["bytes_dropped"] += num_dropped
+        if not self._pending or (self.transport == "socket" and self._connection is None):
+            return
+        try:
+            if self.transport == "pty":
+                num_sent = os.write(self._master, self._pending)
+            else:
+                num_sent = self._connection.send(self._pending)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            # Nothing has the other end open
+            num_sent = len(self._pending)
+        self.stats["bytes_sent"] += num_sent
+        del self._pending[:num_sent]
+
+    # ---------------------------- Protocol ----------------------------
+    def handle_packet(self, packet):
+        """
+        Handles a packet from DAATA (without the end code).
+
+        :return: None
+        """
+
+        if len(packet) == 0:
+            return
+        ack_code = packet[0]
+        self.stats["packets_received"] += 1
+        self.is_sending_data = bool(ack_code & 0x01)
+        if ack_code in (0x00, 0x01):
+            sensor_ids = [int.from_bytes(packet[i:i + 2], "little") for i in range(1, len(packet) - 2, 3)]
+            self.input_layout = PacketLayout(sensor_ids)
+            self.is_receiving_data = True
+        elif ack_code in (0x02, 0x03) and len(packet) - 1 == self.input_layout.size:
+            for sensor_id, value in self.input_layout.decode(packet, 1):
+                self.input_values[sensor_id] = value
+
+    def make_data(self, layout, first_packet, num_packets):
+        """
+        Generates num_packets framed data packets, injecting faults.
+
+        :return: bytes
+        """
+
+        ack_code = 0x03 if self.is_receiving_data else 0x02
+        frames = data_frames(layout, generate_records(layout, num_packets, self.rate_hz, self.seed, first_packet), ack_code)
+        truncated = self.rng.random(num_packets) < self.truncate_rate
+        garbage = self.rng.random(num_packets) < self.garbage_rate
+        if not truncated.any() and not garbage.any():
+            return frames.tobytes()
+
+        data = bytearray()
+        for i in range(num_packets):
+            if garbage[i]:
+                data += self.rng.integers(0, 256, int(self.rng.integers(1, 32)), dtype=numpy.uint8).tobytes()
+                self.stats["garbage"] += 1
+            if truncated[i]:
+                data += frames[i, :1 + int(self.rng.integers(0, layout.size))].tobytes() + END_CODE
+                self.stats["truncated"] += 1
+            else:
+                data += frames[i].tobytes()
+        return bytes(data)
+
+    def run(self):
+        if self.url is None:
+            self.open()
+        set_index = 0
+        layout = PacketLayout(self.sensor_sets[set_index])
+        start_time = time.perf_counter()
+        last_settings_time = None
+        last_change_time = start_time
+        first_packet = 0
+        data_start_time = None
+
+        try:
+            while not self.stop_event.is_set():
+                readable, _, _ = select.select([self._readable()], [], [], self.batch_interval)
+                if readable:
+                    self._frame_reader.feed(self._read())
+                    for packet in self._frame_reader.frames():
+                        self.handle_packet(bytes(packet))
+
+                now = time.perf_counter()
+                if self.settings_change_interval is not None and len(self.sensor_sets) > 1 \
+                        and now - last_change_time >= self.settings_change_interval:
+                    # Switch sensors mid-stream, DAATA sees a new settings packet between data packets
+                    set_index = (set_index + 1) % len(self.sensor_sets)
+                    layout = PacketLayout(self.sensor_sets[set_index])
+                    last_change_time = now
+                    last_settings_time = None
+                    self.stats["settings_changes"] += 1
+
+                if not self.is_sending_data or last_settings_time is None:
+                    if last_settings_time is None or now - last_settings_time >= self.settings_interval:
+                        ack_code = 0x01 if self.is_receiving_data else 0x00
+                        self._write(settings_packet(self.sensor_sets[set_index], ack_code) + END_CODE)
+                        self.stats["settings_sent"] += 1
+                        last_settings_time = now
+                    data_start_time = None
+                    self._write(b'')
+                    continue
+
+                if data_start_time is None:
+                    data_start_time = now - first_packet / self.rate_hz
+                num_packets = int((now - data_start_time) * self.rate_hz) - first_packet
+                if num_packets > 0:
+                    self._write(self.make_data(layout, first_packet, num_packets))
+                    first_packet += num_packets
+                    self.stats["packets_sent"] += num_packets
+                else:
+                    self._write(b'')
+        finally:
+            self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a Teensy for DAATA's COM input mode")
+    parser.add_argument("--transport", default="pty", choices=["pty", "socket"], help="How DAATA connects")
+    parser.add_argument("--port", type=int, default=7777, help="The TCP port for the socket transport")
+    parser.add_argument("--mix", nargs="+", default=["engine_dyno"], choices=sorted(sensor_mixes),
+                        help="The sensor sets to send, switched between every --settings-change seconds")
+    parser.add_argument("--rate", type=float, default=1000, help="Data packets per second")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Fraction of data packets to cut short")
+    parser.add_argument("--garbage", type=float, default=0.0, help="Fraction of data packets to send garbage before")
+    parser.add_argument("--settings-change", type=float, default=None, help="Seconds between switching sensor sets")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    simulator = TeensySimulator([sensor_mixes[mix] for mix in args.mix], args.rate, args.transport,
+                                port=args.port, seed=args.seed, truncate_rate=args.truncate,
+                                garbage_rate=args.garbage, settings_change_interval=args.settings_change)
+    print("Simulated Teensy on {}".format(simulator.open()), flush=True)
+    simulator.start()
+    try:
+        while simulator.is_alive():
+            time.sleep(1)
+            print(simulator.stats, flush=True)
+    except KeyboardInterrupt:
+        simulator.stop()
@@ -0,0 +1,192 @@
+"""
+Counters and timings that show how well the acquisition pipeline is keeping up.
+
+DataImport updates the module level metrics object as packets are read and decoded, and anything
+can read it with metrics.snapshot() (the Homepage scene shows it next to the connection
+indicators and daata_headless.py prints it). Only the reading thread writes the counters, so
+updating them is a plain increment.
+"""
+
+import threading
+import time
+
+# Seconds of packets that packets_per_second and bytes_per_second are averaged over
+rate_window = 1.0
+
+
+class LatencyHistogram:
+    """
+    A histogram of durations with power of two buckets in microseconds (bucket i holds durations
+    under 2**i us), so adding a duration is cheap enough to do for every packet.
+    """
+
+    num_buckets = 24    # The last bucket holds everything over ~4 s
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * self.num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, count=1):
+        """
+        :param seconds: The duration
+        :param count: How many times the duration happened, i.e. the average time of a block of packets
+        :return: None
+        """
+
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[min(bucket, self.num_buckets - 1)] += count
+        self.count += count
+        self.total += seconds * count
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Gets the upper edge of the bucket that holds the given percentile.
+
+        :param percent: The percentile (0 to 100)
+        :return: The duration in seconds
+        """
+
+        if self.count == 0:
+            return 0.0
+        target = self.count * percent / 100
+        total = 0
+        for bucket, count in enumerate(self.buckets):
+            total += count
+            if total >= target:
+                return min((1 << bucket) * 1e-6, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": list(self.buckets),
+        }
+
+
+class AcquisitionMetrics:
+    """
+    Packet and byte rates, error counters (frame size mismatches, unknown ack codes and resyncs),
+    and histograms of the time taken to decode each data packet and to wait for the data lock.
+    """
+
+    def __init__(self):
+        self.decode_time = LatencyHistogram()
+        self.lock_wait = LatencyHistogram()
+        self._rate_lock = threading.Lock()
+        self.process_snapshot = None    # The metrics of the acquisition process, if one is used
+        self.reset()
+
+    def reset(self):
+        """
+        Clears every counter, i.e. when a new port is opened.
+
+        :return: None
+        """
+
+        self.packets = 0
+        self.bytes = 0
+        self.data_packets = 0
+        self.settings_packets = 0
+        self.size_mismatches = 0
+        self.unknown_acks = 0
+        self.resyncs = 0
+        self.packets_per_second = 0.0
+        self.bytes_per_second = 0.0
+        self.decode_time.reset()
+        self.lock_wait.reset()
+        self.process_snapshot = None
+        self._window_start = time.perf_counter()
+        self._window_packets = 0
+        self._window_bytes = 0
+
+    def add_packets(self, num_packets, num_bytes):
+        """
+        Counts packets and bytes that were read.
+
+        :return: None
+        """
+
+        self.packets += num_packets
+        self.bytes += num_bytes
+        self._window_packets += num_packets
+        self._window_bytes += num_bytes
+        self._update_rates()
+
+    def _update_rates(self):
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < rate_window:
+            return
+        with self._rate_lock:
+            self.packets_per_second = self._window_packets / elapsed
+            self.bytes_per_second = self._window_bytes / elapsed
+            self._window_start = now
+            self._window_packets = 0
+            self._window_bytes = 0
+
+    def snapshot(self):
+        """
+        Gets every metric at once.
+
+        :return: dict
+        """
+
+        self._update_rates()
+        snapshot = {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "data_packets": self.data_packets,
+            "settings_packets": self.settings_packets,
+            "packets_per_second": self.packets_per_second,
+            "bytes_per_second": self.bytes_per_second,
+            "size_mismatches": self.size_mismatches,
+            "unknown_acks": self.unknown_acks,
+            "resyncs": self.resyncs,
+            "decode_time": self.decode_time.snapshot(),
+            "lock_wait": self.lock_wait.snapshot(),
+        }
+        if self.process_snapshot is not None:
+            snapshot["acquisition_process"] = self.process_snapshot
+        return snapshot
+
+
+def format_snapshot(snapshot):
+    """
+    Formats a snapshot as a few lines of text for displaying.
+
+    :return: str
+    """
+
+    if "acquisition_process" in snapshot:
+        snapshot = snapshot["acquisition_process"]
+    decode_time = snapshot["decode_time"]
+    lock_wait = snapshot["lock_wait"]
+    return "\n".join([
+        "Packets: {:.0f}/s ({:.1f} kB/s), {} total".format(
+            snapshot["packets_per_second"], snapshot["bytes_per_second"] / 1000, snapshot["packets"]),
+        "Size mismatches: {}  Unknown acks: {}  Resyncs: {}".format(
+            snapshot["size_mismatches"], snapshot["unknown_acks"], snapshot["resyncs"]),
+        "Decode: {:.0f} us mean, {:.0f} us p99, {:.0f} us max".format(
+            decode_time["mean"] * 1e6, decode_time["p99"] * 1e6, decode_time["max"] * 1e6),
+        "Lock wait: {:.0f} us mean, {:.0f} us p99, {:.0f} us max".format(
+            lock_wait["mean"] * 1e6, lock_wait["p99"] * 1e6, lock_wait["max"] * 1e6),
+    ])
+
+
+# The metrics of the acquisition pipeline. Use 'DataAcquisition.metrics'
+metrics = AcquisitionMetrics()
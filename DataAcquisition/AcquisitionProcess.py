@@ -0,0 +1,393 @@
+"""
+Runs the serial reader in its own process so that decoding packets doesn't have to share the GIL
+with the GUI. Heavy plotting can otherwise hold up read_packet long enough for the serial buffer
+to overflow, which shows up as "Packet size is different than expected" resyncs.
+
+The acquisition process has its own Data and DataImport. After every read the new values of each
+connected sensor are copied into a SharedRing (one block of shared memory per sensor) and the
+write counts are committed together, so the GUI can copy them out in the same order without any
+pickling. ProcessSource is the GUI side: it maps the rings, adds the new values to the GUI's Data
+object and forwards the output sensors (i.e. command_tare_load_cell) to the acquisition process
+through a control queue. Everything else in the GUI keeps using DataAcquisition.data as before.
+
+Every sensor that is converted with its calibration keeps its raw values in the acquisition
+process and its ring carries the raw values, so the scale and calibration set in the GUI (i.e.
+the load cell scale in the dyno scenes) are the ones that are applied.
+"""
+
+import logging
+import multiprocessing
+import queue
+import time
+
+from DataAcquisition.AcquisitionMetrics import metrics
+from DataAcquisition.SensorRegistry import sensor_registry
+from DataAcquisition.SharedRing import SharedRing, SharedCounter
+from DataAcquisition.Sources import DataSource, SerialSource
+
+logger = logging.getLogger("DataAcquisition")
+
+# Number of values each sensor's ring can hold before the oldest values are overwritten
+ring_capacity = 1 << 18
+
+# Time in seconds between sending packets to the Teensy, the same as the GUI's data_sending_thread
+send_interval = 0.1
+
+# The most time in seconds the acquisition process waits on the serial port before checking for control messages
+process_read_timeout = 0.02
+
+# Time in seconds between copying values out of the rings in the GUI process
+poll_interval = 0.02
+
+# Time in seconds between sending the acquisition process's metrics to the GUI process
+metrics_interval = 1.0
+
+
+class SamplePublisher:
+    """
+    Copies the values that have been added to the acquisition process's Data into shared rings.
+    """
+
+    def __init__(self, data, counter, event_queue):
+        self.data = data
+        self.counter = counter
+        self.event_queue = event_queue
+        self.rings = dict()
+        self.published = dict()     # Index after the last value that was published for each sensor
+        self.connected_ids = set()
+        self.connected_sensors = list()     # The connected sensors that aren't derived, see update_connected
+        self.connection_sequence = None     # Data.connection_sequence when connected_sensors was updated
+        self.sequence = None                # Data.sequence when the values were last published
+
+    def reset(self):
+        """
+        Starts publishing the sensors from their first value again, used after data is reset.
+
+        :return: None
+        """
+
+        self.published.clear()
+        self.sequence = None
+
+    def publish(self):
+        """
+        Writes every value that was added since the last call to the rings and commits them together.
+        Nothing is done if no values were added or sensors connected since the last call.
+
+        :return: None
+        """
+
+        self.update_connected()
+        if self.data.sequence == self.sequence:
+            return
+        self.sequence = self.data.sequence
+        rings = list()
+        write_counts = list()
+        for sensor_name in self.connected_sensors:
+            index_range = self.data.get_index_range(sensor_name)
+            if index_range is None:
+                continue
+            first_index, stop_index = index_range
+            start_index = max(self.published.get(sensor_name, 0), first_index)
+            ring = self.get_ring(sensor_name)
+            if ring is None:
+                continue
+            if self.data.get_keep_raw(sensor_name):
+                values = self.data.get_raw_values(sensor_name, stop_index, stop_index - start_index)
+                current_value = self.data.get_current_raw_value(sensor_name)
+            else:
+                values = self.data.get_values(sensor_name, stop_index, stop_index - start_index)
+                current_value = self.data.get_current_value(sensor_name)
+            rings.append(ring)
+            write_counts.append(ring.write(values if values is not None else [], current_value))
+            self.published[sensor_name] = stop_index
+        self.counter.commit(rings, write_counts)
+
+    def update_connected(self):
+        """
+        Updates the list of connected sensors when a settings packet connects or disconnects sensors,
+        and tells the GUI process about the change.
+
+        :return: None
+        """
+
+        if self.data.connection_sequence == self.connection_sequence:
+            return
+        self.connection_sequence = self.data.connection_sequence
+        self.connected_sensors = self.data.get_sensors(is_connected=True, is_derived=False)
+        # Publish the values of the newly connected sensors
+        self.sequence = None
+
+        connected_ids = set(self.data.get_id(sensor_name) for sensor_name in self.connected_sensors)
+        connected_ids.discard(None)
+        if connected_ids != self.connected_ids:
+            self.event_queue.put(("connected", sorted(connected_ids - self.connected_ids),
+                                  sorted(self.connected_ids - connected_ids)))
+            self.connected_ids = connected_ids
+
+    def get_ring(self, sensor_name):
+        """
+        Gets the ring of a sensor, creating it and telling the GUI process about it the first time.
+        Sensors that keep raw values get a ring of raw values.
+
+        :return: SharedRing or None if the sensor's values can't be put in a ring
+        """
+
+        if sensor_name not in self.rings:
+            is_raw = self.data.get_keep_raw(sensor_name)
+            try:
+                ring = SharedRing.create(self.data.get_dtype(sensor_name, raw=is_raw), ring_capacity)
+            except (TypeError, ValueError, OSError) as e:
+                logger.error(e)
+                logger.error("Unable to create a shared ring for {}".format(sensor_name))
+                ring = None
+            self.rings[sensor_name] = ring
+            if ring is not None:
+                self.event_queue.put(("ring", sensor_name, ring.name, ring.dtype.str, ring.capacity, is_raw))
+        return self.rings[sensor_name]
+
+    def close(self):
+        for ring in self.rings.values():
+            if ring is not None:
+                ring.close(unlink=True)
+        self.rings.clear()
+
+
+def run_acquisition(port, counter_name, control_queue, event_queue, stop_event, collecting_event, raw_capture_enabled):
+    """
+    The entry point of the acquisition process. Reads from the serial port until stop_event is set.
+
+    :param port: The serial port the Teensy is connected to
+    :param counter_name: The name of the SharedCounter created by the GUI process
+    :param control_queue: Receives ("outputs", {sensor id: value}) messages from the GUI process
+    :param event_queue: Sends ring, connected, metrics and error messages to the GUI process
+    :param stop_event: Set by the GUI process to stop reading
+    :param collecting_event: Mirrors DataAcquisition.is_data_collecting in the GUI process
+    :param raw_capture_enabled: If every frame should also be written to a raw capture file
+    :return: None
+    """
+
+    import DaataLogging
+    import DataAcquisition
+    from DataAcquisition import data, data_import, is_data_collecting
+
+    counter = SharedCounter.attach(counter_name)
+    publisher = SamplePublisher(data, counter, event_queue)
+    data_import.input_mode = port
+    data_import.raw_capture_enabled = raw_capture_enabled
+    data_import.connect_serial()
+    if not data_import.teensy_found:
+        event_queue.put(("error", "Unable to connect to {}".format(port)))
+        counter.close()
+        return
+    data_import.attach_internal_sensor(101)
+    # The GUI process converts the raw values with its own scale and calibration
+    data.set_keep_raw([sensor_name for sensor_name in data.get_sensors(is_derived=False)
+                       if data.get_can_keep_raw(sensor_name)])
+    source = SerialSource(data_import, stop_event)
+    source.open()
+
+    next_send_time = time.monotonic()
+    next_metrics_time = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            if collecting_event.is_set() and not is_data_collecting.is_set():
+                data.reset()
+                publisher.reset()
+                is_data_collecting.set()
+            elif not collecting_event.is_set() and is_data_collecting.is_set():
+                is_data_collecting.clear()
+
+            handle_control_messages(control_queue, data, data_import)
+            source.read(process_read_timeout)
+            publisher.publish()
+
+            if time.monotonic() >= next_send_time:
+                next_send_time = time.monotonic() + send_interval
+                DataAcquisition.send_data()
+            if time.monotonic() >= next_metrics_time:
+                next_metrics_time = time.monotonic() + metrics_interval
+                event_queue.put(("metrics", metrics.snapshot()))
+    except Exception as e:
+        logger.error(e)
+        logger.error("Error in the acquisition process")
+        event_queue.put(("error", str(e)))
+    finally:
+        source.close()
+        publisher.close()
+        counter.close()
+
+
+def handle_control_messages(control_queue, data, data_import):
+    """
+    Applies the output sensors sent by the GUI process.
+
+    :return: None
+    """
+
+    while True:
+        try:
+            message = control_queue.get_nowait()
+        except queue.Empty:
+            return
+        if message[0] == "outputs":
+            outputs = message[1]
+            for sensor_id in list(data_import.output_sensors):
+                if sensor_id not in outputs:
+                    data_import.detach_output_sensor(sensor_id)
+            for sensor_id, value in outputs.items():
+                if sensor_id not in data_import.output_sensors:
+                    data_import.attach_output_sensor(sensor_id)
+                data.set_current_value(sensor_registry.id_names[sensor_id], value)
+
+
+class ProcessSource(DataSource):
+    """
+    Reads a COM port through an acquisition process. The values are copied out of the shared rings
+    into the GUI's Data object, and the GUI's output sensors and their current values are sent to
+    the acquisition process whenever they change.
+    """
+
+    def __init__(self, data_import, stop_event):
+        super().__init__(data_import, stop_event)
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.counter = None
+        self.control_queue = None
+        self.event_queue = None
+        self.process_stop_event = None
+        self.collecting_event = None
+        self.ring_names = list()
+        self.ring_is_raw = list()   # If each ring carries raw values that still need the transfer function
+        self.rings = list()
+        self.read_counts = list()
+        self.sent_outputs = None
+
+    def open(self):
+        metrics.reset()
+        self.counter = SharedCounter.create()
+        self.control_queue = self.context.Queue()
+        self.event_queue = self.context.Queue()
+        self.process_stop_event = self.context.Event()
+        self.collecting_event = self.context.Event()
+        self.process = self.context.Process(
+            target=run_acquisition, name="DAATA acquisition", daemon=True,
+            args=(self.data_import.input_mode, self.counter.name, self.control_queue, self.event_queue,
+                  self.process_stop_event, self.collecting_event, self.data_import.raw_capture_enabled))
+        self.process.start()
+        logger.info("Started the acquisition process for {}".format(self.data_import.input_mode))
+        return True
+
+    def read(self, timeout):
+        if not self.handle_events():
+            return False
+        if not self.process.is_alive():
+            logger.error("The acquisition process stopped unexpectedly")
+            return False
+
+        if self.data_import.is_data_collecting.is_set() != self.collecting_event.is_set():
+            if self.data_import.is_data_collecting.is_set():
+                self.collecting_event.set()
+            else:
+                self.collecting_event.clear()
+        self.send_outputs()
+        self.copy_values()
+        self.stop_event.wait(min(poll_interval, timeout))
+        return True
+
+    def handle_events(self):
+        """
+        Handles the messages sent by the acquisition process.
+
+        :return: False if the acquisition process failed
+        """
+
+        data = self.data_import.data
+        while True:
+            try:
+                event = self.event_queue.get_nowait()
+            except queue.Empty:
+                return True
+            if event[0] == "ring":
+                _, sensor_name, shm_name, dtype, capacity, is_raw = event
+                try:
+                    self.rings.append(SharedRing.attach(shm_name, dtype, capacity))
+                    self.ring_names.append(sensor_name)
+                    self.ring_is_raw.append(is_raw)
+                    self.read_counts.append(0)
+                except OSError as e:
+                    logger.error(e)
+                    logger.error("Unable to map the shared ring for {}".format(sensor_name))
+            elif event[0] == "connected":
+                _, connected_ids, disconnected_ids = event
+                with self.data_import.lock:
+                    for sensor_id in connected_ids:
+                        data.set_connected(sensor_id)
+                    for sensor_id in disconnected_ids:
+                        data.set_disconnected(sensor_id)
+            elif event[0] == "metrics":
+                metrics.process_snapshot = event[1]
+            elif event[0] == "error":
+                logger.error("Acquisition process: {}".format(event[1]))
+                return False
+
+    def send_outputs(self):
+        """
+        Sends the output sensors and their current values if they changed.
+
+        :return: None
+        """
+
+        data = self.data_import.data
+        outputs = {sensor_id: data.get_current_value(sensor_registry.id_names[sensor_id])
+                   for sensor_id in self.data_import.output_sensors}
+        if outputs != self.sent_outputs:
+            self.control_queue.put(("outputs", outputs))
+            self.sent_outputs = outputs
+
+    def copy_values(self):
+        """
+        Adds the values that were committed to the rings since the last call to the data object.
+
+        :return: None
+        """
+
+        data = self.data_import.data
+        write_counts = self.counter.read_write_counts(self.rings)
+        if write_counts is None:
+            # The acquisition process stopped partway through a commit or is stalled, read() checks it next time
+            logger.warning("Timed out waiting for the acquisition process to commit its values")
+            return
+        with self.data_import.lock:
+            for i, ring in enumerate(self.rings):
+                if write_counts[i] > self.read_counts[i]:
+                    values, num_lost = ring.read(self.read_counts[i], write_counts[i])
+                    if num_lost > 0:
+                        logger.warning("{} values of {} were overwritten before they were read".format(
+                            num_lost, self.ring_names[i]))
+                    data.add_values_by_name(self.ring_names[i], values, apply_transfer_function=self.ring_is_raw[i])
+                    self.read_counts[i] = write_counts[i]
+        # set_current_value takes the lock itself
+        for i, ring in enumerate(self.rings):
+            current_value = ring.current_value
+            if current_value is not None:
+                data.set_current_value(self.ring_names[i], current_value, apply_transfer_function=self.ring_is_raw[i])
+
+    def close(self):
+        if self.process is not None:
+            self.process_stop_event.set()
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                logger.warning("The acquisition process didn't stop, terminating it")
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        for ring in self.rings:
+            ring.close()
+        self.rings.clear()
+        self.ring_names.clear()
+        self.ring_is_raw.clear()
+        self.read_counts.clear()
+        if self.counter is not None:
+            self.counter.close(unlink=True)
+            self.counter = None
@@ -0,0 +1,166 @@
+import logging
+import mmap
+import time
+import numpy
+
+from DataAcquisition.FrameReader import END_CODE
+from DataAcquisition.PacketLayout import PacketLayout
+from DataAcquisition.SensorRegistry import sensor_registry
+
+logger = logging.getLogger("DataImport")
+
+# Device time sensors that can be used for the time axis of a BIN file, and the modulus they roll over at
+device_time_sensors = {
+    102: (1e-3, 2 ** 16),   # time_dash_ms
+    103: (1e-6, 2 ** 32),   # time_dash_us
+    104: (1e-3, 2 ** 16),   # time_auxdaq_ms
+    105: (1e-6, 2 ** 32),   # time_auxdaq_us
+    106: (1e-3, 2 ** 16),   # time_diff_ms
+    107: (1e-6, 2 ** 32),   # time_diff_us
+    108: (1e-3, 2 ** 16),   # time_daata_ms
+    109: (1e-6, 2 ** 32),   # time_daata_us
+}
+
+
+def find_frames(buffer):
+    """
+    Finds every frame in a buffer by searching for the end code with array operations.
+
+    :param buffer: A uint8 array holding the contents of a BIN file
+    :return: Two arrays with the start (inclusive) and end (exclusive) position of each frame
+    """
+
+    end_code = numpy.frombuffer(END_CODE, dtype=numpy.uint8)
+    code_length = len(end_code)
+    # Look for the last byte of the end code and then check the bytes before it
+    ends = numpy.flatnonzero(buffer[code_length - 1:] == end_code[-1])
+    for i in range(code_length - 1):
+        if len(ends) == 0:
+            break
+        ends = ends[buffer[ends + i] == end_code[i]]
+    starts = numpy.empty_like(ends)
+    if len(ends):
+        starts[0] = 0
+        starts[1:] = ends[:-1] + code_length
+    return starts, ends
+
+
+def get_device_time(layout, columns):
+    """
+    Builds a time axis in seconds from a device time sensor in the layout (if there is one).
+
+    :param layout: The PacketLayout the columns were decoded with
+    :param columns: The decoded columns of a block of packets
+    :return: An array of seconds since the first packet, or None if there is no device time sensor
+    """
+
+    for column, (sensor_id, value_index, num_bytes, is_float) in enumerate(layout.fields):
+        if sensor_id in device_time_sensors and value_index is None:
+            scale, modulus = device_time_sensors[sensor_id]
+            ticks = columns[column].astype(numpy.float64)
+            rollovers = numpy.concatenate(([0], numpy.cumsum(numpy.diff(ticks) < 0)))
+            ticks = ticks + rollovers * modulus
+            return (ticks - ticks[0]) * scale
+    return None
+
+
+def decode_bin_file(path, data, lock, sample_rate=200, block_size=100000):
+    """
+    Decodes an entire BIN file at once and loads it into a Data object. The file is memory mapped,
+    every frame is located with a vectorized search for the end code and each run of data packets
+    between two settings packets is decoded into NumPy columns in one shot.
+
+    If a device time sensor (ids 102-109) is part of the settings then it is used for
+    time_internal_seconds, otherwise the packets are assumed to be sample_rate apart.
+
+    :param path: The path to the BIN file
+    :param data: The Data object to load the values into
+    :param lock: The lock that protects the Data object
+    :param sample_rate: The packet rate in Hz to assume when there is no device time sensor
+    :param block_size: The maximum number of packets to decode at a time
+    :return: A dict of statistics about the decode (packets, packets_per_second, etc.)
+    """
+
+    stats = {"packets": 0, "settings": 0, "skipped": 0, "bytes": 0, "seconds": 0, "packets_per_second": 0}
+    start_time = time.perf_counter()
+
+    with open(path, "rb") as bin_file:
+        try:
+            mapped_file = mmap.mmap(bin_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            logger.warning("The BIN file {} is empty".format(path))
+            return stats
+
+    buffer = None
+    try:
+        buffer = numpy.frombuffer(mapped_file, dtype=numpy.uint8)
+        stats["bytes"] = len(buffer)
+        starts, ends = find_frames(buffer)
+        non_empty = ends > starts
+        starts = starts[non_empty]
+        ends = ends[non_empty]
+        ack_codes = buffer[starts]
+        lengths = ends - starts
+
+        settings_frames = numpy.flatnonzero(ack_codes <= 0x01)
+        data_frames = (ack_codes == 0x02) | (ack_codes == 0x03)
+        stats["settings"] = len(settings_frames)
+        stats["skipped"] = int(numpy.count_nonzero(data_frames[:settings_frames[0]] if len(settings_frames) else data_frames))
+
+        time_offset = 0.0
+        current_sensors = list()
+        for i, frame in enumerate(settings_frames):
+            settings = bytes(buffer[starts[frame] + 1:ends[frame]])
+            for sensor_id in current_sensors:
+                data.set_disconnected(sensor_id)
+            current_sensors = list()
+            for j in range(0, len(settings) - 2, 3):
+                sensor_id = int.from_bytes(settings[j:j + 2], "little")
+                if sensor_id not in sensor_registry:
+                    logger.error("May have received the erroneous block_id: {}".format(sensor_id))
+                    continue
+                current_sensors.append(sensor_id)
+                data.set_connected(sensor_id)
+            data.set_connected(101)
+            layout = PacketLayout(current_sensors)
+            if layout.size == 0:
+                continue
+
+            # Every data packet until the next settings packet that has the right size
+            last_frame = settings_frames[i + 1] if i + 1 < len(settings_frames) else len(starts)
+            frames = numpy.arange(frame + 1, last_frame)
+            is_valid = data_frames[frames] & (lengths[frames] == layout.size + 1)
+            stats["skipped"] += int(numpy.count_nonzero(data_frames[frames] & ~is_valid))
+            frames = frames[is_valid]
+
+            for block_start in range(0, len(frames), block_size):
+                block = frames[block_start:block_start + block_size]
+                raw = buffer[starts[block, numpy.newaxis] + 1 + numpy.arange(layout.size)]
+                columns = layout.unpack_block(raw)
+                values = layout.dispatch_columns(columns)
+
+                seconds = get_device_time(layout, columns)
+                if seconds is None:
+                    seconds = numpy.arange(len(block)) / float(sample_rate)
+                seconds = seconds + time_offset
+                if len(block) > 1:
+                    time_offset = seconds[-1] + (seconds[-1] - seconds[-2])
+                else:
+                    time_offset = seconds[-1] + 1.0 / sample_rate
+
+                with lock:
+                    data.add_values(101, seconds, apply_transfer_function=False)
+                    for sensor_id, sensor_values in values:
+                        data.add_values(sensor_id, sensor_values)
+                stats["packets"] += len(block)
+    finally:
+        # The array has to be released before the file can be unmapped
+        buffer = None
+        mapped_file.close()
+
+    stats["seconds"] = time.perf_counter() - start_time
+    if stats["seconds"] > 0:
+        stats["packets_per_second"] = stats["packets"] / stats["seconds"]
+    logger.info("Decoded {} packets ({} settings packets, {} skipped) from {} in {:.2f} s ({:.0f} packets/s)".format(
+        stats["packets"], stats["settings"], stats["skipped"], path, stats["seconds"], stats["packets_per_second"]))
+    return stats
@@ -0,0 +1,145 @@
+"""
+Calibrations that convert the raw values a sensor sends into engineering units.
+
+A calibration is declared next to the sensor's entry in SensorId with the "calibration"
+parameter, a dict with the type of calibration and its parameters:
+
+    "calibration": {"type": "Offset", "zero": 2.5, "gain": 8990 / 5}
+
+Current types:
+    - Linear        value * gain + offset
+    - Offset        (value - zero) * gain, i.e. an analog signal centered on zero volts
+    - Polynomial    coefficients[0] + coefficients[1] * value + coefficients[2] * value ** 2 + ...
+    - LookupTable   linear interpolation between (raw, engineering) points, raw must be increasing
+
+Calibrations are NumPy expressions, so they work on a single value or on a whole block of values.
+inverse() turns engineering units back into raw values, which is how a new calibration (or a new
+scale from Data.set_sensor_scale) is applied to values that have already been stored.
+"""
+
+import logging
+import numpy
+from numpy.polynomial import polynomial
+
+logger = logging.getLogger("DataAcquisition")
+
+
+class CalibrationError(ValueError):
+    """
+    Raised when a calibration is declared incorrectly or can't be inverted.
+    """
+
+
+class Calibration:
+    def __call__(self, values):
+        """
+        Converts raw values to engineering units.
+
+        :param values: A value or an array of values
+        :return: The converted value or array
+        """
+
+        raise NotImplementedError
+
+    def inverse(self, values):
+        """
+        Converts values in engineering units back to raw values.
+
+        :param values: A value or an array of values
+        :return: The raw value or array
+        """
+
+        raise CalibrationError("A {} calibration can't be inverted".format(type(self).__name__))
+
+
+class Linear(Calibration):
+    def __init__(self, gain=1.0, offset=0.0):
+        if gain == 0:
+            raise CalibrationError("The gain of a Linear calibration can't be 0")
+        self.gain = gain
+        self.offset = offset
+
+    def __call__(self, values):
+        return values * self.gain + self.offset
+
+    def inverse(self, values):
+        return (values - self.offset) / self.gain
+
+
+class Offset(Calibration):
+    def __init__(self, zero=0.0, gain=1.0):
+        if gain == 0:
+            raise CalibrationError("The gain of an Offset calibration can't be 0")
+        self.zero = zero
+        self.gain = gain
+
+    def __call__(self, values):
+        return (values - self.zero) * self.gain
+
+    def inverse(self, values):
+        return values / self.gain + self.zero
+
+
+class Polynomial(Calibration):
+    def __init__(self, coefficients):
+        self.coefficients = numpy.asarray(coefficients, dtype=numpy.float64)
+        if len(self.coefficients) == 0:
+            raise CalibrationError("A Polynomial calibration needs at least one coefficient")
+
+    def __call__(self, values):
+        return polynomial.polyval(values, self.coefficients)
+
+    def inverse(self, values):
+        # Only first order polynomials have a single inverse
+        if len(self.coefficients) != 2 or self.coefficients[1] == 0:
+            return super().inverse(values)
+        return (values - self.coefficients[0]) / self.coefficients[1]
+
+
+class LookupTable(Calibration):
+    def __init__(self, raw, engineering):
+        self.raw = numpy.asarray(raw, dtype=numpy.float64)
+        self.engineering = numpy.asarray(engineering, dtype=numpy.float64)
+        if len(self.raw) < 2 or len(self.raw) != len(self.engineering):
+            raise CalibrationError("A LookupTable calibration needs two or more (raw, engineering) points")
+        if numpy.any(numpy.diff(self.raw) <= 0):
+            raise CalibrationError("The raw points of a LookupTable calibration must be increasing")
+
+    def __call__(self, values):
+        return numpy.interp(values, self.raw, self.engineering)
+
+    def inverse(self, values):
+        steps = numpy.diff(self.engineering)
+        if numpy.all(steps > 0):
+            return numpy.interp(values, self.engineering, self.raw)
+        if numpy.all(steps < 0):
+            return numpy.interp(values, self.engineering[::-1], self.raw[::-1])
+        return super().inverse(values)
+
+
+calibration_types = {
+    "Linear": Linear,
+    "Offset": Offset,
+    "Polynomial": Polynomial,
+    "LookupTable": LookupTable,
+}
+
+
+def create_calibration(params):
+    """
+    Creates a calibration from its declaration in SensorId.
+
+    :param params: A dict with the type and parameters of the calibration, a Calibration (returned as is) or None
+    :return: A Calibration, or None if there is no calibration
+    """
+
+    if params is None or isinstance(params, Calibration):
+        return params
+    params = dict(params)
+    calibration_type = params.pop("type", None)
+    if calibration_type not in calibration_types:
+        raise CalibrationError("Unknown calibration type: {}".format(calibration_type))
+    try:
+        return calibration_types[calibration_type](**params)
+    except TypeError as e:
+        raise CalibrationError("Invalid parameters for a {} calibration: {}".format(calibration_type, e))
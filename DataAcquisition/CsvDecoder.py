@@ -0,0 +1,114 @@
+import itertools
+import logging
+import os
+import time
+import numpy
+
+from DataAcquisition.SensorRegistry import sensor_registry
+
+logger = logging.getLogger("DataImport")
+
+
+def get_csv_columns(header, data):
+    """
+    Matches the header of a CSV file to the sensors in a Data object. Derived sensors are skipped
+    since they are calculated from the other columns, as are names that aren't sensors.
+
+    :param header: The list of column names from the first row of the file
+    :param data: The Data object the values will be loaded into
+    :return: A tuple of (list of (column, sensor name) tuples, set of sensor ids to connect)
+    """
+
+    sensor_names = set(data.get_sensors(is_derived=False))
+    derived_names = set(data.get_sensors(is_derived=True))
+    columns = list()
+    sensor_ids = set()
+    for column, name in enumerate(header):
+        name = name.strip()
+        if name in derived_names or name in [sensor_name for _, sensor_name in columns]:
+            continue
+        if name not in sensor_names:
+            logger.warning("Skipping the column {} since it isn't a sensor".format(name))
+            continue
+        columns.append((column, name))
+        # Sensors that share a multi-value id (ex. imu_acceleration_x) are connected through that id
+        sensor_id = sensor_registry.name_to_id.get(name)
+        if sensor_id is not None:
+            sensor_ids.add(sensor_id)
+    return columns, sensor_ids
+
+
+def parse_csv_lines(lines, columns, dtype):
+    """
+    Parses a block of CSV lines into a structured array. Lines with empty cells are parsed with
+    the slower genfromtxt, where missing floats are NaN and missing integers are 0.
+
+    :param lines: A list of lines without the header
+    :param columns: The column numbers to keep
+    :param dtype: A structured dtype with a field for each kept column
+    :return: A structured array with dtype
+    """
+
+    try:
+        return numpy.loadtxt(lines, delimiter=",", dtype=dtype, usecols=columns, ndmin=1)
+    except ValueError:
+        values = numpy.genfromtxt(lines, delimiter=",", dtype=numpy.float64, usecols=columns, ndmin=2)
+        records = numpy.empty(len(values), dtype=dtype)
+        for i, field in enumerate(dtype.names):
+            column = values[:, i]
+            if dtype[field].kind in "iub":
+                column = numpy.nan_to_num(column, nan=0)
+            records[field] = column.astype(dtype[field])
+        return records
+
+
+def decode_csv_file(path, data, lock, chunk_size=100000):
+    """
+    Loads a CSV file that was exported by DAATA into a Data object. The header is matched to the
+    sensors once, then the file is read chunk_size rows at a time, each chunk is parsed straight
+    into a typed NumPy column per sensor (the dtype the sensor stores its values as) and every
+    column is added in one call. The values in the file have already been through the sensors'
+    transfer functions, so they are stored as they are.
+
+    :param path: The path to the CSV file
+    :param data: The Data object to load the values into
+    :param lock: The lock that protects the Data object
+    :param chunk_size: The number of rows to parse at a time
+    :return: A dict of statistics about the load (rows, sensors, seconds, rows_per_second)
+    """
+
+    stats = {"rows": 0, "sensors": 0, "bytes": os.path.getsize(path), "seconds": 0, "rows_per_second": 0}
+    start_time = time.perf_counter()
+
+    with open(path, "r", newline="", buffering=1 << 20) as csv_file:
+        header = csv_file.readline().rstrip("\r\n").split(",")
+        columns, sensor_ids = get_csv_columns(header, data)
+        stats["sensors"] = len(columns)
+        if len(columns) == 0:
+            logger.warning("No sensors were found in the header of {}".format(path))
+            return stats
+
+        for sensor_id in sensor_ids:
+            data.set_connected(sensor_id)
+        column_numbers = [column for column, sensor_name in columns]
+        dtype = numpy.dtype([(sensor_name, data.get_dtype(sensor_name)) for column, sensor_name in columns])
+
+        while True:
+            lines = list(itertools.islice(csv_file, chunk_size))
+            if len(lines) == 0:
+                break
+            lines = [line for line in lines if line.strip()]
+            if len(lines) == 0:
+                continue
+            records = parse_csv_lines(lines, column_numbers, dtype)
+            with lock:
+                for column, sensor_name in columns:
+                    data.add_values_by_name(sensor_name, records[sensor_name], apply_transfer_function=False)
+            stats["rows"] += len(records)
+
+    stats["seconds"] = time.perf_counter() - start_time
+    if stats["seconds"] > 0:
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"]
+    logger.info("Loaded {} rows of {} sensors from {} in {:.2f} s ({:.0f} rows/s)".format(
+        stats["rows"], stats["sensors"], path, stats["seconds"], stats["rows_per_second"]))
+    return stats
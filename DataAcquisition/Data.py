@@ -1,8 +1,12 @@
+import bisect
 import logging
+import numpy
 
 from DataAcquisition.Sensors import *
 from DataAcquisition.DerivedSensors import *
-from DataAcquisition.SensorId import SensorId
+from DataAcquisition.SensorExpression import order_derived_sensors, get_input_names
+from DataAcquisition.SensorRegistry import sensor_registry
+from DataAcquisition.DataSnapshot import DataSnapshot
 
 
 logger = logging.getLogger("DataAcquisition")
@@ -10,43 +14,40 @@ logger = logging.getLogger("DataAcquisition")
 
 class Data:
     def __init__(self, lock):
+        from DataAcquisition import is_data_collecting
         with lock:
             logger.debug("Data object is being initialized")
             self.is_connected = False
             self.lock = lock
+            self.is_data_collecting = is_data_collecting
+            # Incremented every time values are added so readers can tell if anything has changed
+            self.sequence = 0
+            # Incremented every time a sensor is connected or disconnected
+            self.connection_sequence = 0
 
             # create dictionaries of Sensor objects
             self.__data = dict()
-            for sensor_id in SensorId:
+            for sensor_name, param_dict in sensor_registry.params.items():
+                self.generate_object(sensor_name, param_dict["object"], param_dict)
+            # The Sensor objects holding the values of each sensor id, in order
+            self.__sensors_by_id = {sensor_id: tuple(self.__data[name] for name in names)
+                                    for sensor_id, names in sensor_registry.names.items()}
+            # The Sensor objects for the columns of each packet layout and for each tuple of stamped sensor ids
+            self.__packet_sensors = dict()
+            self.__stamped_sensors = dict()
+
+            # Derived sensors are created after the sensors they are derived from
+            for sensor_name in order_derived_sensors(derived_sensors, self.__data):
                 try:
-                    object_type = SensorId[sensor_id]["object"]
-                    param_dict = SensorId[sensor_id]
-                    param_dict["id"] = sensor_id
-                    self.generate_object(SensorId[sensor_id]["name"], object_type, param_dict)
-                except KeyError:
-                    try:
-                        i = 0
-                        while True:
-                            object_type = SensorId[sensor_id][i]["object"]
-                            param_dict = SensorId[sensor_id][i]
-                            param_dict["id"] = sensor_id
-                            self.generate_object(SensorId[sensor_id][i]["name"], object_type, param_dict)
-                            i = i + 1
-                    except KeyError as e:
-                        logger.error(e)
-                        logger.error("Key error in __init__ 1: {}".format(sensor_id))
-
-            for sensor_name in derived_sensors:
-                try:
-                    object_type = derived_sensors[sensor_name]["object"]
                     param_dict = derived_sensors[sensor_name]
+                    object_type = param_dict.get("object", "Expression")
                     sensors = list()
-                    for sensor in derived_sensors[sensor_name]["sensors"]:
+                    for sensor in get_input_names(param_dict):
                         sensors.append(self.__data[sensor])
                     self.generate_object(sensor_name, object_type, param_dict, sensors)
                 except KeyError as e:
                     logger.error(e)
-                    logger.error("Key error in __init__ 2: {}".format(sensor_id))
+                    logger.error("Key error in __init__ 2: {}".format(sensor_name))
 
             '''
             # Internal sensors
@@ -98,6 +99,8 @@ class Data:
             self.__data[sensor_name] = Temperature(**param_dict)
 
         # Derived Sensors
+        if object_type == "Expression":
+            self.__data[sensor_name] = Expression(sensors, **param_dict)
         if object_type == "WheelSpeed":
             self.__data[sensor_name] = WheelSpeed(sensors[0], **param_dict)
         if object_type == "CarSpeed":
@@ -133,6 +136,151 @@ class Data:
                 logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
                 return None
 
+    def get_index_at_time(self, seconds):
+        """
+        Finds the index of the first sample of time_internal_seconds that is at or after the given time.
+        The time sensor only ever increases within a session so this is a binary search.
+
+        :param seconds: The time in seconds since data collection started
+        :return: The absolute index of the sample
+        """
+
+        with self.lock:
+            return self.__get_index_at_time(seconds)
+
+    def get_values_between(self, sensor_names, start_time, end_time):
+        """
+        Gets the values of one or more sensors between two times. The returned arrays are aligned so
+        that the n-th value of every sensor was collected at the n-th time in "time_internal_seconds".
+
+        :param sensor_names: A sensor name or a list of sensor names
+        :param start_time: The start of the range in seconds (inclusive)
+        :param end_time: The end of the range in seconds (inclusive)
+        :return: A dict of sensor name to values, including "time_internal_seconds"
+        """
+
+        with self.lock:
+            start = self.__get_index_at_time(start_time)
+            stop = self.__get_index_at_time(end_time, after=True)
+            return self.__get_aligned_values(sensor_names, start, stop)
+
+    def get_values_last_seconds(self, sensor_names, seconds):
+        """
+        Gets the values of one or more sensors from the last given number of seconds. See
+        get_values_between for how the values are aligned.
+
+        :param sensor_names: A sensor name or a list of sensor names
+        :param seconds: How many seconds back from the most recent value to get
+        :return: A dict of sensor name to values, including "time_internal_seconds"
+        """
+
+        with self.lock:
+            time_sensor = self.__data["time_internal_seconds"]
+            stop = len(time_sensor)
+            if stop == 0:
+                return self.__get_aligned_values(sensor_names, 0, 0)
+            start = self.__get_index_at_time(time_sensor.get_value(stop - 1) - seconds)
+            return self.__get_aligned_values(sensor_names, start, stop)
+
+    def get_index_range(self, sensor_name="time_internal_seconds"):
+        """
+        Gets the range of absolute indices of a sensor's values that are still stored.
+
+        :return: A tuple of (first index, index after the most recent value)
+        """
+
+        with self.lock:
+            try:
+                sensor = self.__data[sensor_name]
+                return sensor.first_index, len(sensor)
+            except KeyError:
+                logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+                return None
+
+    def get_values_by_index(self, sensor_names, start_index, stop_index):
+        """
+        Gets the values of one or more sensors that line up with the samples [start_index, stop_index)
+        of time_internal_seconds. See get_values_between for how the values are aligned.
+
+        :param sensor_names: A sensor name or a list of sensor names
+        :param start_index: The absolute index of the first sample
+        :param stop_index: The absolute index after the last sample
+        :return: A dict of sensor name to values, including "time_internal_seconds"
+        """
+
+        with self.lock:
+            stop_index = min(stop_index, len(self.__data["time_internal_seconds"]))
+            return self.__get_aligned_values(sensor_names, start_index, stop_index)
+
+    def snapshot(self, sensor_names, seconds=None):
+        """
+        Takes a consistent snapshot of one or more sensors while holding the lock only once. The
+        returned arrays are views of the stored values (see get_values_between for how they are
+        aligned), so one snapshot per frame can be used to refresh every plot.
+
+        :param sensor_names: A sensor name or a list of sensor names
+        :param seconds: How many seconds back from the most recent value to include (None for everything stored)
+        :return: A DataSnapshot
+        """
+
+        with self.lock:
+            time_sensor = self.__data["time_internal_seconds"]
+            stop = len(time_sensor)
+            if seconds is None or stop == 0:
+                start = time_sensor.first_index
+            else:
+                start = self.__get_index_at_time(time_sensor.get_value(stop - 1) - seconds)
+            values = self.__get_aligned_values(sensor_names, start, stop)
+            return DataSnapshot(self.sequence, stop, values["time_internal_seconds"], values)
+
+    def __get_index_at_time(self, seconds, after=False):
+        """
+        Binary search over the stored values of time_internal_seconds. Must be called with the lock held.
+
+        :param seconds: The time to search for
+        :param after: If True returns the index after the last sample at the given time
+        :return: The absolute index of the sample
+        """
+
+        time_sensor = self.__data["time_internal_seconds"]
+        first_index = time_sensor.first_index
+        times = time_sensor.storage.get_range(first_index, len(time_sensor))
+        if after:
+            return first_index + bisect.bisect_right(times, seconds)
+        return first_index + bisect.bisect_left(times, seconds)
+
+    def __get_aligned_values(self, sensor_names, start, stop):
+        """
+        Gets the values of each sensor that line up with the samples [start, stop) of time_internal_seconds.
+        Sensors are assumed to line up with the time sensor at their most recent value, so sensors that
+        were connected later have fewer values. Those sensors are padded with NaN at the start so that
+        every array is the same length. Must be called with the lock held.
+
+        :return: A dict of sensor name to values, including "time_internal_seconds"
+        """
+
+        if isinstance(sensor_names, str):
+            sensor_names = [sensor_names]
+        sensor_names = [sensor_name for sensor_name in sensor_names if sensor_name in self.__data]
+        if "time_internal_seconds" not in sensor_names:
+            sensor_names.append("time_internal_seconds")
+
+        time_sensor = self.__data["time_internal_seconds"]
+        num_times = len(time_sensor)
+        start = max(start, time_sensor.first_index)
+        stop = max(stop, start)
+
+        values = dict()
+        for sensor_name in sensor_names:
+            sensor = self.__data[sensor_name]
+            offset = num_times - len(sensor)
+            sensor_values = sensor.get_values(stop - offset, stop - max(start, offset + sensor.first_index))
+            if len(sensor_values) < stop - start:
+                padding = numpy.full(stop - start - len(sensor_values), numpy.nan)
+                sensor_values = numpy.concatenate((padding, sensor_values))
+            values[sensor_name] = sensor_values
+        return values
+
     def get_current_value(self, sensor_name):
         with self.lock:
             try:
@@ -142,29 +290,143 @@ class Data:
                 logger.error("Error in get_current_value for sensor {}".format(sensor_name))
                 return None
 
-    def set_current_value(self, sensor_name, value):
+    def get_current_raw_value(self, sensor_name):
         with self.lock:
             try:
-                self.__data[sensor_name].current_value = value
+                return self.__data[sensor_name].current_raw_value
+            except Exception as e:
+                logger.error(e)
+                logger.error("Error in get_current_raw_value for sensor {}".format(sensor_name))
+                return None
+
+    def set_current_value(self, sensor_name, value, apply_transfer_function=False):
+        with self.lock:
+            try:
+                if apply_transfer_function:
+                    # Converts a raw value like add_value does, without storing it
+                    self.__data[sensor_name].add_value(value, is_collecting=False)
+                else:
+                    self.__data[sensor_name].current_value = value
             except Exception as e:
                 logger.error(e)
                 logger.error("Error in set_current_value for sensor {}".format(sensor_name))
 
-    def set_sensor_scale(self, sensor_name, scale_factor):
+    def set_sensor_scale(self, sensor_name, scale_factor, recalibrate=False):
         """
-        Sets a scale factor for a sensors values. Note that this doesn't work for all sensors.
+        Sets a scale factor for a sensors values. The raw values are multiplied by it before the
+        sensor's calibration is applied. Sensors that store integers round the scaled values.
 
         :param sensor_name: The name of the sensor to set the scale factor.
         :param scale_factor: The factor to scale the sensors values by.
+        :param recalibrate: If the values that are already stored should be scaled again as well
         :return: None
         """
         with self.lock:
             try:
-                self.__data[sensor_name].scale = scale_factor
+                self.__data[sensor_name].set_calibration(scale=scale_factor, recalibrate=recalibrate)
+                self.sequence += 1
             except Exception as e:
                 logger.error(e)
                 logger.error("Error in set_sensor_scale for sensor {}".format(sensor_name))
 
+    def set_sensor_calibration(self, sensor_name, calibration, recalibrate=False):
+        """
+        Replaces the calibration of a sensor (see Calibration.py).
+
+        :param sensor_name: The name of the sensor
+        :param calibration: A Calibration or a calibration dict like the ones in SensorId
+        :param recalibrate: If the values that are already stored should be converted with the new calibration
+        :return: None
+        """
+        with self.lock:
+            try:
+                self.__data[sensor_name].set_calibration(calibration=calibration, recalibrate=recalibrate)
+                self.sequence += 1
+            except Exception as e:
+                logger.error(e)
+                logger.error("Error in set_sensor_calibration for sensor {}".format(sensor_name))
+
+    def set_keep_raw(self, sensor_names, keep_raw=True):
+        """
+        Chooses if sensors store their raw values, with the values in engineering units calculated
+        from them when they are needed. This lets a new calibration or scale be applied to a whole
+        recording (see set_sensor_scale). Any values the sensors have stored are cleared.
+
+        :param sensor_names: A list of sensor names
+        :param keep_raw: If the raw values should be stored
+        :return: None
+        """
+        with self.lock:
+            for sensor_name in sensor_names:
+                try:
+                    self.__data[sensor_name].set_keep_raw(keep_raw)
+                except KeyError:
+                    logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+                except Exception as e:
+                    logger.error(e)
+                    logger.error("Error in set_keep_raw for sensor {}".format(sensor_name))
+            self.sequence += 1
+
+    def get_keep_raw(self, sensor_name):
+        """
+        Checks if a sensor stores its raw values, see set_keep_raw.
+
+        :return: bool
+        """
+        try:
+            return self.__data[sensor_name].keep_raw
+        except KeyError:
+            logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+        except AttributeError:
+            return False
+
+    def get_can_keep_raw(self, sensor_name):
+        """
+        Checks if a sensor can store its raw values, which is every sensor converted with its calibration.
+
+        :return: bool
+        """
+        try:
+            return self.__data[sensor_name].can_keep_raw()
+        except KeyError:
+            logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+        except AttributeError:
+            return False
+
+    def get_raw_values(self, sensor_name, index, num_values):
+        """
+        Gets the raw values of a sensor that keeps them, see get_values.
+
+        :return: An array of raw values, or None if the sensor doesn't keep them
+        """
+        with self.lock:
+            try:
+                return self.__data[sensor_name].get_raw_values(index, num_values)
+            except KeyError:
+                logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+            except AttributeError:
+                logger.error("{} is derived so it doesn't have raw values".format(sensor_name))
+
+    def set_storage_backend(self, backend="array", live_window=None, chunk_size=None):
+        """
+        Selects how every sensor stores its values for the next session. Note that this clears
+        all the values that have been collected so far.
+
+        :param backend: Either "array" (preallocated NumPy arrays) or "list" (Python lists)
+        :param live_window: The maximum number of values to keep for each sensor (None keeps all values)
+        :param chunk_size: The number of values to allocate at a time (None uses the default)
+        :return: None
+        """
+
+        logger.info("Setting the storage backend to {} (live window: {})".format(backend, live_window))
+        settings = {"backend": backend, "live_window": live_window}
+        if chunk_size is not None:
+            settings["chunk_size"] = chunk_size
+        sensors = self.get_sensors(is_derived=False)
+        with self.lock:
+            for sensor in sensors:
+                self.__data[sensor].set_storage(**settings)
+
     def get_sensors(self, is_external=None, is_plottable=None, is_derived=None, is_connected=None):
         """
         Versatile function to get a list of sensors with specific attributes
@@ -250,6 +512,15 @@ class Data:
         except KeyError:
             logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
 
+    def get_dtype(self, sensor_name, raw=False):
+        logger.debug("Getting the dtype for {}".format(sensor_name))
+        try:
+            return self.__data[sensor_name].get_dtype(raw)
+        except KeyError:
+            logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+        except AttributeError:
+            return numpy.float64
+
     def get_id(self, sensor_name):
         logger.debug("Getting the sensor id for {}".format(sensor_name))
         try:
@@ -266,46 +537,35 @@ class Data:
         with self.lock:
             for sensor in sensors:
                 self.__data[sensor].reset()
+            self.sequence += 1
 
     # ---------------------------- Below are functions to only be used by DataImport ----------------------------
     def set_connected(self, sensor_id):
-        try:
-            self.__data[SensorId[sensor_id]["name"]].is_connected = True
-            logger.info("{} has been connected".format(SensorId[sensor_id]["name"]))
-        except KeyError:
-            try:
-                for key in SensorId[sensor_id]:
-                    if isinstance(key, int):
-                        self.__data[SensorId[sensor_id][key]["name"]].is_connected = True
-                        logger.info("{} has been connected".format(SensorId[sensor_id][key]["name"]))
-            except KeyError:
-                logger.error("Key error occurred in add_value for sensor with ID: {}".format(sensor_id))
-        except Exception as e:
-            logger.error(e)
-            logger.error("Error in set_connected")
+        sensors = self.__sensors_by_id.get(sensor_id)
+        if sensors is None:
+            logger.error("Key error occurred in set_connected for sensor with ID: {}".format(sensor_id))
+            return
+        for sensor in sensors:
+            sensor.is_connected = True
+            logger.info("{} has been connected".format(sensor.name))
+        self.connection_sequence += 1
 
     def set_disconnected(self, sensor_id):
-        try:
-            self.__data[SensorId[sensor_id]["name"]].is_connected = False
-            logger.info("{} has been disconnected".format(SensorId[sensor_id]["name"]))
-        except KeyError:
-            try:
-                for key in SensorId[sensor_id]:
-                    if isinstance(key, dict):
-                        self.__data[SensorId[sensor_id][key]["name"]].is_connected = False
-                        logger.info("{} has been disconnected".format(SensorId[sensor_id][key]["name"]))
-            except KeyError:
-                logger.error("Key error occurred in add_value for sensor with ID: {}".format(sensor_id))
-        except Exception as e:
-            logger.error(e)
-            logger.error("Error in set_disconnected")
+        sensors = self.__sensors_by_id.get(sensor_id)
+        if sensors is None:
+            logger.error("Key error occurred in set_disconnected for sensor with ID: {}".format(sensor_id))
+            return
+        for sensor in sensors:
+            sensor.is_connected = False
+            logger.info("{} has been disconnected".format(sensor.name))
+        self.connection_sequence += 1
 
     def pack(self, sensor_id):
         try:
-            num_bytes = SensorId[sensor_id]["num_bytes"]
+            num_bytes = sensor_registry.total_bytes[sensor_id]
             data = list()
-            data.append(int(self.__data[SensorId[sensor_id]["name"]].current_value))
-            if num_bytes is 1:
+            data.append(int(self.__sensors_by_id[sensor_id][0].current_value))
+            if num_bytes == 1:
                 data[0] = data[0] % 256
                 return bytearray(data)
         except Exception as e:
@@ -314,16 +574,116 @@ class Data:
 
     def add_value(self, sensor_id, value=None):
         # Make sure to wrap this function in the lock as it is not thread-safe
+        self.sequence += 1
+        sensors = self.__sensors_by_id.get(sensor_id)
+        if sensors is None:
+            logger.error("Key error occurred in add_value for sensor with ID: {}".format(sensor_id))
+            return
         try:
-            self.__data[SensorId[sensor_id]["name"]].add_value(value)
-        except KeyError:
-            try:
-                for i in range(len(value)):
-                    self.__data[SensorId[sensor_id][i]["name"]].add_value(value[i])
-            except KeyError:
-                logger.error("Key error occurred in add_value for sensor with ID: {}".format(sensor_id))
+            if sensor_registry.is_multi[sensor_id]:
+                for sensor, sensor_value in zip(sensors, value):
+                    sensor.add_value(sensor_value)
+            else:
+                sensors[0].add_value(value)
         except Exception as e:
             logger.error(e)
             logger.error("Error in add_value")
 
+    def add_values(self, sensor_id, values, apply_transfer_function=True):
+        """
+        Adds a block of values for a sensor id at once. Make sure to wrap this function in the lock
+        as it is not thread-safe.
+
+        :param sensor_id: The id of the sensor from SensorId
+        :param values: An array of values, or a list of arrays if the id has multiple sensors
+        :param apply_transfer_function: If the sensors' transfer functions should be applied to the values
+        :return: None
+        """
+
+        self.sequence += 1
+        sensors = self.__sensors_by_id.get(sensor_id)
+        if sensors is None:
+            logger.error("Key error occurred in add_values for sensor with ID: {}".format(sensor_id))
+            return
+        try:
+            if sensor_registry.is_multi[sensor_id]:
+                for sensor, sensor_values in zip(sensors, values):
+                    sensor.add_values(sensor_values, apply_transfer_function)
+            else:
+                sensors[0].add_values(values, apply_transfer_function)
+        except Exception as e:
+            logger.error(e)
+            logger.error("Error in add_values")
+
+    def add_packet(self, layout, values, stamped_sensor_ids=()):
+        """
+        Adds every value of a decoded data packet at once. Make sure to wrap this function in the lock
+        as it is not thread-safe.
+
+        :param layout: The PacketLayout the packet was decoded with
+        :param values: The value of every column of the layout (from PacketLayout.unpack)
+        :param stamped_sensor_ids: A tuple of sensor ids that get a value with every packet without being in it (i.e. the internal, output and removed sensors)
+        :return: None
+        """
+
+        self.sequence += 1
+        is_collecting = self.is_data_collecting.is_set()
+        for sensor, value in zip(self.__get_packet_sensors(layout), values):
+            sensor.add_value(value, is_collecting)
+        for sensor in self.__get_stamped_sensors(stamped_sensor_ids):
+            sensor.stamp_values(1, is_collecting)
+
+    def add_block(self, layout, columns, stamped_sensor_ids=()):
+        """
+        Adds a block of decoded data packets at once. Make sure to wrap this function in the lock
+        as it is not thread-safe.
+
+        :param layout: The PacketLayout the packets were decoded with
+        :param columns: An array of values for every column of the layout (from PacketLayout.unpack_block)
+        :param stamped_sensor_ids: A tuple of sensor ids that get a value with every packet without being in it, time_internal_seconds is read once for the whole block
+        :return: None
+        """
+
+        if len(columns) == 0 or len(columns[0]) == 0:
+            return
+        self.sequence += 1
+        is_collecting = self.is_data_collecting.is_set()
+        for sensor, values in zip(self.__get_packet_sensors(layout), columns):
+            sensor.add_values(values, is_collecting=is_collecting)
+        for sensor in self.__get_stamped_sensors(stamped_sensor_ids):
+            sensor.stamp_values(len(columns[0]), is_collecting)
+
+    def __get_packet_sensors(self, layout):
+        sensors = self.__packet_sensors.get(layout.sensor_ids)
+        if sensors is None:
+            sensors = tuple(self.__sensors_by_id[sensor_id][value_index or 0]
+                            for sensor_id, value_index, num_bytes, is_float in layout.fields)
+            self.__packet_sensors[layout.sensor_ids] = sensors
+        return sensors
+
+    def __get_stamped_sensors(self, sensor_ids):
+        sensors = self.__stamped_sensors.get(sensor_ids)
+        if sensors is None:
+            sensors = tuple(sensor for sensor_id in sensor_ids for sensor in self.__sensors_by_id.get(sensor_id, ()))
+            self.__stamped_sensors[sensor_ids] = sensors
+        return sensors
+
+    def add_values_by_name(self, sensor_name, values, apply_transfer_function=True):
+        """
+        Adds a block of values to a single sensor by its name. Make sure to wrap this function in the lock
+        as it is not thread-safe.
+
+        :param sensor_name: The name of the sensor
+        :param values: An array of values
+        :param apply_transfer_function: If the sensor's transfer function should be applied to the values
+        :return: None
+        """
 
+        self.sequence += 1
+        try:
+            self.__data[sensor_name].add_values(values, apply_transfer_function)
+        except KeyError:
+            logger.error("The sensor {} does not exist, check your spelling".format(sensor_name))
+        except Exception as e:
+            logger.error(e)
+            logger.error("Error in add_values_by_name")
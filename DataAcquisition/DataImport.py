@@ -5,16 +5,23 @@ import serial
 from serial.serialutil import EIGHTBITS
 from serial.tools import list_ports
 from serial.serialutil import SerialException
-from DataAcquisition.ComPortUtil import ListPortsDialog
 import time
 from datetime import datetime
 import logging
 import random
 import math
 import struct
+import numpy
 
 from DataAcquisition.Data import Data
-from DataAcquisition.SensorId import SensorId
+from DataAcquisition.SensorRegistry import sensor_registry
+from DataAcquisition.FrameReader import FrameReader, END_CODE
+from DataAcquisition.PacketLayout import PacketLayout
+from DataAcquisition.BinDecoder import decode_bin_file
+from DataAcquisition.CsvDecoder import decode_csv_file
+from DataAcquisition.RawCapture import RawCapture
+from DataAcquisition.SessionFile import SessionReader
+from DataAcquisition.AcquisitionMetrics import metrics
 
 logger = logging.getLogger("DataImport")
 
@@ -32,6 +39,7 @@ class DataImport:
         self.is_data_collecting = is_data_collecting
         self.input_mode = ""
         self.data_file = None
+        self.import_directory = None    # A BIN or CSV file to import all at once
 
         # Connect to the Teensy
         self.teensy_found = False
@@ -40,9 +48,17 @@ class DataImport:
         #self.connect_serial() #being called too soon.
 
         # Variables that are used for reading/parsing incoming packets
-        self.end_code = [b'\xff', b'\xff', b'\xff', b'\xff', b'\xff', b'\xff', b'\xff', b'\xf0']
+        self.end_code = END_CODE
+        self.frame_reader = FrameReader(self.end_code)
         self.current_sensors = []
-        self.current_packet = []
+        self.packet_layout = PacketLayout(self.current_sensors)
+
+        # Every frame received over serial is also written to a raw capture file that can be replayed as a BIN file
+        self.raw_capture_enabled = True
+        self.raw_capture = RawCapture()
+
+        # Read the serial port in a separate acquisition process (see AcquisitionProcess), set DAATA_ACQUISITION_PROCESS=1 to use it
+        self.use_acquisition_process = os.environ.get("DAATA_ACQUISITION_PROCESS", "") == "1"
         self.ack_code = 0
         self.packet_index = 0
         self.expected_size = 0
@@ -90,19 +106,22 @@ class DataImport:
             self.data.is_connected = False
             return False
 
-    def connect_serial(self):
+    def connect_serial(self, port=None):
         """
-        Connects to the Teensy over serial with the given COM port from the selected input mode.
+        Connects to the Teensy over serial with the given COM port from the selected input mode. The
+        port can also be a pyserial URL (i.e. socket://localhost:7777 for the Teensy simulator).
 
+        :param port: The port to connect to, defaults to the current input mode
         :return: None
         """
 
         try:
-            self.teensy_port = self.input_mode
-            self.teensy_ser = serial.Serial(baudrate=115200, port=self.teensy_port, timeout=2,
-                                            write_timeout=1)
+            self.teensy_port = self.input_mode if port is None else port
+            self.teensy_ser = serial.serial_for_url(self.teensy_port, baudrate=115200, timeout=0.1,
+                                                    write_timeout=1)
             logger.info("Teensy found on port {}".format(self.teensy_ser.port))
             self.teensy_found = True
+            metrics.reset()
         except Exception as e:
             self.teensy_found = False
             logger.error(e)
@@ -110,37 +129,70 @@ class DataImport:
 
         
 
-    def read_packet(self):
+    def read_packet(self, block=False):
         """
         Manages all incoming data on the Serial port and in a BIN file and detects 
-        when a full packet has been received so that it can be parsed.
+        when a full packet has been received so that it can be parsed. Everything that
+        is waiting is read at once and every complete packet is then unpacketized.
 
+        :param block: If nothing is waiting on the Serial port, wait up to its timeout for data
         :return: None
         """
 
-        while self.teensy_ser != None or self.data_file != None:  # if there are bytes waiting in input buffer
-            if self.teensy_found and self.teensy_ser.in_waiting != 0:
-                self.current_packet.append(self.teensy_ser.read(1))  # read in a single byte from COM
-            elif self.data_file != None and self.data_file.readable():                
-                byte = self.data_file.read(1)
-                if not byte:
-                    logger.info("Finished BIN file parsing")
-                    self.input_mode = ""
-                    break                
-                self.current_packet.append(byte)   # read in a single byte from file                
-            else:
-                break
-            packet_length = len(self.current_packet)
-            if packet_length > 8:
-                # If end code is found then unpacketize and clear packet
-                end_code_match = False
-                if self.current_packet[(packet_length - 8):(packet_length)] == self.end_code:
-                    end_code_match = True
-                if end_code_match:                    
-                    self.current_packet = self.current_packet[0:(packet_length - 8)]                    
-                    self.unpacketize()
-                    self.current_packet.clear()
+        if self.teensy_found and self.teensy_ser is not None:
+            num_bytes = self.frame_reader.read_serial(self.teensy_ser, block)
+            if num_bytes == 0:
+                return
+        elif self.data_file is not None and self.data_file.readable():
+            num_bytes = self.frame_reader.read_file(self.data_file)
+            if num_bytes == 0:
+                logger.info("Finished BIN file parsing")
+                self.input_mode = ""
+                return
+        else:
+            return
+
+        is_capturing = self.raw_capture.is_open and self.teensy_found
+        num_packets = 0
+        data_packets = list()
+        for packet in self.frame_reader.frames():
+            if is_capturing:
+                self.raw_capture.write(packet)
+            num_packets += 1
+            # Runs of data packets with the expected size are decoded together, anything else is handled in order
+            if self.expected_size and len(packet) == self.expected_size + 1 and packet[0] in (0x02, 0x03):
+                data_packets.append(bytes(packet))
+                continue
+            if data_packets:
+                self.unpacketize_block(data_packets)
+                data_packets = list()
+            self.unpacketize(packet)
+        if data_packets:
+            self.unpacketize_block(data_packets)
+        metrics.add_packets(num_packets, num_bytes)
     
+    def start_raw_capture(self):
+        """
+        Starts writing every frame received from the Teensy to a new raw capture file.
+
+        :return: The path of the capture file, or None if capturing is disabled or failed
+        """
+
+        if not self.raw_capture_enabled:
+            return None
+        # URLs like socket://localhost:7777 have characters that can't be in a file name
+        port_name = "".join(c if c.isalnum() else "_" for c in os.path.basename(str(self.teensy_port)))
+        return self.raw_capture.open(port_name)
+
+    def stop_raw_capture(self):
+        """
+        Finishes writing the raw capture file.
+
+        :return: None
+        """
+
+        self.raw_capture.close()
+
     def open_bin_file(self, dir):
         """
         Opens the BIN file specified by the given directory and stores it.
@@ -150,48 +202,43 @@ class DataImport:
 
         self.data_file = open(dir, "rb")
 
-    def import_csv(self, directory):
+    def import_bin(self, directory):
         """
-        Opens and parses a CSV file using the given directory and stores the values using
-        the data object for each sensor in the file.
+        Decodes an entire BIN file at once (instead of replaying it packet by packet) and stores the
+        values using the data object.
+
+        :return: A dict of statistics about the decode
+        """
+
+        return decode_bin_file(directory, self.data, self.lock)
+
+    def import_session(self, directory):
+        """
+        Loads a session file written by write_session. Each column is read from the file only when it
+        is added to the data object.
 
         :return: None
         """
 
-        csvFile = open(directory,'r' )
-        csvReader = csv.reader(csvFile, dialect='excel', lineterminator = '\n')
-        sensorList = csvReader.__next__()
-        idList = [self.data.get_id(name) for name in sensorList]
-        idSet = set(idList)
-        for id in idSet:
-            if id != None:
-                self.data.set_connected(id)
-        for dataLine in csvReader:
-            pushID = 0
-            valuesToPush = []
-            valueToPush = 0
-            x = 0
-            while x < len(idList):
-                if idList[x] == None: 
-                        if x < len(idList):
-                            x+=1
-                elif x == len(idList) - 1:
-                    self.data.add_value(idList[x], dataLine[x])
-                elif idList[x] == idList[x+1]:
-                    pushID = idList[x]
-                    valuesToPush = []
-                    valuesToPush.append(dataLine[x])
-                    while x < len(idList) and idList[x] == idList[x+1]:
-                        x+=1
-                        valuesToPush.append(dataLine[x])
-                    self.data.add_value(pushID,valuesToPush)
-                    
-                    x+=1
-                else:
-                    pushID = idList[x]
-                    valueToPush = dataLine[x]
-                    self.data.add_value(pushID,valueToPush)
-                    x+=1   
+        with SessionReader(directory) as session:
+            with self.lock:
+                for sensor_name in session.sensor_names:
+                    sensor_id = session.get_info(sensor_name)["id"]
+                    if sensor_id is not None:
+                        self.data.set_connected(sensor_id)
+                    self.data.add_values_by_name(sensor_name, session.get_column(sensor_name),
+                                                 apply_transfer_function=False)
+            logger.info("Loaded {} sensors and {} samples from {}".format(
+                len(session.sensor_names), session.num_samples, directory))
+
+    def import_csv(self, directory):
+        """
+        Loads a CSV file that was exported by DAATA, see decode_csv_file.
+
+        :return: A dict of statistics about the load
+        """
+
+        return decode_csv_file(directory, self.data, self.lock)
 
     def send_packet(self):
         """
@@ -246,7 +293,7 @@ class DataImport:
                 settings = b''
                 for sensor_id in self.output_sensors:
                     try:
-                        num_bytes = SensorId[sensor_id]['num_bytes']
+                        num_bytes = sensor_registry.total_bytes[sensor_id]
                     except KeyError as e:
                         logger.error(e)
                         logger.error("Error in packetize with ack 1")
@@ -263,7 +310,7 @@ class DataImport:
                 settings = b''
                 for sensor_id in self.output_sensors:
                     try:
-                        num_bytes = SensorId[sensor_id]['num_bytes']
+                        num_bytes = sensor_registry.total_bytes[sensor_id]
                     except KeyError as e:
                         logger.error(e)
                         logger.error("Error in packetize with ack 0")
@@ -275,21 +322,57 @@ class DataImport:
                 self.settings_counter = self.settings_counter + 1
                 return None
 
-    def unpacketize(self):
+    def get_stamped_sensors(self):
+        """
+        Gets the sensors that get a value with every data packet without being part of it.
+
+        :return: A tuple of the output, internal and removed sensor ids
+        """
+
+        return tuple(self.output_sensors) + tuple(self.internal_sensors) + tuple(self.removed_sensors)
+
+    def unpacketize_block(self, packets):
+        """
+        Decodes a run of data packets that all match the current settings in one go and adds them
+        with Data.add_block. This is the same as calling unpacketize on each packet.
+
+        :param packets: A list of data packets (bytes) with the ack code and without the end code
+        :return: None
+        """
+
+        self.ack_code = packets[-1][0]
+        self.is_sending_data = self.ack_code == 0x03
+        wait_start = time.perf_counter()
+        with self.lock:
+            decode_start = time.perf_counter()
+            metrics.lock_wait.add(decode_start - wait_start)
+            try:
+                raw = numpy.frombuffer(b''.join(packets), dtype=numpy.uint8).reshape(len(packets), -1)
+                columns = self.packet_layout.unpack_block(numpy.ascontiguousarray(raw[:, 1:]))
+                self.data.add_block(self.packet_layout, columns, self.get_stamped_sensors())
+                metrics.data_packets += len(packets)
+                metrics.decode_time.add((time.perf_counter() - decode_start) / len(packets), len(packets))
+            except Exception as e:
+                logger.error(e)
+                logger.error("Error reading data from teensy")
+
+    def unpacketize(self, packet):
         """
         unpacketize is the function that is called when a full packet has been received. This function will parse
         the packet and will either store the received settings or data based on what type of packet was received.
 
+        :param packet: A bytes-like object containing the packet without its end code
         :return: None
         """
 
-        self.ack_code = int.from_bytes(self.current_packet[0],
-                                       "little")  # Convert byte string to int for comparison
-        debug_data = list()
-        for data_val in self.current_packet:
-            debug_data.append(hex(int.from_bytes(data_val, "little")))
-        logger.debug(debug_data)
-        self.current_packet.pop(0)  # Remove the ack code from the packet
+        if len(packet) == 0:
+            logger.warning("Received an empty packet")
+            return
+
+        self.ack_code = packet[0]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug([hex(data_val) for data_val in packet])
+        offset = 1  # Skip over the ack code
 
         if self.ack_code == 0x01 or self.ack_code == 0x03:
             self.is_sending_data = True
@@ -300,54 +383,26 @@ class DataImport:
         # if 0x02, then parse data but send settings
         # if 0x03, then parse data and send data
         if self.ack_code == 0x02 or self.ack_code == 0x03:
+            wait_start = time.perf_counter()
             with self.lock:
+                decode_start = time.perf_counter()
+                metrics.lock_wait.add(decode_start - wait_start)
                 # logger.debug("Received data and will now parse")
                 try:
-                    assert len(self.current_packet) == self.expected_size
-                    for sensor_id in self.current_sensors:
-                        if isinstance(SensorId[sensor_id]["num_bytes"], list):
-                            data_value = []
-                            for sensor in range(len(SensorId[sensor_id]["num_bytes"])):
-                                individual_data_value = b''
-                                for i in range(SensorId[sensor_id]["num_bytes"][sensor]):
-                                    individual_data_value += self.current_packet[0]
-                                    self.current_packet.pop(0)
-                                # Branch if the value is a float by checking SensorID
-                                try:
-                                    if SensorId[sensor_id][sensor]["is_float"]:
-                                        data_value.append(struct.unpack('f', individual_data_value)[0])
-                                    else:
-                                        data_value.append(int.from_bytes(individual_data_value, "little"))
-                                except KeyError:
-                                    data_value.append(int.from_bytes(individual_data_value, "little"))
-                        else:
-                            data_value = b''
-                            for i in range(SensorId[sensor_id]["num_bytes"]):
-                                data_value += self.current_packet[0]
-                                self.current_packet.pop(0)
-                            # Branch if the value is a float by checking SensorID
-                            try:
-                                if SensorId[sensor_id]["is_float"]:
-                                    data_value = struct.unpack('f', data_value)[0]
-                                else:
-                                    data_value = int.from_bytes(data_value, "little")
-                            except KeyError:
-                                data_value = int.from_bytes(data_value, "little")
-
-                        self.data.add_value(sensor_id, data_value)
-
-                    # Add values for internal, output, and removed sensors
-                    for sensor_id in self.output_sensors:
-                        self.data.add_value(sensor_id)
-                    for sensor_id in self.internal_sensors:
-                        self.data.add_value(sensor_id)
-                    for sensor_id in self.removed_sensors:
-                        self.data.add_value(sensor_id, None)
-
+                    assert len(packet) - offset == self.expected_size
+                    metrics.data_packets += 1
+                    # Internal, output, and removed sensors get a value with every packet as well
+                    self.data.add_packet(self.packet_layout, self.packet_layout.unpack(packet, offset),
+                                         self.get_stamped_sensors())
+                    metrics.decode_time.add(time.perf_counter() - decode_start)
                 except AssertionError:
                     logger.warning("Packet size is different than expected")
+                    metrics.size_mismatches += 1
                     self.is_receiving_data = False
-                    self.teensy_ser.flushInput()
+                    if self.teensy_ser is not None:
+                        self.teensy_ser.flushInput()
+                        self.frame_reader.clear()
+                        metrics.resyncs += 1
                 except Exception as e:
                     logger.error(e)
                     logger.error("Error reading data from teensy")
@@ -356,6 +411,7 @@ class DataImport:
         # if 0x01, then parse settings and send data
         elif self.ack_code == 0x00 or self.ack_code == 0x01:
             logger.info("Settings are being received")
+            metrics.settings_packets += 1
 
             # Sets sensors from previous settings to disconnected
             for sensor_id in self.current_sensors:
@@ -366,13 +422,10 @@ class DataImport:
 
             try:
                 this_sensor_id = None
-                for i in range(0, len(self.current_packet), 3):
-                    this_sensor_id = int.from_bytes(self.current_packet[i] + self.current_packet[i + 1], "little")
-                    if type(SensorId[this_sensor_id]["num_bytes"]) == type(list()):
-                        num_bytes = sum(SensorId[this_sensor_id]["num_bytes"])
-                    else:
-                        num_bytes = SensorId[this_sensor_id]["num_bytes"]
-                    assert int.from_bytes(self.current_packet[i + 2], "little") == num_bytes
+                for i in range(offset, len(packet), 3):
+                    this_sensor_id = int.from_bytes(packet[i:i + 2], "little")
+                    num_bytes = sensor_registry.total_bytes[this_sensor_id]
+                    assert packet[i + 2] == num_bytes
 
                     self.current_sensors.append(this_sensor_id)
                     self.data.set_connected(this_sensor_id)
@@ -381,11 +434,15 @@ class DataImport:
                     self.is_receiving_data = True
                 logger.info("Received settings of length: {}".format(self.expected_size))
             except AssertionError:
-                logger.error("Expected {} bytes from block_id: {} but got {} bytes.".format(num_bytes, this_sensor_id, int.from_bytes(self.current_packet[i + 2], "little")))
+                logger.error("Expected {} bytes from block_id: {} but got {} bytes.".format(num_bytes, this_sensor_id, packet[i + 2]))
             except KeyError as e:
                 logger.error("May have received the erroneous block_id: {}".format(this_sensor_id))
+
+            # Compile the layout once so that every data packet can be decoded in a single call
+            self.packet_layout = PacketLayout(self.current_sensors)
         else:
             logger.error("The ack code that was received was not a valid value")
+            metrics.unknown_acks += 1
 
     def attach_output_sensor(self, sensor_id):
         """
@@ -397,7 +454,7 @@ class DataImport:
 
         with self.lock:
             try:
-                assert sensor_id in SensorId.keys()
+                assert sensor_id in sensor_registry
                 if sensor_id in self.output_sensors:
                     logger.warning("Attempted attaching output sensor with id {}. This sensor is already attached.".format(sensor_id))
                 elif sensor_id in self.internal_sensors:
@@ -422,7 +479,7 @@ class DataImport:
 
         with self.lock:
             try:
-                assert sensor_id in SensorId.keys()
+                assert sensor_id in sensor_registry
                 self.data.set_disconnected(sensor_id)
                 if sensor_id in self.output_sensors:
                     self.output_sensors.remove(sensor_id)
@@ -443,7 +500,7 @@ class DataImport:
 
         with self.lock:
             try:
-                assert sensor_id in SensorId.keys()
+                assert sensor_id in sensor_registry
                 if sensor_id in self.internal_sensors:
                     logger.warning("Attempted attaching internal sensor with id {}. This sensor is already attached.".format(sensor_id))
                 elif sensor_id in self.output_sensors:
@@ -466,7 +523,7 @@ class DataImport:
 
         with self.lock:
             try:
-                assert sensor_id in SensorId.keys()
+                assert sensor_id in sensor_registry
                 self.data.set_disconnected(sensor_id)
                 if sensor_id in self.internal_sensors:
                     self.internal_sensors.remove(sensor_id)
@@ -0,0 +1,72 @@
+import bisect
+
+
+class DataSnapshot:
+    """
+    A consistent view of some of the sensors at one point in time, made by Data.snapshot while
+    holding the lock once. The values are views of the sensors' storage, so a snapshot is cheap to
+    make and is safe to read from the GUI thread while the reader thread keeps adding values.
+
+    Every array lines up with the shared time column (see Data.get_values_between), which is also
+    included in values as "time_internal_seconds".
+    """
+
+    def __init__(self, sequence, end_index, time, values):
+        self.sequence = sequence    # Data.sequence when the snapshot was made
+        self.end_index = end_index  # Absolute index after the last sample of time_internal_seconds
+        self.time = time
+        self.values = values
+
+    def __contains__(self, sensor_name):
+        return sensor_name in self.values
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def start_index(self):
+        """
+        The absolute index of the first sample in the snapshot.
+
+        :return: int
+        """
+
+        return self.end_index - len(self.time)
+
+    @property
+    def latest_time(self):
+        """
+        The most recent value of time_internal_seconds in the snapshot.
+
+        :return: The time in seconds or None if there are no samples
+        """
+
+        if len(self.time) == 0:
+            return None
+        return self.time[-1]
+
+    def get_values(self, sensor_name):
+        """
+        Gets every value of a sensor in the snapshot.
+
+        :return: The values or None if the sensor isn't part of the snapshot
+        """
+
+        return self.values.get(sensor_name, None)
+
+    def get_values_last_seconds(self, sensor_name, seconds):
+        """
+        Gets the values of a sensor from the last given number of seconds of the snapshot.
+
+        :param sensor_name: The name of the sensor
+        :param seconds: How many seconds back from the most recent value to get
+        :return: A tuple of (times, values) or (times, None) if the sensor isn't part of the snapshot
+        """
+
+        if len(self.time) == 0:
+            return self.time, self.values.get(sensor_name, None)
+        start = bisect.bisect_left(self.time, self.time[-1] - seconds)
+        values = self.values.get(sensor_name, None)
+        if values is not None:
+            values = values[start:]
+        return self.time[start:], values
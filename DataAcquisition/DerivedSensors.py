@@ -1,12 +1,23 @@
-from abc import ABCMeta, abstractmethod, abstractproperty
+from abc import ABCMeta, abstractmethod
 import logging
 import math
+import numpy
+
+from DataAcquisition.SensorStorage import ArrayStorage
+from DataAcquisition.SensorExpression import compile_expression
 
 
 logger = logging.getLogger("DataAcquisition")
 
 
 class DerivedSensor(metaclass=ABCMeta):
+    """
+    Base class for sensors that are calculated from other sensors. The values are calculated with
+    compute(), a vectorized NumPy expression over the input sensors' values, and are kept in a cache
+    so that only the values that were added to the inputs since the last call have to be calculated.
+    The cache is thrown away whenever one of the inputs is reset (its generation changes).
+    """
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name')
         self.display_name = kwargs.get('display_name')
@@ -15,22 +26,105 @@ class DerivedSensor(metaclass=ABCMeta):
         self.is_plottable = kwargs.get('is_plottable', True)
         self.is_external = kwargs.get('is_external', True)  # If it relies on external sensors consider it external
         self.is_derived = True
+        self.input_sensors = list()     # The sensors that this sensor is derived from
+        self.generation = 0             # Incremented whenever the cache is thrown away
+        self._cache = None
+        self._cache_generations = None
+
+    def __len__(self):
+        return min([len(sensor) for sensor in self.input_sensors], default=0)
+
+    @property
+    def first_index(self):
+        return max([sensor.first_index for sensor in self.input_sensors], default=0)
+
+    @property
+    def most_recent_index(self):
+        return max(len(self) - 1, 0)
+
+    @property
+    def live_window(self):
+        """
+        The smallest live window of the input sensors, so the cache never keeps more values than they do.
+
+        :return: int or None if every input keeps all of its values
+        """
+
+        live_windows = [sensor.live_window if sensor.is_derived else getattr(sensor.storage, "live_window", None)
+                        for sensor in self.input_sensors]
+        return min([live_window for live_window in live_windows if live_window is not None], default=None)
 
     @abstractmethod
-    def get_value(self, index):
+    def compute(self, *inputs):
+        """
+        Calculates the values of the sensor from the values of the input sensors.
+
+        :param inputs: A float64 array (or 0-d array) of values for every input sensor, in order
+        :return: numpy.ndarray
+        """
+
         raise NotImplementedError
 
-    @abstractmethod
+    def invalidate(self):
+        """
+        Throws away the cached values so that they are calculated again, i.e. after a parameter changes.
+
+        :return: None
+        """
+
+        self._cache = None
+
+    def update_cache(self):
+        """
+        Calculates the values for every sample that was added to the input sensors since the last update.
+
+        :return: None
+        """
+
+        for sensor in self.input_sensors:
+            if sensor.is_derived:
+                sensor.update_cache()
+
+        generations = tuple(sensor.generation for sensor in self.input_sensors)
+        first_index = self.first_index
+        if self._cache is None or generations != self._cache_generations or len(self._cache) < first_index:
+            self._cache = ArrayStorage(numpy.float64, live_window=self.live_window)
+            self._cache.start_at(first_index)
+            self._cache_generations = generations
+            self.generation += 1
+
+        stop = len(self)
+        num_new = stop - len(self._cache)
+        if num_new > 0:
+            inputs = [numpy.asarray(sensor.get_values(stop, num_new), dtype=numpy.float64)
+                      for sensor in self.input_sensors]
+            self._cache.extend(self.compute(*inputs))
+
+    def get_value(self, index):
+        self.update_cache()
+        try:
+            return self._cache.get(index)
+        except IndexError:
+            logger.error("Index: {} out of range, use get_most_recent_index to ensure that the index exists".format(index))
+            return None
+
     def get_values(self, index, num_values):
-        raise NotImplementedError
+        self.update_cache()
+        if index - num_values >= self._cache.first_index:
+            return self._cache.get_range(index - num_values, index)
+        logger.debug("Tried to get more values than are contained, returning all values")
+        return self._cache.get_range(self._cache.first_index, index)
 
-    @abstractproperty
+    @property
     def is_connected(self):
-        raise NotImplementedError
+        return all(sensor.is_connected for sensor in self.input_sensors)
 
-    @abstractproperty
+    @property
     def current_value(self):
-        raise NotImplementedError
+        values = [sensor.current_value for sensor in self.input_sensors]
+        if any(value is None for value in values):
+            return None
+        return float(self.compute(*[numpy.asarray(value, dtype=numpy.float64) for value in values]))
 
 
 """
@@ -42,9 +136,16 @@ found in the SensorId.h file in the comms utility (DAQ>Libraries>Sensor).
 Then add all the required parameters for that sensor along with any 
 additional optional parameters.
 
+Most derived sensors only need an expression, an arithmetic expression written
+in Python syntax over the names of other sensors (including other derived
+sensors), ex. 'force_enginedyno_lbs * 8/12'. The sensors it uses are found
+from the expression, and the functions that can be called are listed in
+SensorExpression.expression_functions. Sensors that need more than an
+expression can still use one of the classes below with an object and sensors.
+
 Required parameters:
-    - object
-    - sensors (must be a list, even if only one sensor needed)
+    - expression, or
+    - object and sensors (sensors must be a list, even if only one sensor needed)
 
 Optional parameters:
     - display_name   (defaults to None)
@@ -53,6 +154,7 @@ Optional parameters:
     - is_plottable   (defaults to True)
 
 Current classes:
+    - Expression (used when an expression is given)
     - dashboard
     - aux_daq
     - differential
@@ -63,10 +165,10 @@ Current classes:
 """
 derived_sensors = {
     'dyno_torque_ftlbs': {
-        'object': 'Torque',
-        'sensors': ['force_enginedyno_lbs'],
+        'expression': 'force_enginedyno_lbs * 8/12',  # Since the lever arm is 8" away
         'display_name': "Dyno Torque",
-        'transfer_function': 8/12  # Since the lever arm is 8" away
+        'unit': 'Foot-Pounds',
+        'unit_short': 'ft-lbs'
     },
     'power_engine_horsepower': {
         'object': 'MechanicalPower',
@@ -81,6 +183,17 @@ derived_sensors = {
 }
 
 
+class Expression(DerivedSensor):
+    def __init__(self, input_sensors, **kwargs):
+        super().__init__(**kwargs)
+        self.expression = compile_expression(kwargs['expression'])
+        self.input_sensors = list(input_sensors)
+
+    def compute(self, *inputs):
+        # Constant expressions don't depend on the shape of the inputs, so broadcast them
+        return numpy.broadcast_to(self.expression(*inputs), numpy.shape(inputs[0]) if inputs else ())
+
+
 class WheelSpeed(DerivedSensor):
     def __init__(self, secondary_speed, **kwargs):
         super().__init__(**kwargs)
@@ -88,21 +201,11 @@ class WheelSpeed(DerivedSensor):
         self.unit = 'Revolutions Per Minute'
         self.unit_short = 'RPM'
         self.secondary_speed = secondary_speed
+        self.input_sensors = [secondary_speed]
         self.gearbox_ratio = 0  # TODO: Need to get the gearbox ratio
 
-    def get_value(self, index):
-        return self.secondary_speed.get_value(index) * self.gearbox_ratio
-
-    def get_values(self, index, num_values):
-        return [value * self.gearbox_ratio for value in self.secondary_speed.get_values(index, num_values)]
-
-    @property
-    def is_connected(self):
-        return self.secondary_speed.is_connected
-
-    @property
-    def current_value(self):
-        return self.secondary_speed.current_value * self.gearbox_ratio
+    def compute(self, secondary_speed):
+        return secondary_speed * self.gearbox_ratio
 
 
 class CarSpeed(DerivedSensor):
@@ -112,21 +215,11 @@ class CarSpeed(DerivedSensor):
         self.unit = 'Miles Per Hour'
         self.unit_short = 'MPH'
         self.secondary_speed = secondary_speed
+        self.input_sensors = [secondary_speed]
         self.transfer_function = 0  # TODO: Need to get the transfer function
 
-    def get_value(self, index):
-        return self.secondary_speed.get_value(index) * self.transfer_function
-
-    def get_values(self, index, num_values):
-        return [value * self.transfer_function for value in self.secondary_speed.get_values(index, num_values)]
-
-    @property
-    def is_connected(self):
-        return self.secondary_speed.is_connected
-
-    @property
-    def current_value(self):
-        return self.secondary_speed.current_value * self.transfer_function
+    def compute(self, secondary_speed):
+        return secondary_speed * self.transfer_function
 
 
 class Torque(DerivedSensor):
@@ -136,21 +229,11 @@ class Torque(DerivedSensor):
         self.unit = kwargs.get('unit', 'Foot-Pounds')
         self.unit_short = kwargs.get('unit', 'ft-lbs')
         self.force_lbs = force_lbs
+        self.input_sensors = [force_lbs]
         self.transfer_function = kwargs.get('transfer_function', 1)
 
-    def get_value(self, index):
-        return self.force_lbs.get_value(index) * self.transfer_function
-
-    def get_values(self, index, num_values):
-        return [value * self.transfer_function for value in self.force_lbs.get_values(index, num_values)]
-
-    @property
-    def is_connected(self):
-        return self.force_lbs.is_connected
-
-    @property
-    def current_value(self):
-        return self.force_lbs.current_value * self.transfer_function
+    def compute(self, force_lbs):
+        return force_lbs * self.transfer_function
 
 
 class MechanicalPower(DerivedSensor):
@@ -161,22 +244,11 @@ class MechanicalPower(DerivedSensor):
         self.unit_short = kwargs.get('unit', 'HP')
         self.torque_ftlbs = torque_ftlbs
         self.speed_rpm = speed_rpm
+        self.input_sensors = [torque_ftlbs, speed_rpm]
         self.transfer_function = kwargs.get('transfer_function', 1/5252)  # HP = RPM * Torque / 5252
 
-    def get_value(self, index):
-        return self.torque_ftlbs.get_value(index) * self.speed_rpm.get_value(index) * self.transfer_function
-
-    def get_values(self, index, num_values):
-        return [force * rpm * self.transfer_function for force, rpm in
-                zip(self.torque_ftlbs.get_values(index, num_values), self.speed_rpm.get_values(index, num_values))]
-
-    @property
-    def is_connected(self):
-        return self.torque_ftlbs.is_connected and self.speed_rpm.is_connected
-
-    @property
-    def current_value(self):
-        return self.torque_ftlbs.current_value * self.speed_rpm.current_value * self.transfer_function
+    def compute(self, torque_ftlbs, speed_rpm):
+        return torque_ftlbs * speed_rpm * self.transfer_function
 
 
 class Ratio(DerivedSensor):
@@ -187,31 +259,12 @@ class Ratio(DerivedSensor):
         self.unit_short = kwargs.get('unit', None)
         self.input_speed_rpm = input_speed_rpm
         self.output_speed_rpm = output_speed_rpm
+        self.input_sensors = [input_speed_rpm, output_speed_rpm]
         self.transfer_function = kwargs.get('transfer_function', 1)
 
-    def get_value(self, index):
-        if self.output_speed_rpm.get_value(index) == 0:
-            return 10e6
-        return self.input_speed_rpm.get_value(index) / self.output_speed_rpm.get_value(index) * self.transfer_function
-
-    def get_values(self, index, num_values):
-        values = list()
-        for input_speed, output_speed in zip(self.input_speed_rpm.get_values(index, num_values),
-                                             self.output_speed_rpm.get_values(index, num_values)):
-            if output_speed == 0:
-                values.append(10e6)
-            else:
-                values.append(input_speed/output_speed * self.transfer_function)
-        return values
-
-    @property
-    def is_connected(self):
-        return self.input_speed_rpm.is_connected and self.output_speed_rpm.is_connected
-
-    @property
-    def current_value(self):
-        if self.output_speed_rpm.current_value == 0:
-            return 10e6
-        return self.input_speed_rpm.current_value / self.output_speed_rpm.current_value * self.transfer_function
-
-
+    def compute(self, input_speed_rpm, output_speed_rpm):
+        # Stand in a large ratio wherever the output isn't moving instead of dividing by zero
+        ratio = numpy.full(numpy.shape(input_speed_rpm), 10e6)
+        numpy.divide(input_speed_rpm * self.transfer_function, output_speed_rpm, out=ratio,
+                     where=output_speed_rpm != 0)
+        return ratio
@@ -0,0 +1,136 @@
+import logging
+
+logger = logging.getLogger("DataImport")
+
+# Every packet sent between DAATA and the Teensy ends with this code
+END_CODE = b'\xff\xff\xff\xff\xff\xff\xff\xf0'
+
+
+class FrameReader:
+    """
+    Class that splits a stream of bytes from the Teensy (or from a BIN file) into frames. Bytes are
+    read in bulk into a single reusable buffer and the end code is located with bytearray.find, so
+    nothing is done on a per byte basis.
+
+    Frames are handed out as memoryviews into the buffer (without the end code). A frame is only
+    valid until the next frame is requested, so copy it with bytes() if it needs to be kept.
+    """
+
+    def __init__(self, end_code=END_CODE, read_size=65536):
+        self.end_code = end_code
+        self.read_size = read_size
+        self.buffer = bytearray()
+        self.search_start = 0   # Where to resume looking for the end code in the buffer
+        self.bytes_read = 0
+
+    def feed(self, data):
+        """
+        Adds received bytes to the end of the buffer.
+
+        :param data: A bytes-like object
+        :return: None
+        """
+
+        self.buffer += data
+        self.bytes_read += len(data)
+
+    def read_serial(self, serial_port, block=False):
+        """
+        Drains every byte waiting in the serial port's input buffer. in_waiting is only used to
+        check if anything is waiting since it isn't a byte count for every port (pyserial's
+        socket:// ports report 0 or 1), the bytes are then read read_size at a time without waiting.
+
+        :param serial_port: An open serial.Serial object
+        :param block: If nothing is waiting, wait up to the port's timeout for the next byte to arrive
+        :return: The number of bytes read
+        """
+
+        if serial_port.in_waiting:
+            data = b""
+        elif block:
+            data = serial_port.read(1)
+            if not data:
+                return 0
+        else:
+            return 0
+        data += self.drain_serial(serial_port)
+        self.feed(data)
+        return len(data)
+
+    def drain_serial(self, serial_port):
+        """
+        Reads everything that has already arrived on the serial port without waiting for more. The
+        port's timeout is set to 0 while reading and put back afterwards.
+
+        :param serial_port: An open serial.Serial object
+        :return: The bytes that were read
+        """
+
+        timeout = serial_port.timeout
+        if timeout != 0:
+            serial_port.timeout = 0
+        chunks = list()
+        try:
+            while True:
+                chunks.append(serial_port.read(self.read_size))
+                # A short read means nothing else has arrived yet
+                if len(chunks[-1]) < self.read_size:
+                    break
+        finally:
+            if timeout != 0:
+                serial_port.timeout = timeout
+        return b"".join(chunks)
+
+    def read_file(self, data_file):
+        """
+        Reads the next block of bytes from a file.
+
+        :param data_file: A file opened in binary mode
+        :return: The number of bytes read (0 once the end of the file has been reached)
+        """
+
+        data = data_file.read(self.read_size)
+        self.feed(data)
+        return len(data)
+
+    def frames(self):
+        """
+        Generator that yields every complete frame in the buffer as a memoryview. The bytes of
+        those frames are removed from the buffer once the generator is finished.
+
+        :return: A generator of memoryviews
+        """
+
+        end = self.buffer.find(self.end_code, self.search_start)
+        consumed = 0
+        try:
+            if end == -1:
+                return
+            with memoryview(self.buffer) as view:
+                while end != -1:
+                    frame = view[consumed:end]
+                    consumed = end + len(self.end_code)
+                    try:
+                        yield frame
+                    finally:
+                        frame.release()
+                    end = self.buffer.find(self.end_code, consumed)
+        finally:
+            if consumed:
+                try:
+                    del self.buffer[:consumed]
+                except BufferError:
+                    # Someone is still holding on to a frame, so move the leftover bytes to a new buffer
+                    self.buffer = self.buffer[consumed:]
+            # The end code can't start before this point in the bytes we've already searched
+            self.search_start = max(0, len(self.buffer) - len(self.end_code) + 1)
+
+    def clear(self):
+        """
+        Throws away any bytes that haven't been made into a frame yet.
+
+        :return: None
+        """
+
+        self.buffer = bytearray()
+        self.search_start = 0
@@ -0,0 +1,156 @@
+import logging
+import struct
+import numpy
+
+from DataAcquisition.SensorRegistry import sensor_registry
+
+logger = logging.getLogger("DataImport")
+
+# struct format characters for the field sizes that have a native type
+int_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+float_formats = {4: 'f', 8: 'd'}
+
+
+class PacketLayout:
+    """
+    Compiled layout of a data packet. When a settings packet is received the list of sensor ids it
+    contains fixes the layout of every data packet until the next settings packet, so the layout is
+    turned into a single struct.Struct once and every data packet is then decoded with one call to
+    unpack_from.
+
+    Sensor ids with multiple values (i.e. the 200 series speed/position pairs or the 308-310
+    wheel force transducer groups) take up one column per value.
+    """
+
+    def __init__(self, sensor_ids):
+        self.sensor_ids = tuple(sensor_ids)
+        self.fields = list()        # (sensor_id, value index or None, num_bytes, is_float) for each column
+        self.dispatch = list()      # (sensor_id, first column, last column + 1 or None if single valued)
+        self.byte_columns = list()  # Columns that have to be converted from bytes to int after unpacking
+
+        struct_format = '<'
+        for sensor_id in self.sensor_ids:
+            first_column = len(self.fields)
+            is_multi = sensor_registry.is_multi[sensor_id]
+            values = zip(sensor_registry.num_bytes[sensor_id], sensor_registry.is_float[sensor_id],
+                         sensor_registry.decode_kinds[sensor_id])
+            for i, (num_bytes, is_float, decode_kind) in enumerate(values):
+                struct_format += self._add_field(sensor_id, i if is_multi else None, num_bytes, is_float, decode_kind)
+            self.dispatch.append((sensor_id, first_column, len(self.fields) if is_multi else None))
+
+        self.struct = struct.Struct(struct_format)
+        self.size = self.struct.size
+        self._dtype = None
+        logger.debug("Compiled packet layout {} ({} bytes)".format(struct_format, self.size))
+
+    def _add_field(self, sensor_id, value_index, num_bytes, is_float, decode_kind):
+        """
+        Adds a column to the layout and returns the struct format for it.
+
+        :return: str
+        """
+
+        column = len(self.fields)
+        self.fields.append((sensor_id, value_index, num_bytes, bool(is_float)))
+        if decode_kind == "float":
+            return float_formats[num_bytes]
+        if is_float:
+            logger.warning("Sensor {} is a float but has {} bytes, reading it as an int".format(sensor_id, num_bytes))
+        if decode_kind == "int":
+            return int_formats[num_bytes]
+        self.byte_columns.append(column)
+        return '{}s'.format(num_bytes)
+
+    def unpack(self, packet, offset=1):
+        """
+        Decodes every column of a data packet.
+
+        :param packet: A bytes-like object containing the data packet
+        :param offset: Where the data starts in the packet (defaults to after the ack code)
+        :return: A list with a value for every column
+        """
+
+        values = self.struct.unpack_from(packet, offset)
+        if self.byte_columns:
+            values = list(values)
+            for column in self.byte_columns:
+                values[column] = int.from_bytes(values[column], "little")
+        return values
+
+    def decode(self, packet, offset=1):
+        """
+        Decodes a data packet into the values for each sensor id in the layout.
+
+        :param packet: A bytes-like object containing the data packet
+        :param offset: Where the data starts in the packet (defaults to after the ack code)
+        :return: A list of (sensor_id, value) tuples where value is a list for multi-value sensor ids
+        """
+
+        values = self.unpack(packet, offset)
+        return [(sensor_id, values[first] if last is None else list(values[first:last]))
+                for sensor_id, first, last in self.dispatch]
+
+    @property
+    def dtype(self):
+        """
+        The NumPy structured dtype matching the layout, with a field named c<column> for every column.
+        Columns without a native type are stored as an array of bytes.
+
+        :return: numpy.dtype
+        """
+
+        if self._dtype is None:
+            names = list()
+            formats = list()
+            for column, (sensor_id, value_index, num_bytes, is_float) in enumerate(self.fields):
+                names.append("c{}".format(column))
+                if is_float and num_bytes in float_formats:
+                    formats.append("<f{}".format(num_bytes))
+                elif num_bytes in int_formats:
+                    formats.append("<u{}".format(num_bytes))
+                else:
+                    formats.append(("u1", (num_bytes,)))
+            self._dtype = numpy.dtype({"names": names, "formats": formats})
+        return self._dtype
+
+    def unpack_block(self, raw):
+        """
+        Decodes a block of data packets at once.
+
+        :param raw: A C-contiguous uint8 array with one data packet (without the ack code) per row
+        :return: A list with an array of values for every column
+        """
+
+        records = raw.view(self.dtype).reshape(-1)
+        columns = list()
+        for column, (sensor_id, value_index, num_bytes, is_float) in enumerate(self.fields):
+            values = records["c{}".format(column)]
+            if column in self.byte_columns:
+                if num_bytes <= 8:
+                    shifts = numpy.arange(num_bytes, dtype=numpy.uint64) * numpy.uint64(8)
+                    values = (values.astype(numpy.uint64) << shifts).sum(axis=1, dtype=numpy.uint64)
+                else:
+                    values = numpy.array([int.from_bytes(bytes(row), "little") for row in values], dtype=object)
+            columns.append(values)
+        return columns
+
+    def decode_block(self, raw):
+        """
+        Decodes a block of data packets into the values for each sensor id in the layout.
+
+        :param raw: A C-contiguous uint8 array with one data packet (without the ack code) per row
+        :return: A list of (sensor_id, values) tuples where values is a list of arrays for multi-value sensor ids
+        """
+
+        return self.dispatch_columns(self.unpack_block(raw))
+
+    def dispatch_columns(self, columns):
+        """
+        Groups decoded columns by the sensor id they belong to.
+
+        :param columns: A list with an array of values for every column (see unpack_block)
+        :return: A list of (sensor_id, values) tuples where values is a list of arrays for multi-value sensor ids
+        """
+
+        return [(sensor_id, columns[first] if last is None else columns[first:last])
+                for sensor_id, first, last in self.dispatch]
@@ -0,0 +1,131 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from DataAcquisition.FrameReader import END_CODE
+
+logger = logging.getLogger("DataImport")
+
+# Where capture files are written if no directory is given
+default_capture_directory = os.path.join(os.path.expanduser("~"), "DAATA Captures")
+
+
+class RawCapture:
+    """
+    Append-only capture of every frame received from the Teensy, written in the same framing as a BIN
+    file so that it can be replayed through the BIN input mode. Frames are handed to a background
+    writer thread through a queue, so the reader only pays for copying the frame. The writer batches
+    frames into large writes and flushes them to disk with fsync every fsync_interval seconds, so at
+    most that much data is lost if DAATA crashes.
+    """
+
+    def __init__(self, directory=None, end_code=END_CODE, write_size=1 << 20, fsync_interval=1.0):
+        self.directory = directory if directory is not None else default_capture_directory
+        self.end_code = end_code
+        self.write_size = write_size
+        self.fsync_interval = fsync_interval
+        self.path = None
+        self.bytes_written = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._failed = False
+
+    @property
+    def is_open(self):
+        return self._thread is not None
+
+    def open(self, name="capture"):
+        """
+        Creates a new capture file named after the given name and the current time and starts the writer thread.
+
+        :param name: Added to the start of the file name (i.e. the COM port)
+        :return: The path of the capture file, or None if it couldn't be created
+        """
+
+        if self.is_open:
+            self.close()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            filename = "{}_{}.bin".format(name, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+            self.path = os.path.join(self.directory, filename)
+            capture_file = open(self.path, "ab")
+        except OSError as e:
+            logger.error(e)
+            logger.error("Unable to create a raw capture file in {}".format(self.directory))
+            self.path = None
+            return None
+
+        self.bytes_written = 0
+        self._failed = False
+        self._thread = threading.Thread(target=self._write_loop, args=(capture_file,), daemon=True)
+        self._thread.start()
+        logger.info("Capturing raw data to {}".format(self.path))
+        return self.path
+
+    def write(self, frame):
+        """
+        Queues a frame (without its end code) to be written to the capture file.
+
+        :param frame: A bytes-like object containing the frame
+        :return: None
+        """
+
+        if self._thread is not None and not self._failed:
+            self._queue.put(bytes(frame))
+
+    def close(self):
+        """
+        Writes every queued frame, syncs the file to disk and stops the writer thread.
+
+        :return: None
+        """
+
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        logger.info("Finished raw capture of {} bytes to {}".format(self.bytes_written, self.path))
+
+    def _write_loop(self, capture_file):
+        """
+        Runs on the writer thread, collecting frames from the queue and writing them in large blocks.
+
+        :return: None
+        """
+
+        pending = bytearray()
+        last_sync = time.monotonic()
+        is_closing = False
+        try:
+            while not is_closing:
+                try:
+                    frame = self._queue.get(timeout=self.fsync_interval)
+                    while frame is not None:
+                        pending += frame
+                        pending += self.end_code
+                        if len(pending) >= self.write_size:
+                            break
+                        frame = self._queue.get_nowait()
+                    is_closing = frame is None
+                except queue.Empty:
+                    pass
+
+                if len(pending) >= self.write_size or is_closing or \
+                        time.monotonic() - last_sync >= self.fsync_interval:
+                    if pending:
+                        capture_file.write(pending)
+                        self.bytes_written += len(pending)
+                        pending.clear()
+                        capture_file.flush()
+                        os.fsync(capture_file.fileno())
+                    last_sync = time.monotonic()
+        except OSError as e:
+            logger.error(e)
+            logger.error("Error writing to the raw capture file {}".format(self.path))
+            self._failed = True
+        finally:
+            capture_file.close()
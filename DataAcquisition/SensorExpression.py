@@ -0,0 +1,188 @@
+"""
+This file turns the arithmetic expressions used by derived sensors into vectorized functions.
+
+An expression is written in Python syntax over sensor names, ex. 'force_enginedyno_lbs * 8/12'.
+It is parsed once with the ast module and every node is checked against a whitelist, so only
+numbers, sensor names, arithmetic, comparisons and the functions in expression_functions can be
+used. The checked expression is then compiled into a function that takes one NumPy array per
+sensor and evaluates the whole expression over the arrays at once.
+"""
+
+import ast
+import functools
+import logging
+import sys
+import numpy
+
+logger = logging.getLogger("DataAcquisition")
+
+
+# The functions that can be called from an expression
+expression_functions = {
+    "abs": numpy.abs,
+    "sqrt": numpy.sqrt,
+    "exp": numpy.exp,
+    "log": numpy.log,
+    "log10": numpy.log10,
+    "sin": numpy.sin,
+    "cos": numpy.cos,
+    "tan": numpy.tan,
+    "arctan2": numpy.arctan2,
+    "minimum": numpy.minimum,
+    "maximum": numpy.maximum,
+    "where": numpy.where,
+    "clip": numpy.clip,
+}
+
+# The constants that can be used in an expression
+expression_constants = {
+    "pi": numpy.pi,
+    "e": numpy.e,
+}
+
+# Numbers are parsed as ast.Num before Python 3.8 and as ast.Constant after
+if sys.version_info < (3, 8):
+    _number_nodes = (ast.Num,)
+    _number_field = "n"
+else:
+    _number_nodes = (ast.Constant,)
+    _number_field = "value"
+
+_allowed_nodes = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+) + _number_nodes
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+class SensorExpression:
+    """
+    A parsed and compiled derived sensor expression.
+
+    input_names holds the sensors the expression uses in the order they first appear, and the
+    compiled expression is called with one array of values for each of them in that order.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError("Invalid expression '{}': {}".format(expression, e.msg))
+
+        self.input_names = list()
+        for node in ast.walk(tree):
+            if not isinstance(node, _allowed_nodes):
+                raise ExpressionError("'{}' is not allowed in expression '{}'".format(type(node).__name__, expression))
+            if isinstance(node, _number_nodes) and not isinstance(getattr(node, _number_field), (int, float)):
+                raise ExpressionError("Only numbers can be used as constants in expression '{}'".format(expression))
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in expression_functions:
+                    raise ExpressionError("Unknown function in expression '{}'".format(expression))
+                if node.keywords:
+                    raise ExpressionError("Keyword arguments are not allowed in expression '{}'".format(expression))
+            if isinstance(node, ast.Name) and node.id not in expression_functions \
+                    and node.id not in expression_constants and node.id not in self.input_names:
+                self.input_names.append(node.id)
+
+        # ast.walk is breadth first, put the inputs back in the order they are written
+        self.input_names.sort(key=lambda name: min((node.lineno, node.col_offset) for node in ast.walk(tree)
+                                                   if isinstance(node, ast.Name) and node.id == name))
+
+        # The expression is wrapped in a lambda that takes the inputs as arguments
+        arguments = {"args": [ast.arg(arg=name, annotation=None) for name in self.input_names],
+                     "vararg": None, "kwonlyargs": [], "kw_defaults": [], "kwarg": None, "defaults": []}
+        if "posonlyargs" in ast.arguments._fields:
+            # Added in Python 3.8
+            arguments["posonlyargs"] = []
+        function = ast.Expression(body=ast.Lambda(args=ast.arguments(**arguments), body=tree.body))
+        ast.fix_missing_locations(function)
+        namespace = {"__builtins__": {}}
+        namespace.update(expression_functions)
+        namespace.update(expression_constants)
+        self._function = eval(compile(function, "<expression {}>".format(expression), "eval"), namespace)
+
+    def __call__(self, *inputs):
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            return self._function(*inputs)
+
+    def __repr__(self):
+        return "SensorExpression('{}')".format(self.expression)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_expression(expression):
+    """
+    Parses and compiles an expression. Expressions are cached so each one is only parsed once.
+
+    :param expression: The expression as a string
+    :return: SensorExpression
+    """
+
+    return SensorExpression(expression)
+
+
+def get_input_names(params):
+    """
+    Gets the names of the sensors that a derived sensor is calculated from, either from its
+    expression or from its sensors list.
+
+    :param params: The derived_sensors entry of the sensor
+    :return: list of str
+    """
+
+    if "expression" in params:
+        return compile_expression(params["expression"]).input_names
+    return list(params["sensors"])
+
+
+def order_derived_sensors(derived_sensors, sensor_names):
+    """
+    Sorts the derived sensors so that every sensor comes after the sensors it is derived from.
+    Derived sensors with an invalid expression, a missing input or that are part of a cycle are
+    logged and left out.
+
+    :param derived_sensors: The derived_sensors dictionary
+    :param sensor_names: The names of the sensors that aren't derived
+    :return: A list of the names of the derived sensors that can be created, in the order to create them
+    """
+
+    dependencies = dict()
+    for sensor_name, params in derived_sensors.items():
+        try:
+            dependencies[sensor_name] = get_input_names(params)
+        except (ExpressionError, KeyError) as e:
+            logger.error(e)
+            logger.error("Unable to read the inputs of derived sensor {}".format(sensor_name))
+
+    order = list()
+    # "visiting" while a sensor's inputs are being visited, then True if it can be created or False if it can't
+    states = dict()
+
+    def visit(sensor_name, path):
+        if states.get(sensor_name) == "visiting":
+            logger.error("Derived sensors have a circular dependency: {}".format(" -> ".join(path + [sensor_name])))
+            return False
+        if sensor_name in states:
+            return states[sensor_name]
+        states[sensor_name] = "visiting"
+        is_valid = True
+        for input_name in dependencies[sensor_name]:
+            if input_name in dependencies:
+                is_valid = visit(input_name, path + [sensor_name]) and is_valid
+            elif input_name not in sensor_names:
+                logger.error("Derived sensor {} uses {} which does not exist".format(sensor_name, input_name))
+                is_valid = False
+        states[sensor_name] = is_valid
+        if is_valid:
+            order.append(sensor_name)
+        return is_valid
+
+    for sensor_name in dependencies:
+        visit(sensor_name, list())
+    return order
@@ -21,6 +21,8 @@ Optional parameters:
     - unit_short     (defaults to None)
     - is_plottable   (defaults to True)
     - is_external    (defaults to True)
+    - calibration    (defaults to None, converts raw values to engineering units, see Calibration.py)
+    - keep_raw       (defaults to False, stores the raw values so the calibration can be changed after recording)
 """
 
 
@@ -489,13 +491,15 @@ SensorId = {
         "name": "force_enginedyno_lbs",
         "object": "Force",
         "num_bytes": 4,
-        "is_float": True
+        "is_float": True,
+        "keep_raw": True
     },
     307: {
         "name": "force_shockdyno_lbs",
         "object": "Force",
         "num_bytes": 4,
-        "is_float": True
+        "is_float": True,
+        "keep_raw": True
     },
     308: {
         "name": "wheel_force_transducer_analog_1",
@@ -505,19 +509,22 @@ SensorId = {
             "name": "fx_analog",
             "object": "Force",
             "display_name": "Wheel Force X Analog",
-            "is_float": True
+            "is_float": True,
+            "calibration": {"type": "Offset", "zero": 2.5, "gain": 8990 / 5}
         },
         1: {
             "name": "fy_analog",
             "object": "Force",
             "display_name": "Wheel Force Y Analog",
-            "is_float": True
+            "is_float": True,
+            "calibration": {"type": "Offset", "zero": 2.5, "gain": 4500 / 5}
         },
         2: {
             "name": "fz_analog",
             "object": "Force",
             "display_name": "Wheel Force Z Analog",
-            "is_float": True
+            "is_float": True,
+            "calibration": {"type": "Offset", "zero": 2.5, "gain": 8990 / 5}
         },
         3: {
             "name": "mx_analog",
@@ -0,0 +1,99 @@
+"""
+Flat lookup tables compiled from SensorId once at startup.
+
+SensorId nests the sensors of multi-value ids (i.e. the 200 series speed/position pairs or the IMU)
+under integer keys, so code that walks it directly has to probe each entry to find out which kind
+it is. The registry does that once and keeps plain dicts keyed by sensor id or sensor name, so Data,
+DataImport, PacketLayout and GenerateSensorIdHFile can all look things up without special cases.
+"""
+
+import logging
+
+from DataAcquisition.SensorId import SensorId
+
+logger = logging.getLogger("DataAcquisition")
+
+# Sizes that can be decoded as a native type, anything else is decoded from bytes
+int_sizes = (1, 2, 4, 8)
+float_sizes = (4, 8)
+
+
+def get_decode_kind(num_bytes, is_float):
+    """
+    Picks how a value is decoded from a packet.
+
+    :return: "float", "int" or "bytes"
+    """
+
+    if is_float and num_bytes in float_sizes:
+        return "float"
+    if num_bytes in int_sizes:
+        return "int"
+    return "bytes"
+
+
+class SensorRegistry:
+    """
+    Lookup tables for every sensor id in a SensorId style dict. Tables keyed by sensor id hold a
+    tuple with one item per value, so single and multi-value ids are handled the same way.
+    """
+
+    def __init__(self, sensor_ids):
+        self.id_names = dict()      # The name of each sensor id (the group name for multi-value ids)
+        self.names = dict()         # The names of the sensors holding each value of a sensor id
+        self.num_bytes = dict()     # The number of bytes of each value of a sensor id
+        self.total_bytes = dict()   # The number of bytes a sensor id takes up in a packet
+        self.is_float = dict()      # The is_float parameter of each value of a sensor id
+        self.decode_kinds = dict()  # How each value of a sensor id is decoded (see get_decode_kind)
+        self.is_multi = dict()      # If a sensor id has multiple values
+        self.h_file_comments = dict()
+        self.name_to_id = dict()
+        self.params = dict()        # The parameters used to create the Sensor object of each sensor name
+
+        for sensor_id, entry in sensor_ids.items():
+            try:
+                self._add(sensor_id, entry)
+            except KeyError as e:
+                logger.error(e)
+                logger.error("Missing a required parameter in SensorId for sensor with ID: {}".format(sensor_id))
+
+    def _add(self, sensor_id, entry):
+        """
+        Adds the tables for one sensor id, raising KeyError before anything is added if a required
+        parameter is missing.
+
+        :return: None
+        """
+
+        is_multi = isinstance(entry["num_bytes"], list)
+        if is_multi:
+            values = [dict(entry[i], num_bytes=num_bytes) for i, num_bytes in enumerate(entry["num_bytes"])]
+        else:
+            values = [{key: value for key, value in entry.items() if not isinstance(key, int)}]
+        for value in values:
+            for key in ("name", "object"):
+                if key not in value:
+                    raise KeyError(key)
+
+        self.is_multi[sensor_id] = is_multi
+        self.id_names[sensor_id] = entry["name"]
+        self.names[sensor_id] = tuple(value["name"] for value in values)
+        self.num_bytes[sensor_id] = tuple(value["num_bytes"] for value in values)
+        self.total_bytes[sensor_id] = sum(self.num_bytes[sensor_id])
+        self.is_float[sensor_id] = tuple(value.get("is_float") for value in values)
+        self.decode_kinds[sensor_id] = tuple(get_decode_kind(value["num_bytes"], value.get("is_float"))
+                                             for value in values)
+        if "h_file_comment" in entry:
+            self.h_file_comments[sensor_id] = entry["h_file_comment"]
+
+        for value in values:
+            value["id"] = sensor_id
+            self.name_to_id[value["name"]] = sensor_id
+            self.params[value["name"]] = value
+
+    def __contains__(self, sensor_id):
+        return sensor_id in self.names
+
+
+# The registry compiled from SensorId. Use 'from DataAcquisition.SensorRegistry import sensor_registry'
+sensor_registry = SensorRegistry(SensorId)
@@ -0,0 +1,298 @@
+"""
+This file stores the backends that Sensor objects use to hold their collected values.
+
+Every backend is indexed with absolute sample indices, i.e. the first value ever added to a
+sensor has index 0 and the index keeps counting up until the sensor is reset. This holds even
+when a bounded live window drops the oldest values, so most_recent_index stays meaningful for
+the whole session.
+
+Current backends:
+    - list    (the original behaviour, a Python list of every value)
+    - array   (chunked, preallocated NumPy arrays with an optional bounded live window)
+"""
+
+import logging
+import numpy
+
+logger = logging.getLogger("DataAcquisition")
+
+
+# The settings used when a Sensor creates its storage. Change these with Data.set_storage_backend
+# so that every sensor is switched over at the same time.
+default_storage_settings = {
+    "backend": "array",
+    "chunk_size": 4096,     # Number of samples to allocate at a time
+    "live_window": None     # Maximum number of samples to keep (None keeps everything)
+}
+
+
+def get_storage_dtype(is_float, num_bytes, is_transformed=False):
+    """
+    Picks the NumPy dtype that a sensor's values should be stored as based on its SensorId entry.
+
+    :param is_float: The is_float parameter from SensorId (True, False or None)
+    :param num_bytes: The number of bytes the sensor takes up in a packet
+    :param is_transformed: If the sensor's transfer function can change the type of its values
+    :return: numpy.dtype
+    """
+
+    if is_transformed or is_float is not False:
+        return numpy.dtype(numpy.float64)
+    if num_bytes == 1:
+        return numpy.dtype(numpy.uint8)
+    if num_bytes == 2:
+        return numpy.dtype(numpy.uint16)
+    if num_bytes == 4:
+        return numpy.dtype(numpy.uint32)
+    if num_bytes == 8:
+        return numpy.dtype(numpy.uint64)
+    return numpy.dtype(numpy.float64)
+
+
+def get_raw_dtype(is_float, num_bytes):
+    """
+    Picks the smallest NumPy dtype that holds a sensor's raw values as they are decoded from a
+    packet, for sensors that keep raw values.
+
+    :param is_float: The is_float parameter from SensorId (True, False or None)
+    :param num_bytes: The number of bytes the sensor takes up in a packet
+    :return: numpy.dtype
+    """
+
+    if is_float and num_bytes == 4:
+        return numpy.dtype(numpy.float32)
+    if is_float and num_bytes == 8:
+        return numpy.dtype(numpy.float64)
+    return get_storage_dtype(False, num_bytes)
+
+
+def create_storage(dtype=None, **kwargs):
+    """
+    Creates a storage object using the default storage settings. Any keyword arguments
+    override the matching entry of default_storage_settings.
+
+    :param dtype: The NumPy dtype used by the array backend (ignored by the list backend)
+    :return: ListStorage or ArrayStorage
+    """
+
+    settings = dict(default_storage_settings)
+    settings.update(kwargs)
+    if settings["backend"] == "list":
+        return ListStorage()
+    if settings["backend"] == "array":
+        return ArrayStorage(dtype, chunk_size=settings["chunk_size"], live_window=settings["live_window"])
+    raise ValueError("Unknown storage backend: {}".format(settings["backend"]))
+
+
+class ListStorage:
+    """
+    Stores every value in a Python list. This is how Sensor used to store its values and is kept
+    around for sensors that need to hold arbitrary Python objects.
+    """
+
+    def __init__(self):
+        self.values = list()
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def first_index(self):
+        return 0
+
+    def append(self, value):
+        self.values.append(value)
+
+    def extend(self, values):
+        if hasattr(values, "tolist"):
+            values = values.tolist()
+        self.values.extend(values)
+
+    def replace(self, values):
+        if hasattr(values, "tolist"):
+            values = values.tolist()
+        self.values = list(values)
+
+    def get(self, index):
+        return self.values[index]
+
+    def get_range(self, start, stop):
+        return self.values[max(start, 0):max(stop, 0)]
+
+
+class ArrayStorage:
+    """
+    Stores values in a preallocated, typed NumPy array. The array is grown a chunk at a time
+    (doubling in size) so that appending is amortized O(1), and get_range returns views into the
+    array instead of copies.
+
+    If live_window is set then only the most recent live_window values are kept. The array is
+    allocated at twice the window so that the window is only moved back to the front once every
+    live_window appends.
+
+    When the array has to be grown or the window has to be moved a new array is always allocated,
+    which means that views that were handed out earlier are never overwritten.
+    """
+
+    def __init__(self, dtype=None, chunk_size=4096, live_window=None):
+        self.dtype = numpy.dtype(numpy.float64 if dtype is None else dtype)
+        self.chunk_size = max(int(chunk_size), 1)
+        self.live_window = None if live_window is None else max(int(live_window), 1)
+        if self.dtype.kind == 'f':
+            self.fill_value = numpy.nan
+        else:
+            self.fill_value = 0
+
+        if self.live_window is None:
+            capacity = self.chunk_size
+        else:
+            capacity = self._round_to_chunk(2 * self.live_window)
+        self._buffer = numpy.empty(capacity, dtype=self.dtype)
+        self._start = 0     # Position in _buffer of the oldest value kept
+        self._stop = 0      # Position in _buffer after the most recent value
+        self._offset = 0    # Absolute index of the value at _buffer[_start]
+
+    def __len__(self):
+        return self._offset + self._stop - self._start
+
+    @property
+    def first_index(self):
+        return self._offset
+
+    def _round_to_chunk(self, size):
+        return -(-size // self.chunk_size) * self.chunk_size
+
+    def _reallocate(self, num_new_values):
+        """
+        Moves the kept values into a new array that has room for num_new_values more values.
+
+        :param num_new_values: The number of values that are about to be appended
+        :return: None
+        """
+
+        num_kept = self._stop - self._start
+        if self.live_window is None:
+            capacity = len(self._buffer)
+            while capacity < num_kept + num_new_values:
+                capacity = capacity * 2
+        else:
+            capacity = max(len(self._buffer), self._round_to_chunk(num_kept + num_new_values))
+        buffer = numpy.empty(self._round_to_chunk(capacity), dtype=self.dtype)
+        buffer[:num_kept] = self._buffer[self._start:self._stop]
+        self._buffer = buffer
+        self._start = 0
+        self._stop = num_kept
+
+    def _drop_oldest(self):
+        num_extra = self._stop - self._start - self.live_window
+        if num_extra > 0:
+            self._start += num_extra
+            self._offset += num_extra
+
+    def _promote(self):
+        """
+        Switches an integer array over to float64 when a value that it can't hold (a negative or
+        fractional value, i.e. from FAKE mode) is added, so the value is stored instead of dropped.
+
+        :return: None
+        """
+
+        logger.warning("Storing values as float64 instead of {} so values that don't fit aren't dropped".format(
+            self.dtype))
+        self.dtype = numpy.dtype(numpy.float64)
+        self.fill_value = numpy.nan
+        buffer = numpy.empty(len(self._buffer), dtype=self.dtype)
+        buffer[self._start:self._stop] = self._buffer[self._start:self._stop]
+        self._buffer = buffer
+
+    def _fits(self, values):
+        """
+        Checks if values can be stored without being changed, only integer arrays need to check.
+
+        :param values: A NumPy array
+        :return: bool
+        """
+
+        if self.dtype.kind not in "iu" or numpy.can_cast(values.dtype, self.dtype):
+            return True
+        try:
+            with numpy.errstate(invalid="ignore", over="ignore"):
+                return bool(numpy.all(values.astype(self.dtype) == values))
+        except (TypeError, ValueError, OverflowError):
+            return False
+
+    def append(self, value):
+        if value is None:
+            value = self.fill_value
+        if self._stop == len(self._buffer):
+            self._reallocate(1)
+        try:
+            self._buffer[self._stop] = value
+            if self.dtype.kind in "iu" and self._buffer[self._stop] != value:
+                raise ValueError(value)
+        except (ValueError, OverflowError):
+            if self.dtype.kind not in "iu":
+                raise
+            self._promote()
+            self._buffer[self._stop] = value
+        self._stop += 1
+        if self.live_window is not None:
+            self._drop_oldest()
+
+    def extend(self, values):
+        values = numpy.asarray(values)
+        if len(values) > 0 and not self._fits(values):
+            self._promote()
+        if self.live_window is not None and len(values) > self.live_window:
+            self._offset += self._stop - self._start + len(values) - self.live_window
+            self._start = self._stop
+            values = values[-self.live_window:]
+        if self._stop + len(values) > len(self._buffer):
+            self._reallocate(len(values))
+        self._buffer[self._stop:self._stop + len(values)] = values
+        self._stop += len(values)
+        if self.live_window is not None:
+            self._drop_oldest()
+
+    def start_at(self, index):
+        """
+        Makes the first value that is added have the given absolute index. Only valid while the storage is empty.
+
+        :param index: The absolute index of the next value
+        :return: None
+        """
+
+        assert self._stop == self._start, "start_at can only be used on empty storage"
+        self._offset = index
+
+    def replace(self, values):
+        """
+        Replaces every value that is kept with new values, i.e. after a sensor is recalibrated. The
+        values are copied into a new array so views that were handed out earlier aren't changed.
+
+        :param values: An array with the same length as the values that are kept
+        :return: None
+        """
+
+        values = numpy.asarray(values)
+        assert len(values) == self._stop - self._start, "replace needs a value for every value that is kept"
+        if len(values) > 0 and not self._fits(values):
+            self._promote()
+        buffer = numpy.empty(len(self._buffer), dtype=self.dtype)
+        buffer[:len(values)] = values
+        self._buffer = buffer
+        self._start = 0
+        self._stop = len(values)
+
+    def get(self, index):
+        if index < 0:
+            index = index + len(self)
+        position = index - self._offset + self._start
+        if index < self._offset or position >= self._stop:
+            raise IndexError(index)
+        return self._buffer[position].item()
+
+    def get_range(self, start, stop):
+        start = min(max(start, self._offset), len(self))
+        stop = min(max(stop, start), len(self))
+        return self._buffer[start - self._offset + self._start:stop - self._offset + self._start]
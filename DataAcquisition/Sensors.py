@@ -1,16 +1,23 @@
 from abc import ABCMeta, abstractmethod
 import logging
 import math
+import numpy
 from datetime import datetime
 
+from DataAcquisition.SensorStorage import ArrayStorage, create_storage, get_storage_dtype, get_raw_dtype
+from DataAcquisition.Calibration import create_calibration, CalibrationError
+
 logger = logging.getLogger("DataAcquisition")
 
 
 class Sensor(metaclass=ABCMeta):
+    # If values that aren't floats always have the fixed integer format they are sent in, so they can be stored as
+    # unsigned integers. Sensors that are also written to by other code (i.e. FAKE mode) are stored as floats instead
+    has_integer_format = True
+
     def __init__(self, **kwargs):
         from DataAcquisition import is_data_collecting
         self.is_data_collecting = is_data_collecting
-        self.values = list()
         self.name = kwargs.get('name')
         self.object = kwargs.get('object')
         self.most_recent_index = 0
@@ -23,17 +30,223 @@ class Sensor(metaclass=ABCMeta):
         self.is_derived = False
         self.is_connected = False
         self.is_float = kwargs.get('is_float')
+        self.num_bytes = kwargs.get('num_bytes')
         self.id = kwargs.get('id')
+        self.scale = 1      # Raw values are multiplied by this before the calibration, see Data.set_sensor_scale
+        try:
+            self.calibration = create_calibration(kwargs.get('calibration'))
+        except CalibrationError as e:
+            logger.error(e)
+            logger.error("The calibration of {} is invalid, its values won't be converted".format(self.name))
+            self.calibration = None
+
+        # Sensors with a calibration or their own transfer function can return floats regardless of what is received
+        self.dtype = get_storage_dtype(self.is_float, self.num_bytes, self.calibration is not None or
+                                       type(self).transfer_function is not Sensor.transfer_function or
+                                       not self.has_integer_format)
+        self.storage_settings = dict()
+        self.generation = 0     # Incremented whenever the stored values are replaced so derived sensors can tell
+
+        # With keep_raw the storage holds the raw values in raw_dtype, and the values in engineering units
+        # are calculated from them with calibrate() when they are asked for (see get_engineering_storage)
+        self.keep_raw = False
+        self.raw_dtype = get_raw_dtype(self.is_float, self.num_bytes)
+        self.current_raw_value = None
+        self._engineering = None
+        self._engineering_generation = None
+        self.storage = create_storage(self.dtype)
+        if kwargs.get('keep_raw', False):
+            self.set_keep_raw(True)
+
+    def __len__(self):
+        return len(self.storage)
+
+    @property
+    def first_index(self):
+        """
+        The index of the oldest value that is still stored (only above 0 when a live window is used).
+
+        :return: int
+        """
+
+        return self.storage.first_index
+
+    def get_dtype(self, raw=False):
+        """
+        Gets the dtype the values in engineering units are stored as. This is float64 once a value
+        that didn't fit the sensor's dtype has been stored (see ArrayStorage).
+
+        :param raw: Get the dtype of the raw values instead, for sensors that keep raw values
+        :return: numpy.dtype
+        """
+
+        if self.keep_raw and not raw:
+            return self.dtype
+        return getattr(self.storage, "dtype", self.raw_dtype if self.keep_raw else self.dtype)
+
+    def set_storage(self, **kwargs):
+        """
+        Replaces the storage backend of the sensor. This clears any values that have been stored.
+        Any keyword arguments override the default storage settings (see SensorStorage.py) and are
+        kept when the sensor is reset.
+
+        :return: None
+        """
+
+        self.storage_settings.update(kwargs)
+        self.storage = create_storage(self.raw_dtype if self.keep_raw else self.dtype, **self.storage_settings)
+        self.most_recent_index = 0
+        self.current_raw_value = None
+        self._engineering = None
+        self.generation += 1
+
+    def set_keep_raw(self, keep_raw=True):
+        """
+        Chooses if the raw values are stored instead of the values in engineering units, so that a
+        new calibration or scale can be applied to the whole recording. This clears any values that
+        have been stored. Only sensors that are converted with their calibration can keep raw values.
+
+        :param keep_raw: If the raw values should be stored
+        :return: None
+        """
+
+        if keep_raw and not self.can_keep_raw():
+            logger.error("{} has its own transfer function so it can't keep raw values".format(self.name))
+            return
+        self.keep_raw = keep_raw
+        self.set_storage()
+
+    def can_keep_raw(self):
+        """
+        Checks if the sensor can keep raw values, i.e. if its values are converted with its calibration.
+
+        :return: bool
+        """
+
+        return type(self).transfer_function is Sensor.transfer_function
+
+    def invalidate(self):
+        """
+        Throws away the values in engineering units that were calculated from the raw values, they
+        are calculated again the next time they are asked for.
+
+        :return: None
+        """
+
+        self._engineering = None
+
+    def get_engineering_storage(self):
+        """
+        Gets the storage holding the values in engineering units. For sensors that keep raw values
+        this is a cache that is brought up to date with the raw values first, only converting the
+        values that were added since the last call, and rebuilt after the calibration changes.
+
+        :return: ListStorage or ArrayStorage
+        """
+
+        if not self.keep_raw:
+            return self.storage
+        first_index = self.storage.first_index
+        if self._engineering is None or self._engineering_generation != self.generation \
+                or len(self._engineering) < first_index:
+            self._engineering = ArrayStorage(self.dtype, live_window=getattr(self.storage, "live_window", None))
+            self._engineering.start_at(first_index)
+            self._engineering_generation = self.generation
+
+        stop = len(self.storage)
+        start = len(self._engineering)
+        if stop > start:
+            raw_values = numpy.asarray(self.storage.get_range(start, stop), dtype=self.dtype)
+            self._engineering.extend(self.calibrate(raw_values))
+        return self._engineering
+
+    def add_value(self, value=None, is_collecting=None):
+        """
+        :param value: The value received, or None to repeat the current value
+        :param is_collecting: If data is being collected (checked if None), so callers adding many values can check once
+        :return: None
+        """
 
-    def add_value(self, value=None):
         try:
+            if self.keep_raw and value is not None:
+                self.current_raw_value = value
             value = self.transfer_function(value)
             if value is None:
                 value = self.current_value
             self.current_value = value
-            if self.is_data_collecting.is_set():
-                self.values.append(value)
-                self.most_recent_index = len(self.values) - 1
+            if is_collecting is None:
+                is_collecting = self.is_data_collecting.is_set()
+            if is_collecting:
+                self.storage.append(self.current_raw_value if self.keep_raw else value)
+                self.most_recent_index = len(self.storage) - 1
+        except Exception as e:
+            logger.error(e)
+
+    def stamp_values(self, num_values, is_collecting=None):
+        """
+        Adds the value the sensor takes when nothing is received (see add_value) num_values times,
+        for sensors that get a value with every data packet but aren't part of it.
+
+        :param num_values: The number of values to add
+        :param is_collecting: If data is being collected (checked if None)
+        :return: None
+        """
+
+        if num_values == 1:
+            self.add_value(None, is_collecting)
+            return
+        try:
+            value = self.transfer_function(None)
+            if value is None:
+                value = self.current_value
+            self.current_value = value
+            if is_collecting is None:
+                is_collecting = self.is_data_collecting.is_set()
+            if is_collecting:
+                if self.keep_raw:
+                    value = self.current_raw_value
+                if value is None:
+                    for i in range(num_values):
+                        self.storage.append(None)
+                else:
+                    self.storage.extend(numpy.full(num_values, value))
+                self.most_recent_index = len(self.storage) - 1
+        except Exception as e:
+            logger.error(e)
+
+    def add_values(self, values, apply_transfer_function=True, is_collecting=None):
+        """
+        Adds a block of values at once. This is used when importing data and is much faster than
+        calling add_value for each value.
+
+        :param values: An array (or list) of values in the order they were collected
+        :param apply_transfer_function: If the transfer function should be applied to the values (if not, sensors that keep raw values convert them back to raw values)
+        :param is_collecting: If data is being collected (checked if None), see add_value
+        :return: None
+        """
+
+        try:
+            values = numpy.asarray(values)
+            if len(values) == 0:
+                return
+            if is_collecting is None:
+                is_collecting = self.is_data_collecting.is_set()
+            if self.keep_raw:
+                if not apply_transfer_function:
+                    values = self.uncalibrate(numpy.asarray(values, dtype=numpy.float64))
+                last_value = values[-1].item() if isinstance(values[-1], numpy.generic) else values[-1]
+                self.current_raw_value = last_value
+                self.current_value = self.calibrate(last_value)
+                if is_collecting:
+                    self.storage.extend(values)
+                    self.most_recent_index = len(self.storage) - 1
+                return
+            if apply_transfer_function:
+                values = self.transfer_function(values)
+            self.current_value = values[-1].item() if isinstance(values[-1], numpy.generic) else values[-1]
+            if is_collecting:
+                self.storage.extend(values)
+                self.most_recent_index = len(self.storage) - 1
         except Exception as e:
             logger.error(e)
 
@@ -41,36 +254,134 @@ class Sensor(metaclass=ABCMeta):
         try:
             if index is None:
                 return self.current_value
-            return self.values[index]
+            return self.get_engineering_storage().get(index)
         except IndexError:
             logger.error("Index: {} out of range, use get_most_recent_index to ensure that the index exists".format(index))
             return None
 
     def get_values(self, index, num_values):
+        storage = self.get_engineering_storage()
         try:
             try:
-                assert index - num_values >= 0
-                return self.values[index - num_values:index]
+                assert index - num_values >= storage.first_index
+                return storage.get_range(index - num_values, index)
             except AssertionError:
                 logger.debug("Tried to get more values than are contained, returning all values")
-                return self.values[0:index]
+                return storage.get_range(storage.first_index, index)
         except IndexError:
             logger.error("Index: {} out of range, use get_most_recent_index to ensure that the index exists".format(index))
             return None
 
+    def get_raw_values(self, index, num_values):
+        """
+        Gets the raw values like get_values, only for sensors that keep raw values.
+
+        :return: An array of raw values, or None if the sensor doesn't keep them
+        """
+
+        if not self.keep_raw:
+            logger.error("{} doesn't keep raw values".format(self.name))
+            return None
+        start = max(index - num_values, self.storage.first_index)
+        return self.storage.get_range(start, index)
+
     def reset(self):
         try:
             logger.debug("Resetting the sensor {}".format(self.display_name))
-            self.values = list()
-            self.most_recent_index = 0
+            self.set_storage()
         except Exception as e:
             logger.error(e)
 
     def transfer_function(self, value):
-        return value
+        if value is None:
+            return None
+        return self.calibrate(value)
+
+    def calibrate(self, values):
+        """
+        Converts raw values to engineering units with the scale and then the calibration.
+
+        :param values: A value or an array of values
+        :return: The converted value or array
+        """
+
+        if self.scale != 1:
+            values = values * self.scale
+        if self.calibration is not None:
+            values = self.calibration(values)
+        return values
+
+    def uncalibrate(self, values):
+        """
+        Converts values in engineering units back to raw values, raises CalibrationError if the
+        calibration can't be inverted.
+
+        :param values: A value or an array of values
+        :return: The raw value or array
+        """
+
+        if self.calibration is not None:
+            values = self.calibration.inverse(values)
+        if self.scale != 1:
+            values = values / self.scale
+        return values
+
+    def set_calibration(self, calibration=None, scale=None, recalibrate=False):
+        """
+        Changes the calibration and/or the scale of the sensor. New values always use them, and if
+        recalibrate is True then the values that are already stored are converted back to raw values
+        with the old calibration and converted again with the new one.
+
+        Sensors that keep raw values always convert the whole recording with the new calibration, so
+        recalibrate doesn't matter for them and nothing is lost if the calibration can't be inverted.
+
+        :param calibration: A Calibration or a SensorId style calibration dict (None keeps the current one)
+        :param scale: The scale factor (None keeps the current one)
+        :param recalibrate: If the stored values should be converted with the new calibration
+        :return: None
+        """
+
+        if self.keep_raw:
+            if calibration is not None:
+                self.calibration = create_calibration(calibration)
+            if scale is not None:
+                self.scale = scale
+            if self.current_raw_value is not None:
+                self.current_value = self.calibrate(self.current_raw_value)
+            # The values in engineering units are calculated again the next time they're asked for
+            self._engineering = None
+            self.generation += 1
+            return
+
+        raw_values = None
+        raw_current_value = None
+        if recalibrate:
+            try:
+                raw_values = self.uncalibrate(numpy.asarray(
+                    self.storage.get_range(self.storage.first_index, len(self.storage)), dtype=numpy.float64))
+                if self.current_value is not None:
+                    raw_current_value = self.uncalibrate(self.current_value)
+            except CalibrationError as e:
+                logger.error(e)
+                logger.error("The stored values of {} will keep the old calibration".format(self.name))
+                raw_values = None
+
+        if calibration is not None:
+            self.calibration = create_calibration(calibration)
+        if scale is not None:
+            self.scale = scale
+
+        if raw_values is not None:
+            self.storage.replace(self.calibrate(raw_values))
+            if raw_current_value is not None:
+                self.current_value = self.calibrate(raw_current_value)
+            self.generation += 1
 
 
 class Generic(Sensor):
+    # The test sensors are written to by FAKE mode with floats and negative values
+    has_integer_format = False
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -102,14 +413,27 @@ class Time(Sensor):
             return (datetime.now() - self.start_time).total_seconds()
         return value
 
+    def stamp_values(self, num_values, is_collecting=None):
+        if self.name != "time_internal_seconds" or num_values == 1:
+            super().stamp_values(num_values, is_collecting)
+            return
+        # The clock is read once and the block is spread evenly since the last time it was read, or
+        # since start_time for the first block
+        now = self.transfer_function(None)
+        last_time = 0.0 if self.current_value is None else min(self.current_value, now)
+        values = numpy.linspace(last_time, now, num_values + 1)[1:]
+        self.current_value = now
+        if is_collecting is None:
+            is_collecting = self.is_data_collecting.is_set()
+        if is_collecting:
+            self.storage.extend(values)
+            self.most_recent_index = len(self.storage) - 1
+
     def reset(self):
-        try:
-            logger.debug("Resetting the sensor {}".format(self.display_name))
-            self.values = list()
-            self.most_recent_index = 0
-            self.start_time = datetime.now()
-        except Exception as e:
-            logger.error(e)
+        super().reset()
+        self.start_time = datetime.now()
+        # The first block after a reset is spread from start_time, not the last time of the previous session
+        self.current_value = None
 
 
 class Speed(Sensor):
@@ -140,17 +464,6 @@ class Force(Sensor):
         super().__init__(**kwargs)
         self.unit = kwargs.get('unit', "Pounds")
         self.unit_short = kwargs.get('unit_short', "lbs")
-        self.scale = 1
-
-    def transfer_function(self, value):
-        value = value * self.scale
-        if self.name is "fx_analog":
-            return (value - 2.5) * 8990 / 5
-        if self.name is "fy_analog":
-            return (value - 2.5) * 4500 / 5
-        if self.name is "fz_analog":
-            return (value - 2.5) * 8990 / 5
-        return value
 
 
 class LDS(Sensor):
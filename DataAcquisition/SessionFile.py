@@ -0,0 +1,146 @@
+import json
+import logging
+import zipfile
+from datetime import datetime
+import numpy
+from numpy.lib import format as npy_format
+
+logger = logging.getLogger("DataExport")
+
+# Written to the metadata so that future changes to the format can still read old sessions
+session_format_version = 1
+
+# Number of values that are read from data and written to a column at a time
+session_chunk_size = 65536
+
+
+def write_session(path, data, sensor_names=None, chunk_size=session_chunk_size, progress_callback=None):
+    """
+    Writes the collected data to a session file. A session file is a NumPy .npz archive (a zip file
+    of .npy arrays) with one compressed column per sensor in the sensor's own dtype, plus a
+    metadata.json entry with the id, display name and units of every sensor. Each column is written
+    in chunks straight into the archive so the session is never copied in memory.
+
+    Sensors are lined up with time_internal_seconds at their most recent value, so a sensor that was
+    connected late has a shorter column and its "offset" in the metadata is the number of time
+    samples before its first value.
+
+    :param path: The path of the session file (should end in .npz)
+    :param data: The Data object to read the values from
+    :param sensor_names: The sensors to write (defaults to every connected sensor that isn't derived)
+    :param chunk_size: The number of values to read and write at a time
+    :param progress_callback: Called with (columns written, total columns) after each column
+    :return: The metadata that was written
+    """
+
+    if sensor_names is None:
+        sensor_names = data.get_sensors(is_connected=True, is_derived=False)
+    sensor_names = ["time_internal_seconds"] + [sensor for sensor in sensor_names if sensor != "time_internal_seconds"]
+
+    time_first_index, time_stop_index = data.get_index_range()
+    num_samples = time_stop_index - time_first_index
+    metadata = {
+        "format": "DAATA session",
+        "version": session_format_version,
+        "created": datetime.now().isoformat(),
+        "num_samples": num_samples,
+        "sensors": dict(),
+    }
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for i, sensor_name in enumerate(sensor_names):
+            first_index, stop_index = data.get_index_range(sensor_name)
+            length = min(stop_index - first_index, num_samples)
+            dtype = numpy.dtype(data.get_dtype(sensor_name))
+            metadata["sensors"][sensor_name] = {
+                "id": data.get_id(sensor_name),
+                "display_name": data.get_display_name(sensor_name),
+                "unit": data.get_unit(sensor_name),
+                "unit_short": data.get_unit_short(sensor_name),
+                "dtype": dtype.str,
+                "length": length,
+                "offset": num_samples - length,
+            }
+
+            with archive.open(sensor_name + ".npy", "w", force_zip64=True) as column_file:
+                header = {"descr": npy_format.dtype_to_descr(dtype), "fortran_order": False, "shape": (length,)}
+                npy_format.write_array_header_1_0(column_file, header)
+                for start in range(stop_index - length, stop_index, chunk_size):
+                    num_values = min(chunk_size, stop_index - start)
+                    values = data.get_values(sensor_name, start + num_values, num_values)
+                    values = to_column(values, dtype)
+                    if len(values) < num_values:
+                        # The values were dropped from a live window while exporting, keep the column the right size
+                        logger.error("Only {} of {} values of {} could be exported".format(len(values), num_values, sensor_name))
+                        values = numpy.concatenate((numpy.zeros(num_values - len(values), dtype=dtype), values))
+                    column_file.write(values.tobytes())
+            if progress_callback is not None:
+                progress_callback(i + 1, len(sensor_names))
+
+        archive.writestr("metadata.json", json.dumps(metadata, indent=2))
+    logger.info("Wrote {} sensors and {} samples to {}".format(len(sensor_names), num_samples, path))
+    return metadata
+
+
+def to_column(values, dtype):
+    """
+    Converts values from a sensor (an array, or a list that may contain None) to an array of the given dtype.
+
+    :return: numpy.ndarray
+    """
+
+    if values is None:
+        return numpy.zeros(0, dtype=dtype)
+    values = numpy.asarray(values)
+    if values.dtype == object:
+        values = numpy.array([numpy.nan if value is None else value for value in values], dtype=numpy.float64)
+    return values.astype(dtype, copy=False)
+
+
+class SessionReader:
+    """
+    Reads a session file written by write_session. Columns are only read and decompressed when they
+    are asked for, so looking at the metadata or a few sensors of a long session is fast.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = numpy.load(path, allow_pickle=False)
+        self.metadata = json.loads(self._archive.zip.read("metadata.json").decode("utf-8"))
+        if self.metadata.get("version", 0) > session_format_version:
+            logger.warning("{} was written by a newer version of DAATA".format(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def sensor_names(self):
+        return list(self.metadata["sensors"].keys())
+
+    @property
+    def num_samples(self):
+        return self.metadata["num_samples"]
+
+    def get_info(self, sensor_name):
+        """
+        Gets the metadata of a sensor (id, display_name, unit, unit_short, dtype, length and offset).
+
+        :return: dict
+        """
+
+        return self.metadata["sensors"][sensor_name]
+
+    def get_column(self, sensor_name):
+        """
+        Reads the values of a sensor.
+
+        :return: numpy.ndarray
+        """
+
+        return self._archive[sensor_name]
+
+    def close(self):
+        self._archive.close()
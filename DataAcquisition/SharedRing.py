@@ -0,0 +1,195 @@
+import logging
+import time
+import numpy
+from multiprocessing import shared_memory
+
+logger = logging.getLogger("DataAcquisition")
+
+# Bytes at the start of a ring's shared memory before the values, holds the write count and current value
+ring_header_size = 64
+
+# The most time in seconds read_write_counts waits for a commit to finish, a writer that died
+# partway through a commit would otherwise leave the reader spinning forever
+commit_timeout = 0.1
+
+
+class SharedRing:
+    """
+    A ring buffer of one sensor's values in shared memory, written by the acquisition process and
+    read by the GUI process. There is only ever one writer.
+
+    The header holds the total number of values ever written (the write count) and the sensor's
+    current value. Values are written before the write count is moved past them, so a reader
+    never sees values that haven't been written yet. A reader that falls more than capacity values
+    behind loses the oldest values, which it can tell from the write count.
+    """
+
+    def __init__(self, shm, dtype, capacity):
+        self.shm = shm
+        self.dtype = numpy.dtype(dtype)
+        self.capacity = capacity
+        self._write_count = numpy.ndarray((1,), dtype=numpy.int64, buffer=shm.buf, offset=0)
+        self._current_value = numpy.ndarray((1,), dtype=numpy.float64, buffer=shm.buf, offset=8)
+        self._values = numpy.ndarray((capacity,), dtype=self.dtype, buffer=shm.buf, offset=ring_header_size)
+
+    @classmethod
+    def create(cls, dtype, capacity):
+        """
+        Creates a new ring in a new block of shared memory.
+
+        :return: SharedRing
+        """
+
+        dtype = numpy.dtype(dtype)
+        shm = shared_memory.SharedMemory(create=True, size=ring_header_size + dtype.itemsize * capacity)
+        ring = cls(shm, dtype, capacity)
+        ring._write_count[0] = 0
+        ring._current_value[0] = numpy.nan
+        return ring
+
+    @classmethod
+    def attach(cls, name, dtype, capacity):
+        """
+        Maps a ring that was created by another process.
+
+        :return: SharedRing
+        """
+
+        return cls(shared_memory.SharedMemory(name=name), dtype, capacity)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_count(self):
+        return int(self._write_count[0])
+
+    @property
+    def current_value(self):
+        value = float(self._current_value[0])
+        return None if numpy.isnan(value) else value
+
+    def write(self, values, current_value=None):
+        """
+        Copies values into the ring. The write count isn't moved, call commit once every ring is written.
+
+        :return: The write count to commit
+        """
+
+        values = numpy.asarray(values)
+        count = self.write_count
+        if len(values) > self.capacity:
+            count += len(values) - self.capacity
+            values = values[-self.capacity:]
+        position = count % self.capacity
+        first_part = min(len(values), self.capacity - position)
+        self._values[position:position + first_part] = values[:first_part]
+        self._values[:len(values) - first_part] = values[first_part:]
+        if current_value is not None:
+            try:
+                self._current_value[0] = current_value
+            except (TypeError, ValueError):
+                pass
+        return count + len(values)
+
+    def commit(self, write_count):
+        self._write_count[0] = write_count
+
+    def read(self, start, stop):
+        """
+        Copies the values with write counts [start, stop) out of the ring. Values that have already
+        been overwritten are left out.
+
+        :return: A tuple of (values, number of values that were lost)
+        """
+
+        start = max(start, stop - self.capacity)
+        num_values = stop - start
+        position = start % self.capacity
+        first_part = min(num_values, self.capacity - position)
+        values = numpy.concatenate((self._values[position:position + first_part],
+                                    self._values[:num_values - first_part]))
+        # The writer may have wrapped around onto the start of what was just copied
+        num_overwritten = self.write_count - self.capacity - start
+        if num_overwritten > 0:
+            return values[num_overwritten:], num_overwritten
+        return values, 0
+
+    def close(self, unlink=False):
+        # The numpy views have to be released before the shared memory can be closed
+        self._write_count = self._current_value = self._values = None
+        try:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+        except (OSError, BufferError) as e:
+            logger.error(e)
+
+
+class SharedCounter:
+    """
+    A sequence number in shared memory used to commit the write counts of every ring at once. The
+    writer makes it odd while the write counts are changing and even again once they are all moved,
+    and a reader only uses write counts that it read between two equal, even sequence numbers.
+    This keeps the sensors lined up in the reader.
+    """
+
+    def __init__(self, shm):
+        self.shm = shm
+        self._sequence = numpy.ndarray((1,), dtype=numpy.int64, buffer=shm.buf, offset=0)
+
+    @classmethod
+    def create(cls):
+        counter = cls(shared_memory.SharedMemory(create=True, size=8))
+        counter._sequence[0] = 0
+        return counter
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def commit(self, rings, write_counts):
+        """
+        Moves the write counts of several rings at once.
+
+        :return: None
+        """
+
+        self._sequence[0] += 1
+        for ring, write_count in zip(rings, write_counts):
+            ring.commit(write_count)
+        self._sequence[0] += 1
+
+    def read_write_counts(self, rings, timeout=None):
+        """
+        Reads the write counts of several rings as they were after one commit.
+
+        :param timeout: The most time in seconds to wait for a commit to finish (defaults to commit_timeout)
+        :return: A list with the write count of each ring, or None if no commit finished in time
+        """
+
+        deadline = time.monotonic() + (commit_timeout if timeout is None else timeout)
+        while True:
+            sequence = int(self._sequence[0])
+            if sequence % 2 == 0:
+                write_counts = [ring.write_count for ring in rings]
+                if int(self._sequence[0]) == sequence:
+                    return write_counts
+            if time.monotonic() >= deadline:
+                return None
+            # Let the writer finish the commit
+            time.sleep(0)
+
+    def close(self, unlink=False):
+        self._sequence = None
+        try:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+        except (OSError, BufferError) as e:
+            logger.error(e)
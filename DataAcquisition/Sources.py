@@ -0,0 +1,197 @@
+import logging
+
+logger = logging.getLogger("DataAcquisition")
+
+
+class DataSource:
+    """
+    Base class for the places data can be read from. read_data keeps one source for the current
+    input mode and calls read() on it in a loop, so read() should wait for data (up to the timeout)
+    instead of returning straight away when there is nothing to read.
+    """
+
+    def __init__(self, data_import, stop_event):
+        self.data_import = data_import
+        self.stop_event = stop_event
+
+    def open(self):
+        """
+        Gets the source ready to be read from.
+
+        :return: False if the source can't be used
+        """
+
+        return True
+
+    def read(self, timeout):
+        """
+        Reads whatever data is available, waiting up to timeout seconds for some to arrive.
+
+        :param timeout: The most time in seconds to wait for data
+        :return: False once the source has no more data
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Releases anything the source is holding on to.
+
+        :return: None
+        """
+
+        pass
+
+
+class SerialSource(DataSource):
+    """
+    Reads packets from the Teensy over a COM port. Reads block on the port until the first byte
+    arrives (or the port's timeout passes) and then drain everything that is waiting. Every frame
+    is also written to a raw capture file while the source is open.
+    """
+
+    def open(self):
+        if not self.data_import.teensy_found or self.data_import.teensy_ser is None:
+            return False
+        self.data_import.start_raw_capture()
+        return True
+
+    def read(self, timeout):
+        teensy_ser = self.data_import.teensy_ser
+        if not self.data_import.check_connected():
+            logger.info("Serial port is not open, opening now")
+            try:
+                teensy_ser.open()
+            except Exception as e:
+                logger.error(e)
+                self.stop_event.wait(timeout)
+            return True
+        if teensy_ser.timeout != timeout:
+            teensy_ser.timeout = timeout
+        self.data_import.read_packet(block=True)
+        return True
+
+    def close(self):
+        self.data_import.stop_raw_capture()
+
+
+class FileSource(DataSource):
+    """
+    Base class for sources that load a file chosen with import_directory. The file is taken when
+    the source is opened so a file chosen for the next input mode is never read by this one.
+    """
+
+    def __init__(self, data_import, stop_event):
+        super().__init__(data_import, stop_event)
+        self.directory = None
+
+    def open(self):
+        self.directory = self.data_import.import_directory
+        self.data_import.import_directory = None
+        return self.directory is not None
+
+    def read(self, timeout):
+        directory = self.directory
+        self.directory = None
+        self.load(directory)
+        return False
+
+    def load(self, directory):
+        """
+        Loads the whole file.
+
+        :param directory: The path to the file
+        :return: None
+        """
+
+        raise NotImplementedError
+
+
+class BinSource(FileSource):
+    """
+    Loads a BIN file. A file chosen with import_directory is decoded all at once, otherwise a file
+    opened with open_bin_file is replayed packet by packet.
+    """
+
+    def open(self):
+        return super().open() or self.data_import.data_file is not None
+
+    def read(self, timeout):
+        if self.directory is not None:
+            return super().read(timeout)
+        self.data_import.read_packet()
+        return self.data_import.input_mode == "BIN"
+
+    def load(self, directory):
+        self.data_import.import_bin(directory)
+
+
+class CsvSource(FileSource):
+    """
+    Loads a CSV file that was exported by DAATA.
+    """
+
+    def load(self, directory):
+        self.data_import.import_csv(directory)
+
+
+class SessionSource(FileSource):
+    """
+    Loads a session file written by write_session.
+    """
+
+    def load(self, directory):
+        self.data_import.import_session(directory)
+
+
+class FakeSource(DataSource):
+    """
+    Generates fake data for debugging and development.
+    """
+
+    # Time in seconds between fake samples
+    sample_period = 0.005
+
+    def read(self, timeout):
+        self.data_import.check_connected_fake()
+        self.data_import.read_data_fake()
+        self.stop_event.wait(min(self.sample_period, timeout))
+        return True
+
+
+def is_serial_mode(input_mode):
+    """
+    Checks if an input mode is a serial port. Besides COM ports this includes device paths (i.e. a
+    pty from the Teensy simulator) and pyserial URLs like socket://localhost:7777.
+
+    :return: bool
+    """
+
+    return "COM" in input_mode or input_mode.startswith("/dev/") or "://" in input_mode
+
+
+def create_source(data_import, input_mode, stop_event):
+    """
+    Creates the source for an input mode.
+
+    :param data_import: The DataImport object the source reads through
+    :param input_mode: The input mode (FAKE, BIN, CSV, NPZ or a serial port)
+    :param stop_event: Event that is set when reading should stop, used for waiting
+    :return: A DataSource or None if there is no source for the input mode
+    """
+
+    if input_mode == "FAKE":
+        return FakeSource(data_import, stop_event)
+    if input_mode == "BIN":
+        return BinSource(data_import, stop_event)
+    if input_mode == "CSV":
+        return CsvSource(data_import, stop_event)
+    if input_mode == "NPZ":
+        return SessionSource(data_import, stop_event)
+    if is_serial_mode(input_mode):
+        if data_import.use_acquisition_process:
+            # Imported here since AcquisitionProcess builds on the sources in this file
+            from DataAcquisition.AcquisitionProcess import ProcessSource
+            return ProcessSource(data_import, stop_event)
+        return SerialSource(data_import, stop_event)
+    return None
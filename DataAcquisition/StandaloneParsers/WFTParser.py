@@ -5,6 +5,13 @@ from pathlib import Path
 import csv
 from codecs import decode
 import struct
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from DataAcquisition.Calibration import Offset, create_calibration
+from DataAcquisition.SensorRegistry import sensor_registry
 
 """
 Data parser for sensor data from wireless communication utility.
@@ -54,6 +61,10 @@ dataSize = {}
 
 endCode = [0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xf0]
 
+# The calibrations of fx, fy and fz are the ones DAATA uses (see SensorId.py), mx is only converted here
+wftCalibrations = [create_calibration(sensor_registry.params[name]["calibration"]) for name in ("fx_analog", "fy_analog", "fz_analog")]
+wftCalibrations.append(Offset(zero=2.5, gain=4430 / 5))
+
 while byteIndex < len(dataRecord):	
 	if dataRecord[byteIndex] == b'\x02':
 		csvList.clear()
@@ -76,11 +87,8 @@ while byteIndex < len(dataRecord):
 				WFTValues.append(struct.unpack('f', tempBytes)[0])
 				csvList.append(struct.unpack('f', tempBytes)[0])
 
-		csvList[1] = (csvList[1] - 2.5) * 8990 / 5\
-
-		csvList[2] = (csvList[2] - 2.5) * 4500 / 5
-		csvList[3] = (csvList[3] - 2.5) * 8990 / 5
-		csvList[4] = (csvList[4] - 2.5) * 4430 / 5
+		for i in range(len(wftCalibrations)):
+			csvList[i + 1] = wftCalibrations[i](csvList[i + 1])
 		# csvList[5] = (csvList[5] - 2.5) * 4430 / 5
 		# csvList[6] = (csvList[6] - 2.5) * 4430 / 5
 		# csvList[7] = (csvList[7] - 2.5) * 2000 / 5
@@ -3,16 +3,20 @@ import threading
 import logging
 import sys
 from datetime import datetime
-from tkinter.filedialog import Directory
 from DataAcquisition.Data import Data
 from DataAcquisition.DataImport import DataImport
-from Utilities.DataExport.dataFileExplorer import open_data_file
+from DataAcquisition.Sources import create_source, is_serial_mode
+from DataAcquisition.AcquisitionMetrics import metrics
 
 logger = logging.getLogger("DataAcquisition")
 
 data_collection_lock = threading.Lock()  # Creates a lock for data synchronization
 is_data_collecting = threading.Event()  # Creates an event to know if the data collection has started
 stop_thread = threading.Event()
+input_mode_changed = threading.Event()  # Set when data_import.input_mode is changed so read_data switches sources
+
+# The most time in seconds read_data waits for data before checking for changes
+read_timeout = 0.1
 
 # This is the main variable that can be accessed from other areas of the code. Use 'DataAcquisition.data'
 data = Data(data_collection_lock)
@@ -21,21 +25,38 @@ data = Data(data_collection_lock)
 data_import = DataImport(data, data_collection_lock, is_data_collecting)
 
 
+def clear_input_mode(input_mode):
+    """
+    Clears the input mode after its source has stopped, unless it has already been changed to
+    another input mode that read_data hasn't switched to yet.
+
+    :param input_mode: The input mode of the source that stopped
+    :return: None
+    """
+
+    if data_import.input_mode == input_mode and not input_mode_changed.is_set():
+        data_import.input_mode = ""
+
+
 def read_data():
     """
     Looping function for reading data from all input modes. Executed by
     data_reading_thread in MainWindow.__init__.py when a valid mode is selected.
+    Each input mode is read through a source from DataAcquisition.Sources that
+    waits for data, so the thread sleeps while there is nothing to read.
 
     :return: None
     """
-    
+
     logger.info("Running read_data")
-    data_was_collecting = False    
-    
-    while True:
+    data_was_collecting = False
+    source = None
+    source_mode = ""
+
+    while not stop_thread.is_set():
         if is_data_collecting.is_set() and not data_was_collecting:
             logger.info("Starting data collection")
-            if "COM" in data_import.input_mode:
+            if is_serial_mode(data_import.input_mode):
                 data.reset()
             data_was_collecting = True
 
@@ -43,40 +64,38 @@ def read_data():
             logger.info("Stopping data collection")
             data_was_collecting = False
 
-        if stop_thread.is_set():
-            sys.exit()
-
-        if data_import.input_mode == "FAKE":
-            data_import.check_connected_fake()
-            data_import.read_data_fake()
-        elif data_import.input_mode == "BIN" and data_import.data_file != None:
-            try:                
-                data_import.read_packet()                                   
-            except Exception as e:
-                logger.error(e)        
-        elif "COM" in data_import.input_mode and data_import.teensy_found:            
-            try:
-                try:
-                    data_import.teensy_ser.flushInput()
-                    assert data_import.teensy_found
-                    assert data_import.check_connected()
-                except AttributeError:
-                    logger.warning("Unable to flush Serial Buffer. No Serial object connected")                    
-                try:                    
-                    data_import.read_packet()
-                except AssertionError:
-                    logger.info("Serial port is not open, opening now")
-                    try:
-                        data_import.teensy_ser.open()
-                    except Exception as e:
-                        logger.error(e)
-            except AssertionError:
-                time.sleep(0)
-        else:   
-            data_import.input_mode = ""                     
-            pass
-
-        
+        if input_mode_changed.is_set():
+            # Only switch sources when told to, the input mode is set before its file or port is ready
+            input_mode_changed.clear()
+            if source is not None:
+                source.close()
+            source_mode = data_import.input_mode
+            source = create_source(data_import, source_mode, stop_thread)
+            if source is not None and not source.open():
+                logger.warning("Unable to read from input mode {}".format(source_mode))
+                source = None
+            if source is None and source_mode != "":
+                clear_input_mode(source_mode)
+                source_mode = ""
+
+        if source is None:
+            input_mode_changed.wait(read_timeout)
+            continue
+
+        try:
+            if not source.read(read_timeout):
+                logger.info("Finished reading from input mode {}".format(source_mode))
+                source.close()
+                source = None
+                clear_input_mode(source_mode)
+                source_mode = ""
+        except Exception as e:
+            logger.error(e)
+            stop_thread.wait(read_timeout)
+
+    if source is not None:
+        source.close()
+
 
 def send_data():
     """
@@ -87,7 +106,7 @@ def send_data():
     """
 
     
-    if "COM" not in data_import.input_mode:
+    if not is_serial_mode(data_import.input_mode):
         pass
     else:
         try:
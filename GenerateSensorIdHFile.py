@@ -1,6 +1,6 @@
 import os
 
-from DataAcquisition.SensorId import SensorId
+from DataAcquisition.SensorRegistry import sensor_registry
 from datetime import datetime
 
 print(os.getcwd())
@@ -76,74 +76,41 @@ imu_sensor = """
 """
 
 # Get the length of the longest string name for nice formatting :)
-longest_name = 0
-for sensor_id in SensorId.keys():
-    if len(SensorId[sensor_id]["name"]) > longest_name:
-        longest_name = len(SensorId[sensor_id]["name"])
+longest_name = max(len(name) for name in sensor_registry.id_names.values())
+
+
+def write_sensors(file, first_id, last_id):
+    """
+    Writes an enum entry for every sensor id from first_id up to (not including) last_id.
+
+    :return: None
+    """
+
+    for sensor_id, name in sensor_registry.id_names.items():
+        if first_id <= sensor_id < last_id:
+            num_bytes = sensor_registry.num_bytes[sensor_id]
+            num_bytes = list(num_bytes) if sensor_registry.is_multi[sensor_id] else num_bytes[0]
+            spaces_to_add = 1 + longest_name - len(name)
+            file.write("\t" + name.upper() + spaces_to_add * " " + "= ")
+            file.write(str(sensor_id) + ",\t//NumBytes: " + str(num_bytes))
+            if sensor_id in sensor_registry.h_file_comments:
+                file.write(" - " + sensor_registry.h_file_comments[sensor_id])
+            file.write("\n")
+
 
 # Add everything to file
 with open("SensorId.h", "w") as file:
     file.write(file_beginning)
-
-    # Write all the default sensors
     file.write(default_sensor)
-    for sensor_id in SensorId.keys():
-        if sensor_id < 100:
-            spaces_to_add = 1 + longest_name - len(SensorId[sensor_id]["name"])
-            file.write("\t" + SensorId[sensor_id]["name"].upper() + spaces_to_add*" " +"= ")
-            file.write(str(sensor_id) + ",\t//NumBytes: " + str(SensorId[sensor_id]["num_bytes"]))
-            if "h_file_comment" in SensorId[sensor_id].keys():
-                file.write(" - " + SensorId[sensor_id]["h_file_comment"])
-            file.write("\n")
-
+    write_sensors(file, 0, 100)
     file.write(time_sensor)
-    for sensor_id in SensorId.keys():
-        if 100 <= sensor_id < 200:
-            spaces_to_add = 1 + longest_name - len(SensorId[sensor_id]["name"])
-            file.write("\t" + SensorId[sensor_id]["name"].upper() + spaces_to_add*" " +"= ")
-            file.write(str(sensor_id) + ",\t//NumBytes: " + str(SensorId[sensor_id]["num_bytes"]))
-            if "h_file_comment" in SensorId[sensor_id].keys():
-                file.write(" - " + SensorId[sensor_id]["h_file_comment"])
-            file.write("\n")
-
+    write_sensors(file, 100, 200)
     file.write(speed_sensor)
-    for sensor_id in SensorId.keys():
-        if 200 <= sensor_id < 300:
-            spaces_to_add = 1 + longest_name - len(SensorId[sensor_id]["name"])
-            file.write("\t" + SensorId[sensor_id]["name"].upper() + spaces_to_add * " " + "= ")
-            file.write(str(sensor_id) + ",\t//NumBytes: " + str(SensorId[sensor_id]["num_bytes"]))
-            if "h_file_comment" in SensorId[sensor_id].keys():
-                file.write(" - " + SensorId[sensor_id]["h_file_comment"])
-            file.write("\n")
-
+    write_sensors(file, 200, 300)
     file.write(force_pressure_sensor)
-    for sensor_id in SensorId.keys():
-        if 300 <= sensor_id < 400:
-            spaces_to_add = 1 + longest_name - len(SensorId[sensor_id]["name"])
-            file.write("\t" + SensorId[sensor_id]["name"].upper() + spaces_to_add * " " + "= ")
-            file.write(str(sensor_id) + ",\t//NumBytes: " + str(SensorId[sensor_id]["num_bytes"]))
-            if "h_file_comment" in SensorId[sensor_id].keys():
-                file.write(" - " + SensorId[sensor_id]["h_file_comment"])
-            file.write("\n")
-
+    write_sensors(file, 300, 400)
     file.write(lds_sensor)
-    for sensor_id in SensorId.keys():
-        if 400 <= sensor_id < 500:
-            spaces_to_add = 1 + longest_name - len(SensorId[sensor_id]["name"])
-            file.write("\t" + SensorId[sensor_id]["name"].upper() + spaces_to_add * " " + "= ")
-            file.write(str(sensor_id) + ",\t//NumBytes: " + str(SensorId[sensor_id]["num_bytes"]))
-            if "h_file_comment" in SensorId[sensor_id].keys():
-                file.write(" - " + SensorId[sensor_id]["h_file_comment"])
-            file.write("\n")
-
+    write_sensors(file, 400, 500)
     file.write(imu_sensor)
-    for sensor_id in SensorId.keys():
-        if 500 <= sensor_id < 600:
-            spaces_to_add = 1 + longest_name - len(SensorId[sensor_id]["name"])
-            file.write("\t" + SensorId[sensor_id]["name"].upper() + spaces_to_add * " " + "= ")
-            file.write(str(sensor_id) + ",\t//NumBytes: " + str(SensorId[sensor_id]["num_bytes"]))
-            if "h_file_comment" in SensorId[sensor_id].keys():
-                file.write(" - " + SensorId[sensor_id]["h_file_comment"])
-            file.write("\n")
-
+    write_sensors(file, 500, 600)
     file.write(file_end)
@@ -20,7 +20,7 @@ from Utilities.Popups.popups import popup_ParentChildrenTree
 from MainWindow._tabHandler import close_tab
 import DataAcquisition
 
-from DataAcquisition import is_data_collecting, data_import, stop_thread
+from DataAcquisition import is_data_collecting, data_import, stop_thread, input_mode_changed, is_serial_mode
 from DataAcquisition.DataImport import DataImport
 
 from Utilities.DataExport.dataFileExplorer import open_data_file
@@ -289,40 +289,36 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         return: None
         """
 
-        data_import.teensy_found = False
-        data_import.data_file = None
-
         logger.info("Input Mode: " + str(input_mode))
-        data_import.input_mode = input_mode
-        if data_import.input_mode == "BIN":
+        # The data reading thread switches sources when input_mode_changed is set, so input_mode is only
+        # changed once the file has been chosen or the port has been connected to
+        directory = None
+        if input_mode in ("BIN", "CSV", "NPZ"):
+            # The file is imported by the data reading thread
             try:
-                directory = open_data_file(".bin")
-                if directory != "":
-                    is_data_collecting.set()                    
-                    data_import.open_bin_file(directory)
-                else:
-                    data_import.input_mode = ""
-                    logger.info("You must open a BIN file before changing to BIN input mode")
+                directory = open_data_file("." + input_mode.lower())
             except Exception as e:
                 logger.error(e)
-        elif data_import.input_mode == "CSV":        
-            try:
-                directory = open_data_file(".csv")
-                if directory != "":     
-                    is_data_collecting.set()               
-                    data_import.import_csv(directory)
-                else:                    
-                    logger.info("You must open a CSV file before changing to CSV input mode")
-            except Exception as e:
-                logger.error(e)
-            finally:
-                data_import.input_mode = ""
-        if "COM" in data_import.input_mode:
-            data_import.connect_serial()
+                directory = ""
+            if directory == "":
+                logger.info("You must open a {0} file before changing to {0} input mode".format(input_mode))
+                input_mode = ""
+
+        data_import.teensy_found = False
+        data_import.data_file = None
+        if is_serial_mode(input_mode):
+            # The acquisition process opens the port itself
+            if not data_import.use_acquisition_process:
+                data_import.connect_serial(input_mode)
             if not self.data_sending_thread.isActive():
                 self.data_sending_thread.start(100)
                 logger.info("We connected to serial!")
-        if input_mode != "" and not self.data_reading_thread.is_alive() and input_mode != "Auto":
+        if directory:
+            data_import.import_directory = directory
+            is_data_collecting.set()
+        data_import.input_mode = input_mode
+        input_mode_changed.set()
+        if data_import.input_mode != "" and not self.data_reading_thread.is_alive() and input_mode != "Auto":
             self.data_reading_thread.start()
         
     def get_input_mode():
@@ -347,6 +343,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.actionFake_Data.triggered.connect(lambda: self.set_input_mode("FAKE"))
         self.actionBIN_File.triggered.connect(lambda: self.set_input_mode("BIN"))
         self.actionCSV_File.triggered.connect(lambda: self.set_input_mode("CSV"))
+        self.actionNPZ_File.triggered.connect(lambda: self.set_input_mode("NPZ"))
 
         self.tabWidget.tabBarDoubleClicked.connect(self.rename_tab)
         self.tabWidget.tabCloseRequested.connect(partial(self.close_tab, self))
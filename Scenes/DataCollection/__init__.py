@@ -198,9 +198,13 @@ class DataCollection(DAATAScene, uiFile):
         :return: None
         """
 
-        for key in self.currentKeys:
-            if self.graph_objects[key].isVisible():
-                self.graph_objects[key].update_graph()
+        visible_keys = [key for key in self.currentKeys if self.graph_objects[key].isVisible()]
+        if not visible_keys:
+            return
+        seconds = max(self.graph_objects[key].graph_width_seconds for key in visible_keys)
+        snapshot = data.snapshot(visible_keys, seconds)
+        for key in visible_keys:
+            self.graph_objects[key].update_graph(snapshot)
 
     def update_time_elapsed(self):
         """
@@ -99,8 +99,10 @@ class EngineDyno(DAATAScene, uiFile):
         data.set_sensor_scale("force_enginedyno_lbs", self.load_cell_scale.value())
 
     def update_graphs(self):
+        seconds = max(self.graph_objects[key].graph_width_seconds for key in self.current_keys)
+        snapshot = data.snapshot(self.current_keys, seconds)
         for key in self.current_keys:
-            self.graph_objects[key].update_graph()
+            self.graph_objects[key].update_graph(snapshot)
 
     def update_time_elapsed(self):
         """
@@ -1,6 +1,7 @@
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
 import os
-from DataAcquisition import data
+from DataAcquisition import data, metrics
+from DataAcquisition.AcquisitionMetrics import format_snapshot
 from Scenes import DAATAScene
 import logging
 
@@ -89,6 +90,10 @@ class Homepage(DAATAScene, uiFile):
         self.ind_connectionStatus = self.QIndicator("Network Drive Disconnected", objectName = "ind_connectionStatus")
         self.verticalLayout_connectionStatus.addWidget(self.ind_connectionStatus)
 
+        # Live packet rates, error counters and timings from the acquisition pipeline
+        self.label_acquisitionMetrics = QtWidgets.QLabel(format_snapshot(metrics.snapshot()),
+                                                         objectName="label_acquisitionMetrics")
+        self.verticalLayout_connectionStatus.addWidget(self.label_acquisitionMetrics)
 
         # Create a vertical spacer that forces checkboxes to the top
         spacerItem1 = QtWidgets.QSpacerItem(20, 1000000, QtWidgets.QSizePolicy.Minimum,
@@ -111,6 +116,15 @@ class Homepage(DAATAScene, uiFile):
             self.ind_connectionStatus.setText("Network Drive Disconnected")
             self.ind_connectionStatus.setCheckState(False)
 
+    def update_acquisitionMetrics(self):
+        """
+        Updates the acquisition metrics panel.
+
+        :return: None
+        """
+
+        self.label_acquisitionMetrics.setText(format_snapshot(metrics.snapshot()))
+
     def update_active(self):
         """
         Updates Homepage elements if it is the currently selected scene.
@@ -121,6 +135,7 @@ class Homepage(DAATAScene, uiFile):
 
         self.update_sensorStatus()
         self.update_connectionStatus()
+        self.update_acquisitionMetrics()
 
     def update_passive(self):
         """
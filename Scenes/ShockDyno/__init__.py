@@ -96,11 +96,13 @@ class EngineDyno(DAATAScene, uiFile):
 
     def slot_set_load_cell_scale(self):
         logger.info("Changing load cell scale")
-        data.set_sensor_scale("force_dyno_lbs", self.load_cell_scale.value())
+        data.set_sensor_scale("force_shockdyno_lbs", self.load_cell_scale.value())
 
     def update_graphs(self):
+        seconds = max(self.graph_objects[key].graph_width_seconds for key in self.current_keys)
+        snapshot = data.snapshot(self.current_keys, seconds)
         for key in self.current_keys:
-            self.graph_objects[key].update_graph()
+            self.graph_objects[key].update_graph(snapshot)
 
     def update_time_elapsed(self):
         """
@@ -135,7 +137,7 @@ class EngineDyno(DAATAScene, uiFile):
         if self.secondary_speed_lcd.isEnabled():
             self.secondary_speed_lcd.display(data.get_current_value("dyno_secondary_speed"))
         if self.force_lcd.isEnabled():
-            self.force_lcd.display(data.get_current_value("force_dyno_lbs"))
+            self.force_lcd.display(data.get_current_value("force_shockdyno_lbs"))
         if self.torque_lcd.isEnabled():
             self.torque_lcd.display(data.get_current_value("dyno_torque_ftlbs"))
         if self.power_lcd.isEnabled():
@@ -172,7 +174,7 @@ class EngineDyno(DAATAScene, uiFile):
         else:
             self.secondary_speed_lcd.setEnabled(False)
 
-        if data.get_is_connected("force_dyno_lbs"):
+        if data.get_is_connected("force_shockdyno_lbs"):
             self.force_lcd.setEnabled(True)
         else:
             self.force_lcd.setEnabled(False)
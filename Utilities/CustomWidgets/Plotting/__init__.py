@@ -8,6 +8,7 @@ import numpy
 from PyQt5.QtWidgets import QGridLayout
 
 from DataAcquisition import data
+from Utilities.CustomWidgets.Plotting.plotSeries import PlotSeries
 
 logger = logging.getLogger("Plotting")
 
@@ -53,22 +54,21 @@ class CustomPlotWidget(QtWidgets.QWidget, uiPlotWidget):
 
         self.plotWidget.showGrid(x=True, y=True, alpha=.2)
         self.plotWidget.setBackground(None)
-        # Number of value to show on the x_axis
-        self.samplingFreq = 200
-        self.graph_width = kwargs.get("graph_width_seconds", 10) \
-                           * self.samplingFreq
+        # Number of seconds to show on the x_axis
+        self.graph_width_seconds = kwargs.get("graph_width_seconds", 10)
 
         # the layout object the plot is embedded within
         self.embedLayout = kwargs.get("layout", None)
 
-        # Frequency of values to show (if set to 5 will show every 5th value collected)
-        self.show_width = kwargs.get("show_width", 5)
+        # Series with more than this many values per pixel column are reduced to a min/max envelope
+        self.decimate_threshold = kwargs.get("decimate_threshold", 2)
+        self.series = dict()
 
         # Row and column span of plot on the grid
         self.rowSpan = kwargs.get("rowspan", 1)
         self.rowSpan = kwargs.get("columnspan", 1)
 
-        self.valueArray = numpy.zeros(self.graph_width)
+        self.valueArray = numpy.zeros(0)
 
         self.multi_plots = []
         if self.enable_multi_plot:
@@ -116,9 +116,11 @@ class CustomPlotWidget(QtWidgets.QWidget, uiPlotWidget):
 
     def set_graphWidth(self, seconds):
         try:
-            self.graph_width = int(seconds) * self.samplingFreq
+            self.graph_width_seconds = float(seconds)
         except:
-            self.graph_width = 10 * self.samplingFreq
+            self.graph_width_seconds = 10
+        for series in self.series.values():
+            series.reset()
 
     def set_yMinMax(self, yMin, yMax):
         self.plotWidget.setYRange(0, 100)
@@ -143,12 +145,38 @@ class CustomPlotWidget(QtWidgets.QWidget, uiPlotWidget):
         self.setMinimumSize(QtCore.QSize(200, height))
         self.setMaximumSize(QtCore.QSize(16777215, height))
 
-    def update_graph(self):
-        index_time = data.get_most_recent_index()
-        index_sensor = data.get_most_recent_index(sensor_name=self.sensor_name)
-        self.valueArray = data.get_values(self.sensor_name, index_sensor, self.graph_width)
-        self.timeArray = data.get_values("time_internal_seconds", index_time, self.graph_width)
-        self.plot.setData(self.timeArray, self.valueArray)
+    def update_graph(self, snapshot=None):
+        """
+        Adds the values of the sensor that arrived since the last update to the graph. Nothing is
+        redrawn if there are no new values.
+
+        :param snapshot: A DataSnapshot from data.snapshot to take the values from (gets them from data if None)
+        :return: None
+        """
+
+        if snapshot is None or self.sensor_name not in snapshot:
+            snapshot = data.snapshot(self.sensor_name, self.graph_width_seconds)
+        self.update_series(self.sensor_name, self.plot, snapshot)
+
+    def update_series(self, sensor_name, plot, snapshot):
+        """
+        Updates one line of the graph from a snapshot. Series with more than decimate_threshold values
+        per pixel column are drawn as a min/max envelope.
+
+        :param sensor_name: The name of the sensor the line is for
+        :param plot: The PlotDataItem of the line
+        :param snapshot: A DataSnapshot that contains the sensor
+        :return: None
+        """
+
+        series = self.series.get(sensor_name, None)
+        if series is None:
+            series = PlotSeries()
+            self.series[sensor_name] = series
+        num_columns = self.plotWidget.width()
+        if series.update(snapshot, sensor_name, self.graph_width_seconds, num_columns):
+            self.timeArray, self.valueArray = series.get_data(self.decimate_threshold * num_columns)
+            plot.setData(self.timeArray, self.valueArray)
 
     def create_multi_graphs(self):
         # Maximum of 6 line graphs in one graph.
@@ -180,16 +208,19 @@ class CustomPlotWidget(QtWidgets.QWidget, uiPlotWidget):
                                         width=1)
             self.multi_plots.append(plot)
 
-    def update_multi_graphs(self):
+    def update_multi_graphs(self, snapshot=None):
+        """
+        Redraws every line of a multi sensor graph from one snapshot of the data.
+
+        :param snapshot: A DataSnapshot from data.snapshot to take the values from (gets them from data if None)
+        :return: None
+        """
+
+        if snapshot is None or not all(sensor in snapshot for sensor in self.multi_sensors):
+            snapshot = data.snapshot(self.multi_sensors, self.graph_width_seconds)
         for sensor_i in range(len(self.multi_sensors)):
             sensor = self.multi_sensors[sensor_i]
-            index_time = data.get_most_recent_index()
-            index_sensor = data.get_most_recent_index(sensor_name=sensor)
-            self.valueArray = data.get_values(sensor, index_sensor,
-                                              self.graph_width)
-            self.timeArray = data.get_values("time_internal_seconds",
-                                             index_time, self.graph_width)
-            self.multi_plots[sensor_i].setData(self.timeArray, self.valueArray)
+            self.update_series(sensor, self.multi_plots[sensor_i], snapshot)
 
     def open_SettingsWindow(self):
         PlotSettingsDialog(self, self.embedLayout, self.sensor_name)
@@ -240,7 +271,7 @@ class PlotSettingsDialog(QtWidgets.QDialog, uiSettingsDialog):
         returnValue = self.exec()
 
     def loadSettings(self):
-        self.lineEdit_graph_width_seconds.setText(str(self.parent.graph_width/self.parent.samplingFreq))
+        self.lineEdit_graph_width_seconds.setText(str(self.parent.graph_width_seconds))
         self.lineEdit_yMin.setText(self.configFile.value("yMin"))
         self.lineEdit_yMax.setText(self.configFile.value("yMax"))
 
@@ -0,0 +1,120 @@
+import numpy
+
+
+class MinMaxDecimator:
+    """
+    Reduces a series to the minimum and maximum value in each time bucket, where a bucket is the
+    span of time covered by one pixel column of the plot. Drawing a vertical line from the min to
+    the max of every bucket looks the same as drawing every sample, including single sample spikes,
+    while only sending two points per pixel column to pyqtgraph.
+
+    The buckets are built incrementally: add() only processes the samples it is given and merges
+    them into the last bucket if it is still open, so the cost of each update depends on how many
+    samples arrived and not on how wide the window is.
+    """
+
+    def __init__(self, bucket_seconds, capacity=1024):
+        self.bucket_seconds = float(bucket_seconds)
+        self._ids = numpy.empty(capacity, dtype=numpy.int64)
+        self._mins = numpy.empty(capacity, dtype=numpy.float64)
+        self._maxs = numpy.empty(capacity, dtype=numpy.float64)
+        self._first = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count - self._first
+
+    def reset(self):
+        """
+        Throws away every bucket.
+
+        :return: None
+        """
+
+        self._first = 0
+        self._count = 0
+
+    def add(self, times, values):
+        """
+        Adds new samples to the buckets. The times have to be after every sample that was already added.
+
+        :param times: The times of the new samples in seconds
+        :param values: The values of the new samples
+        :return: None
+        """
+
+        times = numpy.asarray(times, dtype=numpy.float64)
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if len(times) == 0:
+            return
+
+        ids = numpy.floor(times / self.bucket_seconds).astype(numpy.int64)
+        starts = numpy.flatnonzero(ids[1:] != ids[:-1]) + 1
+        starts = numpy.concatenate(([0], starts))
+        new_ids = ids[starts]
+        # fmin/fmax ignore the NaN used to pad sensors that were connected after the time sensor
+        new_mins = numpy.fmin.reduceat(values, starts)
+        new_maxs = numpy.fmax.reduceat(values, starts)
+
+        # The first new samples may belong to the bucket that is still open
+        if self._count > self._first and new_ids[0] == self._ids[self._count - 1]:
+            last = self._count - 1
+            self._mins[last] = numpy.fmin(self._mins[last], new_mins[0])
+            self._maxs[last] = numpy.fmax(self._maxs[last], new_maxs[0])
+            new_ids = new_ids[1:]
+            new_mins = new_mins[1:]
+            new_maxs = new_maxs[1:]
+
+        num_new = len(new_ids)
+        if self._count + num_new > len(self._ids):
+            self._make_room(num_new)
+        self._ids[self._count:self._count + num_new] = new_ids
+        self._mins[self._count:self._count + num_new] = new_mins
+        self._maxs[self._count:self._count + num_new] = new_maxs
+        self._count += num_new
+
+    def trim(self, start_time):
+        """
+        Drops the buckets that end before start_time.
+
+        :param start_time: The time of the oldest sample that is still visible
+        :return: None
+        """
+
+        start_id = numpy.floor(start_time / self.bucket_seconds)
+        self._first += int(numpy.searchsorted(self._ids[self._first:self._count], start_id))
+
+    def get(self):
+        """
+        Gets the envelope of every bucket as points to plot, with a point for the minimum and one for
+        the maximum of each bucket at the center of the bucket.
+
+        :return: A tuple of (times, values) arrays
+        """
+
+        ids = self._ids[self._first:self._count]
+        times = numpy.repeat((ids + 0.5) * self.bucket_seconds, 2)
+        values = numpy.empty(len(times), dtype=numpy.float64)
+        values[0::2] = self._mins[self._first:self._count]
+        values[1::2] = self._maxs[self._first:self._count]
+        return times, values
+
+    def _make_room(self, num_new):
+        """
+        Makes room for num_new buckets, first by moving the buckets that are still in use to the front
+        of the arrays and then by making the arrays bigger if that isn't enough.
+
+        :return: None
+        """
+
+        num_used = self._count - self._first
+        capacity = len(self._ids)
+        while num_used + num_new > capacity:
+            capacity *= 2
+        for name in ("_ids", "_mins", "_maxs"):
+            old = getattr(self, name)
+            new = old if capacity == len(old) else numpy.empty(capacity, dtype=old.dtype)
+            new[:num_used] = old[self._first:self._count]
+            setattr(self, name, new)
+        self._first = 0
+        self._count = num_used
@@ -0,0 +1,162 @@
+import numpy
+
+from Utilities.CustomWidgets.Plotting.minMaxDecimation import MinMaxDecimator
+
+
+class ScrollBuffer:
+    """
+    Preallocated time and value arrays for the visible window of a series. New samples are written
+    after the last one and old samples are dropped by moving the start forward, so nothing is copied
+    until the end of the arrays is reached.
+    """
+
+    def __init__(self, capacity=4096):
+        self._times = numpy.empty(capacity, dtype=numpy.float64)
+        self._values = numpy.empty(capacity, dtype=numpy.float64)
+        self._first = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count - self._first
+
+    @property
+    def times(self):
+        return self._times[self._first:self._count]
+
+    @property
+    def values(self):
+        return self._values[self._first:self._count]
+
+    def clear(self):
+        """
+        Throws away every sample.
+
+        :return: None
+        """
+
+        self._first = 0
+        self._count = 0
+
+    def append(self, times, values):
+        """
+        Adds new samples after the ones already in the buffer.
+
+        :param times: The times of the new samples in seconds
+        :param values: The values of the new samples
+        :return: None
+        """
+
+        num_new = len(times)
+        if self._count + num_new > len(self._times):
+            self._make_room(num_new)
+        self._times[self._count:self._count + num_new] = times
+        self._values[self._count:self._count + num_new] = values
+        self._count += num_new
+
+    def trim(self, start_time):
+        """
+        Drops the samples from before start_time.
+
+        :param start_time: The time of the oldest sample to keep
+        :return: None
+        """
+
+        self._first += int(numpy.searchsorted(self.times, start_time))
+
+    def _make_room(self, num_new):
+        """
+        Makes room for num_new samples, first by moving the samples that are still in use to the front
+        of the arrays and then by making the arrays bigger if that isn't enough.
+
+        :return: None
+        """
+
+        num_used = self._count - self._first
+        capacity = len(self._times)
+        while num_used + num_new > capacity:
+            capacity *= 2
+        for name in ("_times", "_values"):
+            old = getattr(self, name)
+            new = old if capacity == len(old) else numpy.empty(capacity, dtype=old.dtype)
+            new[:num_used] = old[self._first:self._count]
+            setattr(self, name, new)
+        self._first = 0
+        self._count = num_used
+
+
+class PlotSeries:
+    """
+    Keeps track of what has already been plotted for one line of a graph. Each update only takes the
+    samples that arrived since the last one out of a DataSnapshot, adds them to a ScrollBuffer with the
+    visible window and to a MinMaxDecimator, and reports if there is anything new to draw.
+    """
+
+    def __init__(self):
+        self.buffer = ScrollBuffer()
+        self.decimator = None
+        self.last_index = None  # Absolute index after the last sample that was added
+
+    def reset(self):
+        """
+        Forgets everything that was plotted so the next update starts over.
+
+        :return: None
+        """
+
+        self.buffer.clear()
+        self.decimator = None
+        self.last_index = None
+
+    def update(self, snapshot, sensor_name, graph_width_seconds, num_columns):
+        """
+        Adds the samples of a sensor that arrived since the last update.
+
+        :param snapshot: A DataSnapshot that contains the sensor
+        :param sensor_name: The name of the sensor
+        :param graph_width_seconds: How many seconds of data are visible
+        :param num_columns: How many pixel columns wide the graph is
+        :return: True if the series changed and has to be redrawn
+        """
+
+        bucket_seconds = float(graph_width_seconds) / max(num_columns, 1)
+        if self.decimator is None or self.decimator.bucket_seconds != bucket_seconds:
+            # The graph was resized so build the envelope again from the samples that are visible
+            self.decimator = MinMaxDecimator(bucket_seconds)
+            self.decimator.add(self.buffer.times, self.buffer.values)
+            changed = True
+        else:
+            changed = False
+
+        num_new = snapshot.end_index - self.last_index if self.last_index is not None else len(snapshot)
+        if num_new < 0 or num_new > len(snapshot):
+            # The data was reset or we fell behind, so start over with what is in the snapshot
+            self.buffer.clear()
+            self.decimator = MinMaxDecimator(bucket_seconds)
+            num_new = len(snapshot)
+        self.last_index = snapshot.end_index
+        if num_new == 0:
+            return changed
+
+        times = snapshot.time[len(snapshot) - num_new:]
+        values = snapshot.get_values(sensor_name)
+        values = numpy.asarray(values[len(values) - num_new:], dtype=numpy.float64)
+        self.buffer.append(times, values)
+        self.decimator.add(times, values)
+
+        start_time = times[-1] - graph_width_seconds
+        self.buffer.trim(start_time)
+        self.decimator.trim(start_time)
+        return True
+
+    def get_data(self, max_points):
+        """
+        Gets the points to plot, which is every visible sample if there are at most max_points of them
+        and the min/max envelope otherwise.
+
+        :param max_points: The most samples to plot without decimating
+        :return: A tuple of (times, values) arrays
+        """
+
+        if len(self.buffer) <= max_points or self.decimator is None:
+            return self.buffer.times, self.buffer.values
+        return self.decimator.get()
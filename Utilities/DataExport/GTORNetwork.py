@@ -27,13 +27,26 @@ def save_to_network_drive(filename, category = ""):
     standardized_filename = standardized_filename[:-1]
 
     folder_name = date + "_" + category
-    # save_path = os.path.join(get_GTORNetworkDrive(), "DAATA Archive", folder_name)
-    save_path = os.path.join("G://", "DAATA Archive", folder_name)
+    save_path = os.path.join(get_network_drive_root() or "G://", "DAATA Archive", folder_name)
 
     return standardized_filename
 
 
 
+def get_network_drive_root():
+    """
+    Gets the root of the GTOR Network Drive. Setting the DAATA_NETWORK_DRIVE environment variable to
+    a local directory makes DAATA use that directory instead, i.e. for testing exports off campus.
+
+    :return: The path of the drive or None if it can't be found
+    """
+
+    override = os.environ.get("DAATA_NETWORK_DRIVE")
+    if override:
+        return override
+    return get_GTORNetworkDrive()
+
+
 def get_GTORNetworkDrive():
     try:
         return_value = func_timeout(.05, _get_GTORNetworkDrive)  # win32api will time out if a network drive is present but not accessible
@@ -1,7 +1,8 @@
 from PyQt5 import QtWidgets, QtGui, uic, QtCore
 import os
 import json
-from Utilities.DataExport.GTORNetwork import get_GTORNetworkDrive#, generate_data_save_location
+from Utilities.DataExport.GTORNetwork import get_GTORNetworkDrive, get_network_drive_root#, generate_data_save_location
+from Utilities.DataExport.exportPipeline import ExportPipeline, show_export_progress
 
 ''' "saveLocationDialog" configFile settings
 
@@ -25,6 +26,7 @@ class popup_dataSaveLocation(QtWidgets.QDialog, uiFile):
     ## imported methods
     from Utilities.DataExport.exportCSV import saveCSV
     from Utilities.DataExport.exportMAT import saveMAT
+    from Utilities.DataExport.exportSession import saveSession
 
 
     def loadSettings(self):
@@ -72,12 +74,12 @@ class popup_dataSaveLocation(QtWidgets.QDialog, uiFile):
             self.widget_SDCard.hide()
 
     def saveData(self):
+        # Every format is written once and then copied to each of these (directory, filename) targets
+        targets = list()
         if self.checkBox_local.isChecked():
             local_filename = self.lineEdit_filenameLocal.text()
             local_folder = self.lineEdit_folderLocal.text()
-
-            self.saveCSV(local_filename,local_folder)
-            self.saveMAT(local_filename,local_folder)
+            targets.append((local_folder, local_filename))
 
             # save current values as defaults
             self.configFile.setValue("default_localDirectory", local_folder)
@@ -85,11 +87,15 @@ class popup_dataSaveLocation(QtWidgets.QDialog, uiFile):
         if self.checkBox_networkDrive.isChecked():
             nd_filename = self.lineEdit_filenameND.text()
             nd_folder = self.lineEdit_folderND.text()
-
-
-
-            self.saveCSV(nd_filename,nd_folder)
-            self.saveMAT(nd_filename,nd_folder)
+            if not os.path.isabs(nd_folder):
+                # A folder name is put in the DAATA Archive on the network drive
+                nd_folder = os.path.join(get_network_drive_root() or "G://", "DAATA Archive", nd_folder)
+            targets.append((nd_folder, nd_filename))
+
+        if targets:
+            export = ExportPipeline(targets)
+            export.start()
+            show_export_progress(export, "Exporting Data", "Saving collected data")
 
         if self.checkBox_SDCard.isChecked():
             SDFilename = self.lineEdit_filenameSD.text()
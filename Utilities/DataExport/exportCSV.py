@@ -1,53 +1,126 @@
-import csv
 import os
-from DataAcquisition import data 
+import threading
+import logging
+import numpy
+from DataAcquisition import data
 
+logger = logging.getLogger("DataExport")
+
+# Number of rows that are read from data and written to the file at a time
+csv_chunk_size = 10000
+
+
+def get_column_format(values):
+    """
+    Gets the % format used to write the values of a column.
+
+    :return: str
+    """
+
+    if values.dtype.kind in "iub":
+        return "%d"
+    return "%.15g"
+
+
+def write_csv(path, sensor_names=None, chunk_size=csv_chunk_size, progress_callback=None, is_cancelled=None):
+    """
+    Writes the collected data to a CSV file with one column per sensor, starting with time_internal_seconds.
+    The rows are read from data in chunks of aligned columns and each chunk is formatted in one go
+    and written straight to the file, so the whole session is never held in memory twice.
+
+    :param path: The path of the CSV file
+    :param sensor_names: The sensors to write (defaults to every connected sensor that isn't derived)
+    :param chunk_size: The number of rows to read and write at a time
+    :param progress_callback: Called with (rows written, total rows) after each chunk
+    :param is_cancelled: Called before each chunk, the export stops early if it returns True
+    :return: The number of rows written
+    """
+
+    if sensor_names is None:
+        sensor_names = data.get_sensors(is_connected=True, is_derived=False)
+    sensor_names = ["time_internal_seconds"] + [sensor for sensor in sensor_names if sensor != "time_internal_seconds"]
+
+    first_index, stop_index = data.get_index_range()
+    total_rows = stop_index - first_index
+    rows_written = 0
+    with open(path, "w", newline="", buffering=1 << 20) as csv_file:
+        csv_file.write(",".join(sensor_names) + "\n")
+        for start in range(first_index, stop_index, chunk_size):
+            if is_cancelled is not None and is_cancelled():
+                logger.info("CSV export to {} was cancelled".format(path))
+                break
+            values = data.get_values_by_index(sensor_names, start, min(start + chunk_size, stop_index))
+            columns = [numpy.asarray(values[sensor]) for sensor in sensor_names]
+            num_rows = min(len(column) for column in columns)
+            if num_rows == 0:
+                break
+            row_format = ",".join(get_column_format(column) for column in columns) + "\n"
+            rows = zip(*[column[len(column) - num_rows:].tolist() for column in columns])
+            csv_file.write((row_format * num_rows) % tuple(value for row in rows for value in row))
+            rows_written += num_rows
+            if progress_callback is not None:
+                progress_callback(rows_written, total_rows)
+    return rows_written
+
+
+class CSVExportThread(threading.Thread):
+    """
+    Runs write_csv on a worker thread and keeps track of its progress so that the GUI can poll it.
+    """
+
+    def __init__(self, path, sensor_names=None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.sensor_names = sensor_names
+        self.rows_written = 0
+        self.total_rows = 0
+        self.error = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def progress(self):
+        """
+        The percentage of rows that have been written.
+
+        :return: int
+        """
+
+        if self.total_rows == 0:
+            return 0 if self.is_alive() else 100
+        return int(100 * self.rows_written / self.total_rows)
+
+    def update_progress(self, rows_written, total_rows):
+        self.rows_written = rows_written
+        self.total_rows = total_rows
+
+    def run(self):
+        try:
+            write_csv(self.path, self.sensor_names, progress_callback=self.update_progress,
+                      is_cancelled=self.cancel_event.is_set)
+            logger.info("Finished writing {} rows to {}".format(self.rows_written, self.path))
+        except Exception as e:
+            self.error = e
+            logger.error(e)
+            logger.error("Error in CSV export to {}".format(self.path))
 
 
 def saveCSV(self, filename, directory):
-    # with open(filename, 'w', newline='') as csvfile:
+    """
+    Exports the collected data to <directory>/<filename>.csv on a worker thread and shows the
+    progress in a dialog that doesn't block the rest of DAATA.
+
+    :return: None
+    """
+
+    from Utilities.DataExport.exportPipeline import show_export_progress
 
-    #TODO add smarter functionality to automatically make it a csv file
     if filename == "":
         return
 
+    export = CSVExportThread(os.path.join(directory, filename + ".csv"))
+    export.start()
+    show_export_progress(export, "Exporting CSV", "Saving {}.csv".format(filename))
 
-    csvfile = open(os.path.join(directory, filename + ".csv"), 'w')
-    writer = csv.writer(csvfile, dialect='excel', lineterminator='\n')
-
-    
-    # connected_sensors = data.get_sensors(is_connected=True)
-    sensorsList = data.get_sensors(is_connected=True, is_derived=False)
-
-    lastIndex = data.get_most_recent_index()
-    sensorData = list()
-
-    for index, sensor in enumerate(sensorsList):
-        row = [sensor] + data.get_values(sensor, lastIndex, lastIndex+1)
-        if sensor == 'time_internal_seconds':
-            sensorData.insert(0, row)
-        else:
-            sensorData.append(row)
-
-    # rows -> columns
-    rows = zip(*sensorData)
-    for row in rows:
-        writer.writerow(row)
-
-    # for sensor in sensorsList:
-    #
-    #
-    # while (index <=lastIndex):
-    #     print(index)
-    #     rowData = list()
-    #     rowData.append(data.get_value('time',index))
-    #     for sensor in sensorsList:
-    #         rowData.append(data.get_value(sensor,index))
-    #     print(data.get_value('time',index))
-    #     writer.writerow(rowData)
-    #     index += 1
-
-    csvfile.close()
 
 if __name__ == "__main__":
     pass
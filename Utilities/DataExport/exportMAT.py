@@ -1,5 +1,4 @@
 import numpy
-import scipy.io as sio
 import os
 from DataAcquisition import data
 
@@ -10,6 +9,19 @@ def saveMAT(self, filename, directory):
     if ".mat" not in filename:
         filename = filename + ".mat"
 
+    write_mat(os.path.join(directory, filename))
+
+
+def write_mat(path):
+    """
+    Writes every connected sensor that isn't derived to a MAT file as a column under collected_data.
+
+    :param path: The path of the MAT file
+    :return: None
+    """
+
+    # scipy is only imported when a MAT file is actually written
+    import scipy.io as sio
 
     dataDict = dict()
     dataDict['collected_data'] = dict()
@@ -21,7 +33,7 @@ def saveMAT(self, filename, directory):
     for sensor in sensorsList:
         dataDict['collected_data'][sensor] = data.get_values(sensor, lastIndex, lastIndex+1)
 
-    sio.savemat(os.path.join(directory, filename), dataDict, appendmat=True, oned_as="column")
+    sio.savemat(path, dataDict, appendmat=True, oned_as="column")
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from DataAcquisition import data
+from DataAcquisition.SessionFile import write_session
+from Utilities.DataExport.exportCSV import write_csv
+from Utilities.DataExport.exportMAT import write_mat
+
+logger = logging.getLogger("DataExport")
+
+# Size of the blocks staged files are copied in, cancelling is checked between blocks
+copy_block_size = 1 << 20
+
+# Exports that are still running, so that they aren't garbage collected with the dialog that started them
+active_exports = set()
+
+
+# The file extension and writer of every format that is exported
+export_formats = {
+    ".csv": write_csv,
+    ".mat": write_mat,
+    ".npz": lambda path: write_session(path, data),
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportPipeline(threading.Thread):
+    """
+    Exports the collected data to several places at once on a worker thread. Each format is written
+    once to a local staging directory and the staged files are then copied to every target in
+    parallel on a thread pool, so a slow network drive doesn't hold up the local copy and nothing is
+    serialized twice.
+    """
+
+    def __init__(self, targets, formats=None, max_workers=4):
+        """
+        :param targets: A list of (directory, filename) tuples, the extension of each format is added to filename
+        :param formats: A dict of file extension to a function that writes that format to a path (defaults to export_formats)
+        :param max_workers: The most files that are copied at the same time
+        """
+
+        super().__init__(daemon=True)
+        self.targets = [(directory, filename) for directory, filename in targets if filename != ""]
+        self.formats = formats if formats is not None else export_formats
+        self.max_workers = max_workers
+        self.cancel_event = threading.Event()
+        self.steps_done = 0
+        self.total_steps = len(self.formats) * (1 + len(self.targets))
+        self.written_paths = list()
+        self.errors = list()
+        self._progress_lock = threading.Lock()
+
+    @property
+    def progress(self):
+        """
+        The percentage of staging and copying steps that are done.
+
+        :return: int
+        """
+
+        if self.total_steps == 0:
+            return 100
+        return int(100 * self.steps_done / self.total_steps)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        if not self.targets:
+            return
+        staging_directory = tempfile.mkdtemp(prefix="daata_export_")
+        try:
+            staged_files = self.stage(staging_directory)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for directory, filename in self.targets:
+                    for extension, staged_path in staged_files.items():
+                        executor.submit(self.copy_to_target, staged_path, os.path.join(directory, filename + extension))
+        except ExportCancelled:
+            logger.info("Export was cancelled")
+        finally:
+            shutil.rmtree(staging_directory, ignore_errors=True)
+        for path, error in self.errors:
+            logger.error("Unable to export {}: {}".format(path, error))
+        logger.info("Exported {} files".format(len(self.written_paths)))
+
+    def stage(self, staging_directory):
+        """
+        Writes each format once to the staging directory.
+
+        :return: A dict of file extension to the path of the staged file
+        """
+
+        staged_files = dict()
+        for extension, write in self.formats.items():
+            if self.cancel_event.is_set():
+                raise ExportCancelled()
+            staged_path = os.path.join(staging_directory, "session" + extension)
+            try:
+                write(staged_path)
+                staged_files[extension] = staged_path
+            except Exception as e:
+                self.errors.append((staged_path, e))
+                # The copies of this format will never happen
+                self.finish_step(len(self.targets))
+            self.finish_step()
+        return staged_files
+
+    def copy_to_target(self, staged_path, target_path):
+        """
+        Copies a staged file to a target in blocks, checking for cancellation between blocks. Partial
+        files are removed if the copy doesn't finish.
+
+        :return: None
+        """
+
+        try:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with open(staged_path, "rb") as source, open(target_path, "wb") as target:
+                block = source.read(copy_block_size)
+                while block:
+                    if self.cancel_event.is_set():
+                        raise ExportCancelled()
+                    target.write(block)
+                    block = source.read(copy_block_size)
+            with self._progress_lock:
+                self.written_paths.append(target_path)
+        except Exception as e:
+            if not isinstance(e, ExportCancelled):
+                with self._progress_lock:
+                    self.errors.append((target_path, e))
+            try:
+                os.remove(target_path)
+            except OSError:
+                pass
+        finally:
+            self.finish_step()
+
+    def finish_step(self, num_steps=1):
+        with self._progress_lock:
+            self.steps_done += num_steps
+
+
+def show_export_progress(export, title, label):
+    """
+    Shows a non-modal progress dialog for an export running on a worker thread (anything with
+    progress, cancel_event and is_alive) and keeps it alive until the export is done.
+
+    :return: None
+    """
+
+    from PyQt5 import QtCore, QtWidgets
+
+    progress_dialog = QtWidgets.QProgressDialog(label, "Cancel", 0, 100)
+    progress_dialog.setWindowTitle(title)
+    progress_dialog.setModal(False)
+    progress_dialog.canceled.connect(export.cancel_event.set)
+    timer = QtCore.QTimer()
+
+    def update_progress():
+        progress_dialog.setValue(export.progress)
+        if not export.is_alive():
+            timer.stop()
+            progress_dialog.close()
+            active_exports.discard(item)
+
+    item = (export, progress_dialog, timer)
+    active_exports.add(item)
+    timer.timeout.connect(update_progress)
+    progress_dialog.show()
+    timer.start(100)
+
@@ -0,0 +1,15 @@
+import os
+from DataAcquisition import data
+from DataAcquisition.SessionFile import write_session
+
+
+def saveSession(self, filename, directory):
+    if filename == "":
+        return
+    if not filename.endswith(".npz"):
+        filename = filename + ".npz"
+
+    write_session(os.path.join(directory, filename), data)
+
+if __name__ == "__main__":
+    pass
@@ -6,8 +6,9 @@ from PyQt5.QtWidgets import QApplication
 from MainWindow import MainWindow
 
 
-app = QApplication(sys.argv)
-daata = MainWindow()
-daata.show()
-sys.exit(app.exec_())
-
+# The acquisition process imports this file again when it starts, so only start the GUI when it is run directly
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    daata = MainWindow()
+    daata.show()
+    sys.exit(app.exec_())
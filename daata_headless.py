@@ -0,0 +1,152 @@
+"""
+Records data without the GUI, for trackside laptops that are too slow to run the full application.
+
+Only DataAcquisition and the export writers are imported, so PyQt5, pyqtgraph and tkinter don't
+have to be installed. Data is read on the same read_data thread the GUI uses, the collection rate
+is printed while recording, and the data is exported when recording stops (Ctrl+C, --duration or
+the end of a BIN file). Serial frames are also written to a raw capture file as they arrive.
+
+Usage (from the repository root):
+    python daata_headless.py --port COM3 --output C:/Data --name test_run
+    python daata_headless.py --bin recording.BIN --output C:/Data --format csv npz
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import DaataLogging
+import DataAcquisition
+from DataAcquisition import data, data_import, is_data_collecting, stop_thread, input_mode_changed, metrics
+
+logger = logging.getLogger("DataAcquisition")
+
+# Time in seconds between sending packets to the Teensy, the same as the GUI's data_sending_thread
+send_interval = 0.1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record data from DAATA without the GUI.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--port", help="The serial port the Teensy is connected to (ex. COM3)")
+    source.add_argument("--bin", help="A BIN file to load instead of reading from the Teensy")
+    parser.add_argument("--output", default=os.getcwd(), help="The directory to save the recording to")
+    parser.add_argument("--name", default=None, help="The file name to save the recording as (defaults to the date and time)")
+    parser.add_argument("--format", nargs="+", default=["npz"], choices=["csv", "mat", "npz"],
+                        help="The formats to save the recording in")
+    parser.add_argument("--duration", type=float, default=None, help="Stop recording after this many seconds")
+    parser.add_argument("--stats-interval", type=float, default=1.0, help="Seconds between rate updates")
+    parser.add_argument("--no-raw-capture", action="store_true", help="Don't write serial frames to a raw capture file")
+    parser.add_argument("--process", action="store_true", help="Read the serial port in a separate acquisition process")
+    return parser.parse_args(argv)
+
+
+def send_data_loop():
+    """
+    Sends packets to the Teensy until the reading thread is stopped.
+
+    :return: None
+    """
+
+    while not stop_thread.wait(send_interval):
+        DataAcquisition.send_data()
+
+
+def print_stats(elapsed, num_samples, samples_per_second):
+    snapshot = metrics.snapshot()
+    snapshot = snapshot.get("acquisition_process", snapshot)
+    print("{:8.1f} s  {:10d} samples  {:10.1f} samples/s  {} sensors  {:8.1f} packets/s  {} mismatches  {} resyncs".format(
+        elapsed, num_samples, samples_per_second, len(data.get_sensors(is_connected=True, is_derived=False)),
+        snapshot["packets_per_second"], snapshot["size_mismatches"], snapshot["resyncs"]), flush=True)
+
+
+def record(args):
+    """
+    Reads data until recording is stopped, printing the collection rate every stats_interval seconds.
+
+    :return: The number of samples recorded
+    """
+
+    data_import.attach_internal_sensor(101)
+    data_import.raw_capture_enabled = not args.no_raw_capture
+    data_import.use_acquisition_process = data_import.use_acquisition_process or args.process
+    if args.port is not None:
+        data_import.input_mode = args.port
+    if args.port is not None and not data_import.use_acquisition_process:
+        data_import.connect_serial()
+        if not data_import.teensy_found:
+            logger.error("Unable to connect to {}".format(args.port))
+            return 0
+    if args.bin is not None:
+        data_import.input_mode = "BIN"
+        data_import.import_directory = args.bin
+
+    reading_thread = threading.Thread(target=DataAcquisition.read_data)
+    sending_thread = threading.Thread(target=send_data_loop, daemon=True)
+    is_data_collecting.set()
+    input_mode_changed.set()
+    reading_thread.start()
+    if args.port is not None and not data_import.use_acquisition_process:
+        sending_thread.start()
+
+    start_time = time.perf_counter()
+    last_time = start_time
+    last_samples = 0
+    num_samples = 0
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            now = time.perf_counter()
+            index_range = data.get_index_range()
+            num_samples = 0 if index_range is None else index_range[1]
+            print_stats(now - start_time, num_samples, (num_samples - last_samples) / (now - last_time))
+            last_time = now
+            last_samples = num_samples
+            if args.duration is not None and now - start_time >= args.duration:
+                break
+            if data_import.input_mode == "":
+                # The BIN file has been loaded, or the port couldn't be read from
+                break
+    except KeyboardInterrupt:
+        logger.info("Recording stopped")
+    finally:
+        is_data_collecting.clear()
+        stop_thread.set()
+        reading_thread.join()
+    return num_samples
+
+
+def save(args):
+    """
+    Exports the recording to the output directory in every chosen format.
+
+    :return: The paths that were written
+    """
+
+    # The export writers import DataAcquisition.data, so they are only imported once it is set up
+    from Utilities.DataExport.exportPipeline import ExportPipeline, export_formats
+
+    name = args.name if args.name is not None else datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    formats = {"." + extension: export_formats["." + extension] for extension in args.format}
+    export = ExportPipeline([(args.output, name)], formats)
+    export.start()
+    export.join()
+    for path in export.written_paths:
+        print("Saved {}".format(path), flush=True)
+    return export.written_paths
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if record(args) == 0:
+        logger.warning("No data was recorded")
+        return 1
+    return 0 if save(args) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())